@@ -0,0 +1,407 @@
+"""
+Persistent BLAST databases of database tables (e.g. the Sequence table).
+
+Each table has a versioned database on disk, made of one or more BLAST volumes. New rows are added as a new
+volume when the table changes (see :meth:`BlastDatabaseCache.update`), so alignments against the whole table
+run against the prebuilt database without calling makeblastdb. The database is rebuilt from scratch when rows
+have been removed, when it was built from a different database, or when there are more than
+:attr:`BlastDatabaseCache.MAX_VOLUMES` volumes.
+
+Whether a table changed is decided from its row count and largest id alone, so an up to date database costs
+one aggregate query per request. The checksum of the rows is updated from the new rows only. Rows modified in
+place keep the count and largest id, so code that modifies rows must update with ``verify=True``, which
+checksums the whole table and rebuilds the database if any row changed. Updates hold an exclusive lock on the cache directory, so
+concurrent processes never build the same volume. Locks need fcntl; on platforms without it (Windows) the cache
+is not locked and must only be used by one process.
+
+Alignments are returned in the same format as pyblast alignments ::
+
+    {"query": {"sequence_id": 1, "name": "myseq", "length": 72, "circular": False,
+               "start": 1, "end": 72, "strand": "plus", "bases": "ATGC..."},
+     "subject": {...},
+     "meta": {"score": 72, "evalue": 0.0, "bit_score": 134.0, "identical": 72, "gaps_open": 0, "gaps": 0,
+              "alignment_length": 72, "span_origin": True}}
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from flask import current_app, g
+from sqlalchemy import func
+
+from dasi.graph_constructor.models.blast_records import iter_tabular_records
+
+OUTFMT = "7 qacc sacc score evalue bitscore length nident gapopen gaps qlen qstart qend slen sstart send sstrand " \
+         "qseq sseq"
+
+
+def get_blast_cache():
+    """Returns the BLAST database cache of the app"""
+    if 'blast_cache' not in g:
+        directory = current_app.config.get('BLAST_CACHE') or os.path.join(current_app.instance_path, 'blast_cache')
+        g.blast_cache = BlastDatabaseCache(directory, database=current_app.config.get('DATABASE'))
+    return g.blast_cache
+
+
+def is_perfect(alignment):
+    """Whether an alignment has no mismatches or gaps"""
+    meta = alignment['meta']
+    return meta['identical'] == meta['alignment_length'] and meta['gaps'] == 0 and meta['gaps_open'] == 0
+
+
+def is_perfect_subject(alignment):
+    """Whether an alignment covers the entire subject"""
+    return alignment['meta']['alignment_length'] == alignment['subject']['length']
+
+
+def wrap_position(pos, length):
+    """Translates a position on a pseudocircular (doubled) sequence back to the sequence (1-based)"""
+    return (pos - 1) % length + 1
+
+
+def record_region(record, which, row, span_origin):
+    """
+    Returns the pyblast region of the query or subject of a BLAST record, or None if the hit is longer than the
+    sequence (only possible on pseudocircular sequences)
+
+    :param record: flat BLAST record
+    :type record: dict
+    :param which: "query" or "subject"
+    :type which: str
+    :param row: Sequence or Primer row
+    :param span_origin: whether circular sequences were pseudocircularized
+    :type span_origin: bool
+    :return: region
+    :rtype: dict
+    """
+    prefix = which[0]
+    length = len(row.bases)
+    circular = bool(getattr(row, 'circular', False))
+    start, end = record[prefix + '_start'], record[prefix + '_end']
+    if abs(end - start) + 1 > length:
+        return None
+    if circular and span_origin:
+        start, end = wrap_position(start, length), wrap_position(end, length)
+    return {
+        "sequence_id": row.id,
+        "name": row.name,
+        "length": length,
+        "circular": circular,
+        "start": start,
+        "end": end,
+        "strand": record.get(which + '_strand', 'plus'),
+        "bases": record.get(which + '_seq', ''),
+    }
+
+
+def record_alignment(record, query, subject, span_origin):
+    """
+    Converts a BLAST record of a cached database into a pyblast alignment, or None if the hit
+    is an artifact of pseudocircularization
+
+    :param record: flat BLAST record
+    :type record: dict
+    :param query: query Sequence row
+    :param subject: subject Sequence or Primer row
+    :param span_origin: whether circular sequences were pseudocircularized
+    :type span_origin: bool
+    :return: alignment
+    :rtype: dict
+    """
+    query_region = record_region(record, 'query', query, span_origin)
+    subject_region = record_region(record, 'subject', subject, span_origin)
+    if query_region is None or subject_region is None:
+        return None
+    return {
+        "query": query_region,
+        "subject": subject_region,
+        "meta": {
+            "score": record['score'],
+            "evalue": record['evalue'],
+            "bit_score": record['bit_score'],
+            "identical": record['identical'],
+            "gaps_open": record['gap_opens'],
+            "gaps": record['gaps'],
+            "alignment_length": record['alignment_length'],
+            "span_origin": span_origin,
+        }
+    }
+
+
+def write_fasta(path, rows, span_origin=True):
+    """Writes rows to a FASTA file named by row id. Circular rows are pseudocircularized if span_origin is True."""
+    with open(path, 'w') as f:
+        for row in rows:
+            bases = row.bases
+            if span_origin and getattr(row, 'circular', False):
+                bases = bases + bases
+            f.write(">{}\n{}\n".format(row.id, bases))
+
+
+def row_checksum(row_id, circular, bases):
+    """Checksum of the id, topology and bases of a row"""
+    return int(hashlib.md5("{}\t{}\t{}\n".format(row_id, int(bool(circular)), bases or '').encode()).hexdigest(), 16)
+
+
+def combine_checksums(checksums, checksum=None):
+    """
+    Combines row checksums into the checksum of a set of rows. Checksums are summed, so the checksum of a table
+    can be updated with the checksums of new rows only.
+
+    :param checksums: row checksums (see :func:`row_checksum`)
+    :param checksum: checksum of the other rows, as a hex string
+    :type checksum: str
+    :return: checksum, as a hex string
+    :rtype: str
+    """
+    total = int(checksum, 16) if checksum else 0
+    for c in checksums:
+        total += c
+    return "{:032x}".format(total % (1 << 128))
+
+
+def rows_checksum(rows, checksum=None):
+    """Checksum of model rows (see :func:`combine_checksums`)"""
+    return combine_checksums((row_checksum(row.id, getattr(row, 'circular', False), row.bases) for row in rows),
+                             checksum=checksum)
+
+
+def table_checksums(model, session, split_id=None):
+    """
+    Checksums of the ids, topologies and bases of the rows of a table (see :func:`combine_checksums`). Reads
+    every row of the table.
+
+    :param model: model of the table (e.g. Sequence)
+    :param session: database session
+    :param split_id: if given, also returns the checksum of only the rows with ids up to split_id
+    :type split_id: int
+    :return: checksum of the rows up to split_id (None if split_id is None) and checksum of all rows
+    :rtype: tuple
+    """
+    circular = getattr(model, 'circular', None)
+    columns = [model.id, model.bases] + ([circular] if circular is not None else [])
+    old, new = [], []
+    for row in session.query(*columns):
+        checksum = row_checksum(row[0], row[2] if len(row) > 2 else False, row[1])
+        if split_id is None or row[0] <= split_id:
+            old.append(checksum)
+        else:
+            new.append(checksum)
+    split_checksum = None
+    if split_id is not None:
+        split_checksum = combine_checksums(old)
+    return split_checksum, combine_checksums(new, checksum=combine_checksums(old))
+
+
+class BlastDatabaseCache(object):
+    """
+    Versioned BLAST databases of database tables, stored in a directory. The manifest records,
+    for every table, the version, the BLAST volumes, the database they were built from, and the
+    table state (row count and largest id) and content checksum (see :func:`table_checksums`)
+    the volumes were built from.
+    """
+
+    MANIFEST = "manifest.json"
+    LOCK = "manifest.lock"
+    MAX_VOLUMES = 16
+
+    def __init__(self, directory, database=None, makeblastdb="makeblastdb", blastn="blastn"):
+        """
+        :param directory: directory of the databases
+        :type directory: str
+        :param database: identity of the database the tables are read from (e.g. the DATABASE url).
+                         Databases built from another database are rebuilt.
+        :type database: str
+        :param makeblastdb: makeblastdb executable
+        :type makeblastdb: str
+        :param blastn: blastn executable
+        :type blastn: str
+        """
+        self.directory = directory
+        self.database = database
+        self.makeblastdb = makeblastdb
+        self.blastn = blastn
+        self.manifest = self._load_manifest()
+
+    @property
+    def available(self):
+        """Whether the BLAST executables are installed"""
+        return shutil.which(self.makeblastdb) is not None and shutil.which(self.blastn) is not None
+
+    def _manifest_path(self):
+        return os.path.join(self.directory, self.MANIFEST)
+
+    def _load_manifest(self):
+        path = self._manifest_path()
+        if not os.path.isfile(path):
+            return {}
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    @contextmanager
+    def _lock(self, shared=False):
+        """Holds a lock on the cache directory; exclusive for updates, shared for alignments"""
+        os.makedirs(self.directory, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, self.LOCK), 'a') as handle:
+            fcntl.flock(handle, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _save_manifest(self):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._manifest_path()
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.manifest, f)
+        os.replace(path + '.tmp', path)
+
+    def version(self, table):
+        """Version of the database of a table (0 if it has not been built)"""
+        return self.manifest.get(table, {}).get('version', 0)
+
+    def volumes(self, table):
+        """BLAST volumes of the database of a table"""
+        return list(self.manifest.get(table, {}).get('volumes', []))
+
+    @staticmethod
+    def table_state(model, session):
+        """The row count and the largest id of a table"""
+        count, max_id = session.query(func.count(model.id), func.max(model.id)).one()
+        return [count, max_id or 0]
+
+    def _build_volume(self, name, rows, span_origin):
+        os.makedirs(self.directory, exist_ok=True)
+        fasta = name + '.fsa'
+        write_fasta(os.path.join(self.directory, fasta), rows, span_origin=span_origin)
+        subprocess.run([self.makeblastdb, '-in', fasta, '-dbtype', 'nucl', '-out', name, '-title', name],
+                       cwd=self.directory, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return name
+
+    def _remove_volume(self, name):
+        for filename in os.listdir(self.directory):
+            if filename.startswith(name + '.'):
+                os.remove(os.path.join(self.directory, filename))
+
+    def update(self, table, model, session, span_origin=True, verify=False):
+        """
+        Brings the database of a table up to date. If rows were only added since the last update, a volume with
+        just the new rows is built; otherwise (rows removed, or a different database) the database is rebuilt.
+        Only the row count and largest id are compared with the manifest, unless verify is True.
+
+        :param table: name of the table
+        :type table: str
+        :param model: model of the table (e.g. Sequence)
+        :param session: database session
+        :param span_origin: whether to pseudocircularize circular sequences
+        :type span_origin: bool
+        :param verify: whether to checksum every row, so rows modified in place are found
+        :type verify: bool
+        :return: version of the database
+        :rtype: int
+        """
+        with self._lock():
+            # another process may have updated the databases
+            self.manifest = self._load_manifest()
+            entry = self.manifest.get(table)
+            if entry is not None and (entry.get('database') != self.database or entry['span_origin'] != span_origin):
+                entry = None
+            state = self.table_state(model, session)
+            unchanged = entry is not None
+            if entry is not None and verify:
+                old_checksum, _ = table_checksums(model, session, split_id=entry['state'][1])
+                unchanged = old_checksum == entry.get('checksum')
+            if unchanged and entry['state'] == state:
+                return entry['version']
+            version = self.version(table) + 1
+            volumes = self.volumes(table)
+            rows = None
+            if unchanged and len(volumes) < self.MAX_VOLUMES:
+                old_count, old_max_id = entry['state']
+                new_rows = session.query(model).filter(model.id > old_max_id).order_by(model.id).all()
+                if old_count + len(new_rows) == state[0]:
+                    rows = new_rows
+                    checksum = rows_checksum(new_rows, checksum=entry.get('checksum'))
+            if rows is None:
+                for volume in volumes:
+                    self._remove_volume(volume)
+                volumes = []
+                rows = session.query(model).order_by(model.id).all()
+                checksum = rows_checksum(rows)
+            if rows:
+                volumes.append(self._build_volume("{}_{}".format(table, version), rows, span_origin))
+            self.manifest[table] = {"version": version, "volumes": volumes, "state": state, "checksum": checksum,
+                                    "database": self.database, "span_origin": span_origin}
+            self._save_manifest()
+            return version
+
+    def align(self, table, model, session, query, span_origin=True, task=None, **blast_options):
+        """
+        Aligns a query against every row of a table, updating the database of the table first if it changed.
+
+        :param table: name of the table
+        :type table: str
+        :param model: model of the table (e.g. Sequence)
+        :param session: database session
+        :param query: query Sequence row
+        :param span_origin: whether to find alignments across the origin of circular sequences
+        :type span_origin: bool
+        :param task: blastn task (e.g. "blastn-short")
+        :type task: str
+        :param blast_options: blastn options (e.g. gapopen=3)
+        :return: list of alignments
+        :rtype: list
+        """
+        self.update(table, model, session, span_origin=span_origin)
+        records = []
+        with self._lock(shared=True), tempfile.TemporaryDirectory() as tmpdir:
+            # the volumes can not be rebuilt while blastn reads them
+            self.manifest = self._load_manifest()
+            volumes = self.volumes(table)
+            if volumes:
+                args = [self.blastn, '-db', ' '.join(volumes), '-outfmt', OUTFMT]
+                if task is not None:
+                    args += ['-task', task]
+                for option, value in sorted(blast_options.items()):
+                    args += ['-' + option, str(value)]
+                query_path = os.path.join(tmpdir, 'query.fsa')
+                out_path = os.path.join(tmpdir, 'results.out')
+                write_fasta(query_path, [query], span_origin=span_origin)
+                subprocess.run(args + ['-query', query_path, '-out', out_path],
+                               cwd=self.directory, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                with open(out_path, 'r') as f:
+                    records = list(iter_tabular_records(f))
+
+        alignments = []
+        seen = set()
+        subjects = {}
+        subject_ids = {int(r['subject_acc']) for r in records}
+        if subject_ids:
+            subjects = {row.id: row for row in session.query(model).filter(model.id.in_(subject_ids)).all()}
+        for record in records:
+            subject = subjects.get(int(record['subject_acc']))
+            if subject is None:
+                # the subject was deleted after the search
+                continue
+            alignment = record_alignment(record, query, subject, span_origin)
+            if alignment is None:
+                continue
+            key = tuple((r['sequence_id'], r['start'], r['end'], r['strand'])
+                        for r in [alignment['query'], alignment['subject']])
+            if key not in seen:
+                seen.add(key)
+                alignments.append(alignment)
+        return alignments
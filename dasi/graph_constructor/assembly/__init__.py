@@ -1 +1,3 @@
+from dasi.graph_constructor.assembly.node_index import NodeIndex
+from dasi.graph_constructor.assembly.assembly_graph import AssemblyGraph
 from dasi.graph_constructor.assembly.assembler import Assembly, Assembler
@@ -1,11 +1,15 @@
+import bisect
+import heapq
 import itertools
-from copy import copy
+import time
 
+from dasi.graph_constructor.assembly.assembly_graph import AssemblyGraph
+from dasi.graph_constructor.assembly.node_index import NodeIndex
 from dasi.graph_constructor.cost_functions.gibson_assembly_cost_function import GibsonAssemblyCost
 from dasi.graph_constructor.log import logger
-from dasi.graph_constructor.models import ContigContainer, ContigRegion
+from dasi.graph_constructor.models import ColumnarContigContainer, ContigContainer, ContigRegion
 import networkx as nx
-from dasi.graph_constructor.utils import pair
+import numpy as np
 from tqdm import tqdm
 
 # logger.propogate = False
@@ -188,11 +192,44 @@ class Assembly(object):
 class Assembler(ContigContainer):
     """Creates assemblies"""
 
-    def __init__(self, contig_container):
+    # gap spans (exclusive) considered when connecting two contigs
+    MIN_GAP = -100
+    MAX_GAP = 2000
+    MAX_JUNCTION_COST = 10000
+
+    # "networkx" builds a nx.DiGraph, "csr" builds a compact AssemblyGraph
+    GRAPH_BACKENDS = ["networkx", "csr"]
+
+    def __init__(self, contig_container, cost_function=None, graph_backend="networkx"):
+        """
+
+        :param contig_container: ContigContainer
+        :type contig_container: ContigContainer
+        :param cost_function: junction cost function, e.g. a scenario returned by
+                              cost_functions.sweep. Defaults to GibsonAssemblyCost.cached()
+        :type cost_function: GibsonAssemblyCost
+        :param graph_backend: one of GRAPH_BACKENDS
+        :type graph_backend: str
+        """
+        if graph_backend not in self.GRAPH_BACKENDS:
+            raise ValueError("Graph backend '{}' not recognized. Select from {}".format(
+                graph_backend, self.GRAPH_BACKENDS))
         self.contig_container = contig_container
+        self._cost_function = cost_function
+        self.graph_backend = graph_backend
         self.graph = None
+        self.node_index = None
+        # expansions and distance computations of the last top_assemblies search
+        self.search_stats = None
         self.create_assembly_graph()
 
+    @property
+    def cost_function(self):
+        if self._cost_function is None:
+            logger.debug("loading GibsonAssemblyCost...")
+            self._cost_function = GibsonAssemblyCost.cached()
+        return self._cost_function
+
     @property
     def contigs(self):
         return self.contig_container.contigs
@@ -264,13 +301,17 @@ class Assembler(ContigContainer):
     #     self.graph = graph
 
     def create_assembly_graph(self):
-        return self.create_assembly_graph_using_starts_and_ends()
+        if self.graph_backend == "csr":
+            return self.create_assembly_graph_using_csr()
+        return self.create_assembly_graph_using_arrays()
+
+        # return self.create_assembly_graph_using_starts_and_ends()
 
         # return self.create_assembly_graph_using_contigs()
 
     def create_assembly_graph_using_contigs(self):
         # TODO: May want to use combinations instead
-        gac = GibsonAssemblyCost.load()
+        gac = self.cost_function
         gap_cost_dict = gac.gap_cost_dict(-500, 3000, e=2, syn=True)
 
 
@@ -303,7 +344,6 @@ class Assembler(ContigContainer):
                         cost = gap_cost_dict[gap]
                     if cost < 10000:
                         # LEFT
-                        n1 = pair(left.query.start, left.contig_id)
                         n1 = left.query.start
                         G.add_node(left.contig_id, data="end", y=left.contig_id, x=left.query.start)
                         G.add_node(right.contig_id, data="end", y=right.contig_id, x=right.query.end)
@@ -342,6 +382,66 @@ class Assembler(ContigContainer):
 
         self.graph = G
 
+    @staticmethod
+    def gap_pairs(contigs, query_length, min_gap, max_gap):
+        """
+        Finds every ordered (left, right) pair of contigs whose gap falls
+        strictly between min_gap and max_gap.
+
+        The gap is the distance from the end of the left contig to the start of the right contig.
+        If the left contig extends past the right contig, the pair closes the circular query and
+        the gap wraps around the origin ::
+
+            gap:            |---left---|  gap  |---right---|
+            closing gap:    |---right---|      |---left---|  (query_length - span)
+
+        Rather than testing every permutation of contigs, contigs are sorted by their
+        query starts and left points and candidate partners are found by binary search, so
+        the work is proportional to the number of contigs plus the number of pairs in the
+        window. Pairs are yielded in the same order as ``itertools.permutations(contigs, 2)``.
+
+        :param contigs: list of contigs
+        :type contigs: list
+        :param query_length: length of the (non-pseudocircular) query
+        :type query_length: int
+        :param min_gap: minimum gap span (exclusive)
+        :type min_gap: int
+        :param max_gap: maximum gap span (exclusive)
+        :type max_gap: int
+        :return: generator of (left, right, gap, closing) tuples
+        :rtype: generator
+        """
+        starts = [c.query.start for c in contigs]
+        ends = [c.query.end for c in contigs]
+        lps = [c.query.lp for c in contigs]
+        rps = [c.query.rp for c in contigs]
+
+        by_start = sorted(range(len(contigs)), key=lambda i: starts[i])
+        sorted_starts = [starts[i] for i in by_start]
+        by_lp = sorted(range(len(contigs)), key=lambda i: lps[i])
+        sorted_lps = [lps[i] for i in by_lp]
+
+        for i, left in enumerate(contigs):
+            # rights with gap = right.start - left.end inside the window
+            lo = bisect.bisect_right(sorted_starts, ends[i] + min_gap)
+            hi = bisect.bisect_left(sorted_starts, ends[i] + max_gap)
+            candidates = set(by_start[lo:hi])
+
+            # rights with closing gap = query_length - (left.rp - right.lp) inside the window
+            lo = bisect.bisect_right(sorted_lps, rps[i] - query_length + min_gap)
+            hi = bisect.bisect_left(sorted_lps, rps[i] - query_length + max_gap)
+            candidates.update(by_lp[lo:hi])
+
+            candidates.discard(i)
+            for j in sorted(candidates):
+                gap = starts[j] - ends[i]
+                closing = False
+                if rps[i] > lps[j]:
+                    gap = query_length - (rps[i] - lps[j])
+                    closing = True
+                if min_gap < gap < max_gap:
+                    yield left, contigs[j], gap, closing
+
     # Construct using starts and ends
     def create_assembly_graph_using_starts_and_ends(self):
         # TODO: May want to use combinations instead
@@ -356,59 +456,34 @@ class Assembler(ContigContainer):
             :return:
             :rtype:
             """
-            # n1 = pair(contig.query.start, contig.contig_id)
-            # n2 = pair(contig.query.end, contig.contig_id)
-            n1 = pair(contig.query.start, 0)
-            n2 = pair(contig.query.end, 1)
-            # n1 = contig.query.start
-            # n2 = contig.query.end
+            n1 = node_index.start(contig)
+            n2 = node_index.end(contig)
             G.add_node(n1, data="start", y=contig.contig_id, x=contig.query.start)
             G.add_node(n2, data="end", y=contig.contig_id, x=contig.query.end)
             G.add_edge(n1, n2, weight=float(25.0), type="fragment")
             return n1, n2
 
         # load the edge costs dictionary
-        logger.debug("loading GibsonAssemblyCost...")
-        gac = GibsonAssemblyCost.load()
+        gac = self.cost_function
         gap_cost_dict = gac.gap_cost_dict(-500, 3000, e=2, syn=True)
 
-        # pair all of the contigs by finding all permutations of 2
+        # pair only the contigs whose gaps fall within the gap window
         G = nx.DiGraph()
-        pairs = list(itertools.permutations(self.contigs, 2))
+        node_index = NodeIndex()
+        pairs = self.gap_pairs(self.contigs, self.query_length, self.MIN_GAP, self.MAX_GAP)
         logger.debug(f"Number of contigs {len(self.contigs)}")
-        logger.debug(f"Number of pairs {len(pairs)}")
         logger.debug("Creating assembly graph")
 
         # for each left and right pair,
-        for left, right in tqdm(pairs, desc="calculating gap costs"):
-            if left == right:
-                continue
-
-            gap = right.query.start - left.query.end
-            closing = False
-            if left.query.rp > right.query.lp:
-                gap = self.query_length - (left.query.rp - right.query.lp)
-                closing = True
-            # TODO: remove hard coded gap limiters
-            if gap is not None and -100 < gap < 2000:
-                # if right.contig_id not in edges[left.contig_id]:
-                #     edges[left.contig_id][right.contig_id] = None
-                try:
-                    jxn_cost = float("Inf")
-                    if gap in gap_cost_dict:
-                        jxn_cost = gap_cost_dict[gap]
-                    # TODO: remove hard coded max jxn_cost
-                    if jxn_cost < 10000:
-                        n1, n2 = add_nodes_from_contig(left)
-                        n3, n4 = add_nodes_from_contig(right)
-                        edge_type = "gap"
-                        if closing:
-                            edge_type = "closing_gap"
-                            # print(f"Closing gap: {left.query.end} {right.query.start}")
-                        G.add_edge(n2, n3, weight=float(jxn_cost), type=edge_type)
-                except KeyError:
-                    pass
-
+        for left, right, gap, closing in tqdm(pairs, desc="calculating gap costs"):
+            jxn_cost = gap_cost_dict.get(gap, float("Inf"))
+            if jxn_cost < self.MAX_JUNCTION_COST:
+                n1, n2 = add_nodes_from_contig(left)
+                n3, n4 = add_nodes_from_contig(right)
+                edge_type = "gap"
+                if closing:
+                    edge_type = "closing_gap"
+                G.add_edge(n2, n3, weight=float(jxn_cost), type=edge_type)
 
             # if right.query.rp > left.query.lp:
             #     closing_gap = self.expected_length - (right.query.rp - left.query.lp)
@@ -429,102 +504,368 @@ class Assembler(ContigContainer):
             #     except KeyError:
             #         pass
 
+        self.node_index = node_index
         self.graph = G
 
-    """
-    Assembly graph of all possible connections
-    Save list of edges and costs
-    (include closing edges)
-    Find shortest cycle
-    """
-    # TODO: finish dfs_iter
-    def dfs_iter(self, place_holder_size=5, data_plot=False):
-        logger.debug("DFS")
-        assemblies = []
-        best_costs_array = []
-        steps = []
-        step = 0
+    @staticmethod
+    def gap_pair_arrays(starts, ends, lps, rps, query_length, min_gap, max_gap):
+        """
+        Array version of :meth:`Assembler.gap_pairs`. Finds the indices of every ordered
+        (left, right) pair of contigs whose gap or closing gap falls strictly between min_gap and max_gap.
+
+        Candidate partners for every left contig are found at once using ``np.searchsorted``
+        over the sorted query starts and left points. Pairs are returned in the same
+        order as ``itertools.permutations``.
+
+        :param starts: query starts
+        :type starts: np.ndarray
+        :param ends: query ends
+        :type ends: np.ndarray
+        :param lps: query left points
+        :type lps: np.ndarray
+        :param rps: query right points
+        :type rps: np.ndarray
+        :param query_length: length of the (non-pseudocircular) query
+        :type query_length: int
+        :param min_gap: minimum gap span (exclusive)
+        :type min_gap: int
+        :param max_gap: maximum gap span (exclusive)
+        :type max_gap: int
+        :return: left indices, right indices, gaps and closing flags
+        :rtype: tuple
+        """
+        n = len(starts)
+
+        def window(values, lower, upper):
+            order = np.argsort(values, kind="stable")
+            sorted_values = values[order]
+            lo = np.searchsorted(sorted_values, lower, side="right")
+            hi = np.maximum(np.searchsorted(sorted_values, upper, side="left"), lo)
+            counts = hi - lo
+            left = np.repeat(np.arange(n), counts)
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            right = order[np.repeat(lo, counts) + offsets]
+            return left, right
+
+        # rights with gap = right.start - left.end inside the window
+        l1, r1 = window(starts, ends + min_gap, ends + max_gap)
+
+        # rights with closing gap = query_length - (left.rp - right.lp) inside the window
+        l2, r2 = window(lps, rps - query_length + min_gap, rps - query_length + max_gap)
+
+        keys = np.unique(np.concatenate([l1 * n + r1, l2 * n + r2]))
+        left, right = keys // n, keys % n
+        not_self = left != right
+        left, right = left[not_self], right[not_self]
+
+        closing = rps[left] > lps[right]
+        gaps = np.where(closing, query_length - (rps[left] - lps[right]), starts[right] - ends[left])
+        in_window = (min_gap < gaps) & (gaps < max_gap)
+        return left[in_window], right[in_window], gaps[in_window], closing[in_window]
+
+    def gap_cost_array(self, gac, min_gap, max_gap):
+        """
+        Dense junction cost array. Entry (gap - min_gap) contains the cost for that gap span.
+        Like :meth:`create_assembly_graph_using_starts_and_ends`, every junction is priced
+        as having both ends extendable.
+
+        :param gac: the junction cost function
+        :type gac: GibsonAssemblyCost
+        :param min_gap: minimum gap span (inclusive)
+        :type min_gap: int
+        :param max_gap: maximum gap span (inclusive)
+        :type max_gap: int
+        :return: cost array of length max_gap - min_gap + 1
+        :rtype: np.ndarray
+        """
+        return gac.gap_cost_array(min_gap, max_gap, e=2, syn=True)
+
+    def _query_arrays(self):
+        """
+        Query starts, ends, left and right points and contig ids of the contigs.
+        Read directly from the table of a :class:`ColumnarContigContainer`.
+        """
+        cc = self.contig_container
+        if isinstance(cc, ColumnarContigContainer):
+            return (
+                cc.column("query_start"),
+                cc.column("query_end"),
+                cc.query_lp,
+                cc.query_rp,
+                cc.column("contig_id"),
+            )
+        contigs = self.contigs
+        return (
+            np.array([c.query.start for c in contigs], dtype=np.int64),
+            np.array([c.query.end for c in contigs], dtype=np.int64),
+            np.array([c.query.lp for c in contigs], dtype=np.int64),
+            np.array([c.query.rp for c in contigs], dtype=np.int64),
+            np.array([c.contig_id for c in contigs]),
+        )
+
+    def _assembly_graph_arrays(self):
+        """
+        Nodes and edges of the assembly graph as arrays.
+
+        Query positions are pulled into arrays once. Gaps, closing gaps
+        and junction costs of every candidate pair are computed as array operations.
+        Every contig in a junction has its own start and end node, in order of first appearance.
 
-        sorted_contigs = sorted(self.contigs, key=lambda x: len(x.query), reverse=True)
-        stack = []
+        :return: dictionary of the NodeIndex, node sides (0 start, 1 end), positions and contig ids,
+                 fragment edge sources and targets, and gap edge sources, targets, costs and closing flags
+        :rtype: dict
+        """
+        # load the edge costs array
+        gac = self.cost_function
+        cost_array = self.gap_cost_array(gac, self.MIN_GAP, self.MAX_GAP)
 
-        available_contigs = [x.contig_id for x in sorted_contigs]
-        # for x in self.closing_edges:
-        #     for y in self.closing_edges[x]:
-        #         if y not in available_contigs:
-        #             available_contigs.append(y)
+        starts, ends, lps, rps, contig_ids = self._query_arrays()
+        logger.debug(f"Number of contigs {len(starts)}")
+        logger.debug("Creating assembly graph")
 
-        for c in available_contigs:
-            a = Assembly([c], self.contig_container)
-            stack.append(a)
+        left, right, gaps, closing = self.gap_pair_arrays(starts, ends, lps, rps, self.query_length,
+                                                          self.MIN_GAP, self.MAX_GAP)
+
+        # look up junction costs; non-integer gaps have no cost
+        costs = np.full(len(gaps), float("Inf"))
+        integral = np.mod(gaps, 1) == 0
+        costs[integral] = cost_array[gaps[integral].astype(np.int64) - self.MIN_GAP]
+        keep = costs < self.MAX_JUNCTION_COST
+        left, right, costs, closing = left[keep], right[keep], costs[keep], closing[keep]
+        logger.debug(f"Number of junctions {len(costs)}")
+
+        # contigs in the order they are first touched by a junction (left, right, left, right, ...)
+        touched = np.stack([left, right], axis=1).ravel()
+        _, first_touched = np.unique(touched, return_index=True)
+        fragments = touched[np.sort(first_touched)]
+
+        # every touched contig gets a start node (2 * rank) and an end node (2 * rank + 1)
+        rank = np.full(len(starts), -1, dtype=np.int64)
+        rank[fragments] = np.arange(len(fragments))
+        node_contig_index = np.repeat(fragments, 2)
+        node_sides = np.tile(np.array([NodeIndex.START, NodeIndex.END]), len(fragments))
+        node_index = NodeIndex(zip(contig_ids[node_contig_index].tolist(), node_sides.tolist()))
+
+        return dict(
+            node_index=node_index,
+            node_sides=node_sides,
+            node_x=np.where(node_sides == NodeIndex.START, starts[node_contig_index], ends[node_contig_index]),
+            node_contigs=contig_ids[node_contig_index],
+            fragment_sources=2 * rank[fragments],
+            fragment_targets=2 * rank[fragments] + 1,
+            gap_sources=2 * rank[left] + 1,
+            gap_targets=2 * rank[right],
+            gap_costs=costs,
+            closing=closing,
+        )
+
+    # Construct using starts and ends, evaluated in batch
+    def create_assembly_graph_using_arrays(self):
+        """
+        Batched version of :meth:`create_assembly_graph_using_starts_and_ends`.
 
-        best_costs = [float("Inf")] * place_holder_size  # e.g. five best costs
+        The nodes and edges from :meth:`_assembly_graph_arrays` are bulk inserted into the graph.
+        """
+        arrays = self._assembly_graph_arrays()
+        edge_types = np.where(arrays['closing'], "closing_gap", "gap")
 
-        while stack:
-            step += 1
-            steps.append(step)
-            best_costs.sort()
-            assembly = stack.pop()
+        G = nx.DiGraph()
+        G.add_nodes_from(
+            (node_id, dict(data=AssemblyGraph.NODE_TYPES[side], y=contig_id, x=x))
+            for node_id, (side, x, contig_id) in enumerate(zip(arrays['node_sides'].tolist(),
+                                                               arrays['node_x'].tolist(),
+                                                               arrays['node_contigs'].tolist()))
+        )
+        G.add_edges_from(
+            zip(arrays['fragment_sources'].tolist(), arrays['fragment_targets'].tolist()),
+            weight=float(25.0), type="fragment"
+        )
+        G.add_edges_from(
+            (n2, n3, dict(weight=cost, type=edge_type)) for n2, n3, cost, edge_type in zip(
+                arrays['gap_sources'].tolist(), arrays['gap_targets'].tolist(),
+                arrays['gap_costs'].tolist(), edge_types.tolist())
+        )
+        self.node_index = arrays['node_index']
+        self.graph = G
 
-            pairs = assembly.assembly_pair_ids()
-            if len(pairs) > 0 and pairs[0] == (105, 157):
-                pass
-            gap_costs = []
-            for xid, yid in pairs:
-                cost = float("Inf")
-                if xid in self.edges:
-                    x = self.edges[xid]
-                    if yid in x:
-                        cost = x[yid]
-                gap_costs.append(cost)
-
-            left = assembly.contigs[0]
-            right = assembly.contigs[-1]
-            closing_cost = self.query_length - (right.query.rp - left.query.lp)
-
-            gap_cost = sum(gap_costs)
-            if gap_cost > best_costs[-1]:
+    # Construct using starts and ends, as a compact graph
+    def create_assembly_graph_using_csr(self):
+        """
+        Compact version of :meth:`create_assembly_graph_using_arrays`. The graph is
+        stored as an :class:`AssemblyGraph` with the same node ids.
+        """
+        arrays = self._assembly_graph_arrays()
+        n_fragments = len(arrays['fragment_sources'])
+        self.node_index = arrays['node_index']
+        self.graph = AssemblyGraph.from_edges(
+            np.arange(len(self.node_index)),
+            arrays['node_sides'],
+            arrays['node_x'],
+            arrays['node_contigs'],
+            np.concatenate([arrays['fragment_sources'], arrays['gap_sources']]),
+            np.concatenate([arrays['fragment_targets'], arrays['gap_targets']]),
+            np.concatenate([np.full(n_fragments, 25.0), arrays['gap_costs']]),
+            np.concatenate([np.full(n_fragments, AssemblyGraph.FRAGMENT),
+                            np.where(arrays['closing'], AssemblyGraph.CLOSING_GAP, AssemblyGraph.GAP)]),
+        )
+
+    """
+    Assembly graph of all possible connections
+    Save list of edges and costs
+    (include closing edges)
+    Find shortest cycle
+    """
+    @staticmethod
+    def _distances_to(target, graph, deadline=None):
+        """
+        Shortest path distance to target from every node that can reach it without a closing gap
+        (Dijkstra over the reversed graph)
+
+        :param target: target node
+        :type target: int
+        :param graph: reversed graph, as a tuple of indptr, indices, weights and types lists
+        :type graph: tuple
+        :param deadline: time (as returned by time.time()) after which to give up. Unbounded if None.
+        :type deadline: float
+        :return: dictionary of node to distance, or None if the deadline passed
+        :rtype: dict
+        """
+        indptr, indices, weights, types = graph
+        dist = {target: 0.0}
+        heap = [(0.0, target)]
+        pops = 0
+        while heap:
+            pops += 1
+            if deadline is not None and pops % 256 == 0 and time.time() > deadline:
+                return None
+            d, n = heapq.heappop(heap)
+            if d > dist[n]:
                 continue
+            for j in range(indptr[n], indptr[n + 1]):
+                if types[j] == AssemblyGraph.CLOSING_GAP:
+                    continue
+                m = indices[j]
+                nd = d + weights[j]
+                if nd < dist.get(m, float("Inf")):
+                    dist[m] = nd
+                    heapq.heappush(heap, (nd, m))
+        return dist
+
+    def top_assemblies(self, k=5, max_expansions=None, timeout=None):
+        """
+        Find the k cheapest circular assemblies in the assembly graph.
+
+        A circular assembly is a simple cycle that uses exactly one closing gap edge. Each cycle
+        starts at a closing gap, and the distance from every node back to the source of that gap
+        is computed with Dijkstra the first time the search reaches it. Until then the cost of the
+        closing gap alone is used as the estimate, which never overestimates the cost of a cycle.
+        These distances guide a best-first search over partial cycles, so complete cycles are found
+        in order of cost and the search stops at the k-th. Partial cycles only keep a link to their
+        parent, so paths are never copied.
+
+        max_expansions bounds the number of partial cycles expanded; each expansion computes at most
+        one set of distances, which runs to completion. The timeout also bounds the distance
+        computations. The linear time setup (converting a networkx graph and building the adjacency
+        lists) always runs to completion. The number of expansions and distance computations of the
+        search are kept in :attr:`search_stats`.
+
+        The search runs on the compact :class:`AssemblyGraph`; a networkx graph is converted first.
+
+        :param k: number of assemblies to return
+        :type k: int
+        :param max_expansions: maximum number of partial cycles to expand. Unbounded if None.
+        :type max_expansions: int
+        :param timeout: maximum number of seconds to search. Unbounded if None.
+        :type timeout: float
+        :return: up to k Assemblies sorted by cost. Each has a ``cost`` and the graph ``nodes`` of its cycle,
+                 from the start of the first contig to the end of the last contig, which closes back to the first.
+        :rtype: list
+        """
+        t0 = time.time()
+        deadline = None
+        if timeout is not None:
+            deadline = t0 + timeout
+        graph = self.graph
+        converted = not isinstance(graph, AssemblyGraph)
+        if converted:
+            graph = AssemblyGraph.from_networkx(graph)
+        indptr, indices, weights, types = (graph.indptr.tolist(), graph.indices.tolist(),
+                                           graph.weights.tolist(), graph.types.tolist())
+        reverse = graph.reverse()
+        reverse = (reverse.indptr.tolist(), reverse.indices.tolist(),
+                   reverse.weights.tolist(), reverse.types.tolist())
+        is_closing = graph.types == AssemblyGraph.CLOSING_GAP
+        closing = list(zip(graph.sources[is_closing].tolist(), graph.indices[is_closing].tolist(),
+                           graph.weights[is_closing].tolist()))
+
+        # distances to each closing gap source, which is where its cycles end, computed on first use
+        distances = {}
+
+        # partial cycles are (estimated cost, cost, counter, node, origin, (node, parent link))
+        counter = itertools.count()
+        heap = [(w, w, next(counter), n2, n1, (n2, None)) for n1, n2, w in closing if n1 != n2]
+        heapq.heapify(heap)
+
+        node_keys = graph.node_keys.tolist()
+        node_sides = graph.node_sides.tolist()
+        node_contigs = graph.node_contigs.tolist()
 
-            cost = gap_cost + closing_cost
-            assembly.cost = cost
-            if gap_cost > 10000:
+        assemblies = []
+        expansions = 0
+        while heap and len(assemblies) < k:
+            if max_expansions is not None and expansions >= max_expansions:
+                logger.debug(f"Assembly search stopped after {expansions} expansions")
+                break
+            if deadline is not None and time.time() > deadline:
+                logger.debug(f"Assembly search stopped after {timeout} seconds")
+                break
+            expansions += 1
+
+            estimate, cost, _, node, origin, link = heapq.heappop(heap)
+            if origin not in distances:
+                dist = self._distances_to(origin, reverse, deadline=deadline)
+                if dist is None:
+                    logger.debug(f"Assembly search stopped after {timeout} seconds")
+                    break
+                distances[origin] = dist
+            h = distances[origin].get(node)
+            if h is None:
+                continue
+            if cost + h > estimate:
+                # the estimate was made before the distances to the origin were known
+                heapq.heappush(heap, (cost + h, cost, next(counter), node, origin, link))
                 continue
 
-                # if cost > best_costs[-1]:
-                #     continue
-                # cost can only get worst, so trim this search
+            path = []
+            parent = link
+            while parent is not None:
+                path.append(parent[0])
+                parent = parent[1]
+
+            if node == origin:
+                nodes = path[::-1]
+                contig_ids = [node_contigs[n] for n in nodes if node_sides[n] == NodeIndex.START]
+                if converted:
+                    # report networkx node keys rather than compact node ids
+                    nodes = [node_keys[n] for n in nodes]
+                assembly = Assembly(contig_ids, self.contig_container)
+                assembly.cost = cost
+                assembly.nodes = nodes
+                assemblies.append(assembly)
+                continue
 
-            new_assembly_paths = []
-            n = assembly.last.contig_id
-            if n == 105:
-                pass
-            if n in self.graph:
-                child_ids = self.graph[n]
-                if child_ids:
-                    for child_id in child_ids:
-                        assembly_copy = copy(assembly)
-                        assembly_copy.assembly_path = assembly.assembly_path[:] + [child_id]
-                        new_assembly_paths.append(assembly_copy)
-
-            for assembly_path in new_assembly_paths:
-                if assembly_path.can_extend():
-                    stack.append(assembly_path)
-
-            if cost < best_costs[-1]:
-                best_costs[-1] = cost
-                print(self.query_length)
-                print(gap_cost)
-                print(closing_cost)
-                print(best_costs)
-                print(assembly.contigs)
-                if data_plot:
-                    best_costs_array.append(best_costs[:])
-            assembly.best_cost = assembly.cost
-            assemblies.append(assembly)
-            # end of path
-        assemblies = sorted(assemblies, key=lambda x: x.cost)
-
-        if data_plot:
-            return assemblies, list(zip(steps, best_costs_array))
+            dist = distances[origin]
+            visited = set(path)
+            for j in range(indptr[node], indptr[node + 1]):
+                m = indices[j]
+                h = dist.get(m)
+                if h is None or m in visited or types[j] == AssemblyGraph.CLOSING_GAP:
+                    continue
+                w = weights[j]
+                heapq.heappush(heap, (cost + w + h, cost + w, next(counter), m, origin, (m, link)))
+        self.search_stats = {'expansions': expansions, 'distance_computations': len(distances)}
         return assemblies
+
+    def dfs_iter(self, place_holder_size=5):
+        """The place_holder_size cheapest circular assemblies. See :meth:`Assembler.top_assemblies`"""
+        return self.top_assemblies(k=place_holder_size)
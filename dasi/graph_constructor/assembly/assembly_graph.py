@@ -0,0 +1,177 @@
+import networkx as nx
+import numpy as np
+
+
+class AssemblyGraph(object):
+    """
+    Compact assembly graph.
+
+    Nodes are the contiguous integers 0 to n - 1. Node attributes are kept in parallel
+    arrays and edges are kept as CSR adjacency arrays: the outgoing edges of node i are
+    ``indices[indptr[i]:indptr[i + 1]]`` with the matching ``weights`` and ``types``.
+    """
+
+    NODE_TYPES = ["start", "end"]
+    EDGE_TYPES = ["fragment", "gap", "closing_gap"]
+    FRAGMENT = 0
+    GAP = 1
+    CLOSING_GAP = 2
+
+    def __init__(self, node_keys, node_sides, node_x, node_contigs, indptr, indices, weights, types):
+        """
+
+        :param node_keys: key of each node in the networkx version of the graph
+        :type node_keys: np.ndarray
+        :param node_sides: 0 for contig start nodes and 1 for contig end nodes
+        :type node_sides: np.ndarray
+        :param node_x: query position of each node
+        :type node_x: np.ndarray
+        :param node_contigs: contig id of each node
+        :type node_contigs: np.ndarray
+        :param indptr: CSR row pointers, of length number of nodes + 1
+        :type indptr: np.ndarray
+        :param indices: CSR target node of each edge
+        :type indices: np.ndarray
+        :param weights: weight of each edge
+        :type weights: np.ndarray
+        :param types: index into EDGE_TYPES of each edge
+        :type types: np.ndarray
+        """
+        self.node_keys = node_keys
+        self.node_sides = node_sides
+        self.node_x = node_x
+        self.node_contigs = node_contigs
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.types = types
+        self._reverse = None
+
+    @classmethod
+    def from_edges(cls, node_keys, node_sides, node_x, node_contigs, sources, targets, weights, types):
+        """
+        Create a graph from a list of edges. As in ``nx.DiGraph``, a repeated edge keeps the
+        position of its first appearance and the weight and type of its last appearance.
+
+        :param sources: source node of each edge
+        :type sources: np.ndarray
+        :param targets: target node of each edge
+        :type targets: np.ndarray
+        :param weights: weight of each edge
+        :type weights: np.ndarray
+        :param types: index into EDGE_TYPES of each edge
+        :type types: np.ndarray
+        :return: the graph
+        :rtype: AssemblyGraph
+        """
+        n = len(node_keys)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        weights = np.asarray(weights, dtype=float)
+        types = np.asarray(types, dtype=np.int8)
+
+        edge_keys = sources * n + targets
+        _, first = np.unique(edge_keys, return_index=True)
+        _, last = np.unique(edge_keys[::-1], return_index=True)
+        last = len(edge_keys) - 1 - last
+        order = np.argsort(first, kind="stable")
+        first, last = first[order], last[order]
+
+        # group edges by source, keeping their order within each source
+        by_source = np.argsort(sources[first], kind="stable")
+        first, last = first[by_source], last[by_source]
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources[first], minlength=n), out=indptr[1:])
+        return cls(
+            np.asarray(node_keys, dtype=np.int64),
+            np.asarray(node_sides, dtype=np.int8),
+            np.asarray(node_x),
+            np.asarray(node_contigs),
+            indptr,
+            targets[first],
+            weights[last],
+            types[last],
+        )
+
+    @classmethod
+    def from_networkx(cls, G):
+        """
+        Create a compact graph from a networkx assembly graph.
+
+        :param G: assembly graph with start/end node ``data``, ``x`` and ``y`` attributes
+                  and ``weight`` and ``type`` edge attributes
+        :type G: nx.DiGraph
+        :return: the graph
+        :rtype: AssemblyGraph
+        """
+        node_keys = list(G.nodes)
+        index = {key: i for i, key in enumerate(node_keys)}
+        node_data = [G.nodes[key] for key in node_keys]
+        edges = list(G.edges(data=True))
+        return cls.from_edges(
+            node_keys,
+            [cls.NODE_TYPES.index(d['data']) for d in node_data],
+            [d['x'] for d in node_data],
+            [d['y'] for d in node_data],
+            [index[n1] for n1, _, _ in edges],
+            [index[n2] for _, n2, _ in edges],
+            [d['weight'] for _, _, d in edges],
+            [cls.EDGE_TYPES.index(d['type']) for _, _, d in edges],
+        )
+
+    def __len__(self):
+        return len(self.node_keys)
+
+    def number_of_nodes(self):
+        return len(self.node_keys)
+
+    def number_of_edges(self):
+        return len(self.indices)
+
+    @property
+    def nbytes(self):
+        arrays = [self.node_keys, self.node_sides, self.node_x, self.node_contigs,
+                  self.indptr, self.indices, self.weights, self.types]
+        return sum(a.nbytes for a in arrays)
+
+    @property
+    def sources(self):
+        """Source node of each edge"""
+        return np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.indptr))
+
+    def successors(self, node):
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def edges(self):
+        """Iterates over (source, target, weight, type name) of every edge"""
+        names = self.EDGE_TYPES
+        for n1, n2, weight, edge_type in zip(self.sources.tolist(), self.indices.tolist(),
+                                             self.weights.tolist(), self.types.tolist()):
+            yield n1, n2, weight, names[edge_type]
+
+    def reverse(self):
+        """The graph with every edge reversed. Computed once."""
+        if self._reverse is None:
+            self._reverse = AssemblyGraph.from_edges(self.node_keys, self.node_sides, self.node_x, self.node_contigs,
+                                                     self.indices, self.sources, self.weights, self.types)
+            self._reverse._reverse = self
+        return self._reverse
+
+    def to_networkx(self):
+        """
+        Export to a ``nx.DiGraph`` keyed by ``node_keys`` with the same attributes
+        as :meth:`Assembler.create_assembly_graph_using_arrays`, e.g. for visualization.
+
+        :return: the graph
+        :rtype: nx.DiGraph
+        """
+        keys = self.node_keys.tolist()
+        G = nx.DiGraph()
+        G.add_nodes_from(
+            (key, dict(data=self.NODE_TYPES[side], y=contig_id, x=x)) for key, side, x, contig_id in zip(
+                keys, self.node_sides.tolist(), self.node_x.tolist(), self.node_contigs.tolist())
+        )
+        G.add_edges_from(
+            (keys[n1], keys[n2], dict(weight=weight, type=edge_type)) for n1, n2, weight, edge_type in self.edges()
+        )
+        return G
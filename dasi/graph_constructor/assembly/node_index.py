@@ -0,0 +1,54 @@
+class NodeIndex(object):
+    """
+    Maps node keys to dense integer ids (0, 1, 2, ...) in order of insertion.
+
+    Assembly graph nodes are keyed by (contig_id, side) so that contigs sharing a
+    start or end position keep their own nodes.
+    """
+
+    START = 0
+    END = 1
+
+    def __init__(self, keys=()):
+        self._ids = {}
+        self.keys = []
+        for key in keys:
+            self.add(key)
+
+    def add(self, key):
+        """
+        Add a key if it is not already indexed.
+
+        :param key: hashable node key, e.g. (contig_id, NodeIndex.START)
+        :return: id of the key
+        :rtype: int
+        """
+        node_id = self._ids.get(key)
+        if node_id is None:
+            node_id = len(self.keys)
+            self._ids[key] = node_id
+            self.keys.append(key)
+        return node_id
+
+    def start(self, contig):
+        """Adds and returns the id of the start node of a contig"""
+        return self.add((contig.contig_id, self.START))
+
+    def end(self, contig):
+        """Adds and returns the id of the end node of a contig"""
+        return self.add((contig.contig_id, self.END))
+
+    def key(self, node_id):
+        return self.keys[node_id]
+
+    def __getitem__(self, key):
+        return self._ids[key]
+
+    def __contains__(self, key):
+        return key in self._ids
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __iter__(self):
+        return iter(self.keys)
@@ -0,0 +1,184 @@
+"""
+Sharded BLAST alignments.
+
+Subjects are split into shards of about the same total length. Each shard is aligned
+against the query with its own BLAST database in a separate process, and the results are
+merged in shard order. Every shard is searched with the length of the whole database
+(dbsize), so e-values are close to those of a single search against all subjects. They are
+not identical: BLAST's length adjustment of the search space counts only the sequences of
+the shard, so e-values of a shard differ slightly (by a few percent for typical queries).
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from pyblast import JSONBlast
+
+from dasi.graph_constructor.models import ContigContainer
+
+
+def sequence_length(sequence):
+    """Length of a sequence given as a dictionary (with 'bases' or 'sequence') or as a row with bases"""
+    if isinstance(sequence, dict):
+        bases = sequence.get('bases')
+        if bases is None:
+            bases = sequence.get('sequence')
+    else:
+        bases = sequence.bases
+    return len(bases or '')
+
+
+def sequence_dict(sequence):
+    """
+    Plain dictionary of a preloaded sequence (e.g. a Sequence row), which can be sent to another process.
+    Dictionaries are returned unchanged.
+    """
+    if isinstance(sequence, dict):
+        return sequence
+    return {
+        'id': sequence.id,
+        'name': sequence.name,
+        'bases': sequence.bases,
+        'circular': bool(getattr(sequence, 'circular', False)),
+    }
+
+
+def database_length(sequences, span_origin=False):
+    """
+    Total length of a BLAST database of the sequences. Circular sequences are counted twice if span_origin
+    is True, as they are pseudocircularized.
+    """
+    total = 0
+    for s in sequences:
+        circular = s.get('circular') if isinstance(s, dict) else getattr(s, 'circular', False)
+        length = sequence_length(s)
+        if span_origin and circular:
+            length *= 2
+        total += length
+    return total
+
+
+def shard_sequences(sequences, num_shards):
+    """
+    Splits sequences into at most num_shards shards of about the same total length. The longest sequences are
+    placed first, each into the shard with the least total length. Sequences keep their order within a shard.
+
+    :param sequences: list of sequences
+    :type sequences: list
+    :param num_shards: number of shards
+    :type num_shards: int
+    :return: list of shards (lists of sequences), without empty shards
+    :rtype: list
+    """
+    if num_shards < 1:
+        raise ValueError("Number of shards must be at least 1, not {}".format(num_shards))
+    lengths = [sequence_length(s) for s in sequences]
+    totals = [0] * num_shards
+    assignments = [[] for _ in range(num_shards)]
+    for i in sorted(range(len(sequences)), key=lambda i: -lengths[i]):
+        shard = totals.index(min(totals))
+        totals[shard] += lengths[i]
+        assignments[shard].append(i)
+    return [[sequences[i] for i in sorted(indices)] for indices in assignments if indices]
+
+
+def blast_shard(shard):
+    """
+    Aligns one shard of subjects against the query.
+
+    :param shard: tuple of (subjects, query, method, perfect, blast_kwargs)
+    :type shard: tuple
+    :return: tuple of the alignments and the sequences of the shard
+    :rtype: tuple
+    """
+    subjects, query, method, perfect, blast_kwargs = shard
+    blast = JSONBlast(subjects, query, **blast_kwargs)
+    getattr(blast, method)()
+    results = blast.results
+    if perfect:
+        results = results.get_perfect()
+    return list(results.alignments or []), list(blast.seq_dict.values())
+
+
+class ShardedBlast(object):
+    """
+    Aligns a query against subjects split across several BLAST databases, running the shards
+    concurrently in a process pool ::
+
+        blast = ShardedBlast(subjects, query, span_origin=True)
+        blast.quick_blastn()
+        cc = blast.contig_container()
+
+    Preloaded sequences (``preloaded=True``, e.g. Sequence rows) are converted to plain dictionaries
+    with :func:`sequence_dict` before they are sent to the pool.
+    """
+
+    def __init__(self, subjects, query, num_shards=None, processes=None, **blast_kwargs):
+        """
+        :param subjects: subject sequences
+        :type subjects: list
+        :param query: query sequence
+        :param num_shards: number of BLAST databases; defaults to the number of processes
+        :type num_shards: int
+        :param processes: number of processes; defaults to the number of cores
+        :type processes: int
+        :param blast_kwargs: keyword arguments for each shard's JSONBlast. dbsize defaults to the length
+                             of a database of all subjects (see :func:`database_length`).
+        """
+        if blast_kwargs.get('preloaded'):
+            subjects = [sequence_dict(s) for s in subjects]
+            query = sequence_dict(query)
+        self.query = query
+        self.processes = processes or os.cpu_count() or 1
+        self.shards = shard_sequences(subjects, num_shards or self.processes)
+        blast_kwargs.setdefault('dbsize', database_length(subjects, span_origin=blast_kwargs.get('span_origin')))
+        self.blast_kwargs = blast_kwargs
+        self.alignments = []
+        self.sequences = []
+
+    def run(self, method="quick_blastn", perfect=False):
+        """
+        Runs a BLAST method (e.g. "quick_blastn" or "quick_blastn_short") on every shard and merges the results.
+
+        :param method: name of the JSONBlast method to run
+        :type method: str
+        :param perfect: whether to keep only perfect alignments (see get_perfect)
+        :type perfect: bool
+        :return: merged alignments
+        :rtype: list
+        """
+        jobs = [(shard, self.query, method, perfect, self.blast_kwargs) for shard in self.shards]
+        if self.processes == 1 or len(jobs) <= 1:
+            results = [blast_shard(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=min(self.processes, len(jobs))) as executor:
+                results = list(executor.map(blast_shard, jobs))
+        self.alignments = []
+        sequences = {}
+        for alignments, seqs in results:
+            self.alignments += alignments
+            for seq in seqs:
+                sequences.setdefault(seq['id'], seq)
+        self.sequences = list(sequences.values())
+        return self.alignments
+
+    @property
+    def seq_dict(self):
+        """Sequences of the last run by id"""
+        return {seq['id']: seq for seq in self.sequences}
+
+    def quick_blastn(self, perfect=False):
+        return self.run("quick_blastn", perfect=perfect)
+
+    def quick_blastn_short(self, perfect=False):
+        return self.run("quick_blastn_short", perfect=perfect)
+
+    def contig_container(self, container=ContigContainer):
+        """
+        Creates a contig container from the merged alignments
+
+        :param container: container class
+        :type container: type
+        :return: new container
+        """
+        return container.parse_alignments(self.alignments, self.sequences)
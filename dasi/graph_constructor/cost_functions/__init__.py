@@ -1 +1,2 @@
 from .gibson_assembly_cost_function import GibsonAssemblyCost
+from .parameter_sweep import sweep
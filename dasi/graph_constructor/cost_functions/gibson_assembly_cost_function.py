@@ -1,6 +1,8 @@
+import hashlib
 import itertools
 import json
 import os
+import tempfile
 import time
 
 import numpy as np
@@ -73,13 +75,61 @@ class GibsonAssemblyCost(object):
 
     JUNCTION_GAP_SPAN_RANGE = (-300, 1000, 5)
 
-    def __init__(self):
+    # (number of extendable ends, synthesis) for each row of the score table
+    CONDITIONS = [
+        (0, False),
+        (1, False),
+        (2, False),
+        (0, True),
+        (1, True),
+        (2, True),
+    ]
+    SCORE_SPAN_RANGE = (-500, 5000)
+
+    # class attributes that determine the primer (non-synthesis) tables
+    PRIMER_PARAMETERS = [
+        "PRIMER_EXTENSION",
+        "PRIMER_COST",
+        "ULTRAMER_EXTENSION",
+        "ULTRAMER_COST",
+        "INF",
+        "JUNCTION_EFFICIENCY",
+        "JUNCTION_GAP_SPAN_RANGE",
+    ]
+
+    # class attributes that, together with PRIMER_PARAMETERS, determine the synthesis tables
+    SYNTHESIS_PARAMETERS = [
+        "GENE_SYNTHESIS_COST_RANGES",
+        "SYNTHESIS_GAP_SPAN_RANGE",
+        "SYNTHESIS_SIZE_OPTIONS",
+    ]
+
+    # class attributes that determine the computed tables
+    PARAMETERS = PRIMER_PARAMETERS + SYNTHESIS_PARAMETERS + [
+        "CONDITIONS",
+        "SCORE_SPAN_RANGE",
+    ]
+
+    # per process cache of loaded or computed instances, keyed by class and parameter hash
+    _cache = {}
+
+    def __init__(self, **parameters):
+        """
+        :param parameters: optional overrides of the class parameters listed in PARAMETERS,
+                           e.g. GibsonAssemblyCost(PRIMER_COST=0.3)
+        """
+        for name, value in parameters.items():
+            if name not in self.PARAMETERS:
+                raise ValueError("'{}' is not a {} parameter. Parameters are {}".format(
+                    name, self.__class__.__name__, self.PARAMETERS))
+            setattr(self, name, value)
         self._gap_cost_dict_both_extendable = None
         self._gap_cost_dict_one_extendable = None
         self._gap_cost_dict_none_extendable = None
         self._gap_cost_dict_synthesis_none_extendable = None
         self._gap_cost_dict_synthesis_one_extendable = None
         self._gap_cost_dict_synthesis_extendable = None
+        self._score_table = None
 
     # -----------------------------------------------
     # Properties
@@ -151,78 +201,81 @@ class GibsonAssemblyCost(object):
     def _junction_efficiency(self, overlap):
         return self.find_in_range(overlap, self.JUNCTION_EFFICIENCY)
 
+    def _junction_efficiency_array(self, overlaps):
+        """
+        Array version of _junction_efficiency. JUNCTION_EFFICIENCY ranges
+        must be sorted and non-overlapping. Overlaps outside of every range have an
+        efficiency of 0.
+
+        :param overlaps: array of overlaps
+        :type overlaps: np.ndarray
+        :return: array of junction efficiencies
+        :rtype: np.ndarray
+        """
+        lowers = np.array([r['lower'] for r in self.JUNCTION_EFFICIENCY], dtype=float)
+        uppers = np.array([r['upper'] for r in self.JUNCTION_EFFICIENCY], dtype=float)
+        efficiencies = np.array([r['cost'] for r in self.JUNCTION_EFFICIENCY], dtype=float)
+        index = np.searchsorted(lowers, overlaps, side='right') - 1
+        within = (index >= 0) & (overlaps <= uppers[np.maximum(index, 0)])
+        return np.where(within, efficiencies[np.maximum(index, 0)], 0.0)
+
     def _optimize_primer(self, primer_choices):
         """
         Create a dictionary of gap_span to best_extension case.
 
-        :param gap_span_start:
-        :type gap_span_start:
-        :param gap_span_end:
-        :type gap_span_end:
-        :param gap_span_step:
-        :type gap_span_step:
-        :param primer_choices:
-        :type primer_choices:
-        :return:
-        :rtype:
+        The total extension and cost of every choice is computed once and every choice
+        is scored against each gap span as an array.
+
+        :param primer_choices: list of primer options or tuples of primer options
+        :type primer_choices: list
+        :return: dictionary of gap_span to best extension case
+        :rtype: dict
         """
         results = {}
 
+        choices = [choice if isinstance(choice, tuple) else (choice,) for choice in primer_choices]
+        total_extensions = np.array([sum([x['extension'] for x in choice]) for choice in choices], dtype=float)
+        total_costs = np.array([sum([x['cost'] for x in choice]) for choice in choices], dtype=float)
+
         # iterate through gap span
         for gap_span in range(*self.JUNCTION_GAP_SPAN_RANGE):
-            results[gap_span] = None
-            for choice in primer_choices:
-                if not isinstance(choice, tuple):
-                    choice = (choice,)
-                extensions = [x['extension'] for x in choice]
-                costs = [x['cost'] for x in choice]
-                names = [x['name'] for x in choice]
-
-                total_extension = sum(extensions)
-                total_cost = sum(costs)
-                junction_efficiency = self._junction_efficiency(-gap_span + total_extension)
-
-                # score
-                score = self.INF
-                if junction_efficiency > 0:
-                    score = total_cost / junction_efficiency
-
-                _x = results[gap_span]
-                if _x is None or score < _x['score']:
-                    results[gap_span] = {
-                        "score": score,
-                        "cost": total_cost,
-                        "efficiency": junction_efficiency,
-                        "condition": f"{names}",
-                        "extension": f"{extensions}"
-                    }
+            junction_efficiencies = self._junction_efficiency_array(-gap_span + total_extensions)
+
+            # score
+            scores = np.full(len(choices), self.INF)
+            np.divide(total_costs, junction_efficiencies, out=scores, where=junction_efficiencies > 0)
+
+            # first choice with the lowest score
+            best = int(np.argmin(scores))
+            choice = choices[best]
+            results[gap_span] = {
+                "score": float(scores[best]),
+                "cost": float(total_costs[best]),
+                "efficiency": float(junction_efficiencies[best]),
+                "condition": f"{[x['name'] for x in choice]}",
+                "extension": f"{[x['extension'] for x in choice]}"
+            }
         return results
 
     def _optimize_synthesis_options(self, synthesis_options, left_ext_dict, right_ext_dict):
         """
-
-        :param gap_span_start:
-        :type gap_span_start:
-        :param gap_span_end:
-        :type gap_span_end:
-        :param gap_span_step:
-        :type gap_span_step:
-        :param synthesis_options:
-        :type synthesis_options:
-        :param extension_dict:
-        :type extension_dict:
-        :return:
-        :rtype:
+        Create a dictionary of gap_span to the best synthesis option. For every
+        gap span and gene size, the gene offset with the best combination of left and
+        right extensions is chosen.
+
+        The best extensions only depend on the maximum overlap (gene size - gap span), so
+        all offsets for each distinct maximum overlap are evaluated at once as a masked 2D array.
+
+        :param synthesis_options: list of synthesis options
+        :type synthesis_options: list
+        :param left_ext_dict: dictionary of gap_span to best extension for the left junction
+        :type left_ext_dict: dict
+        :param right_ext_dict: dictionary of gap_span to best extension for the right junction
+        :type right_ext_dict: dict
+        :return: dictionary of gap_span to best synthesis option
+        :rtype: dict
         """
 
-        # for gap in gap_span_options
-        # for gene in gene_options
-        # for offset in offset_options
-        # best primer option for left_offset
-        # best primer option for right offset
-
-
-
         results = {}
 
         # digitize dictionary so that it includes all possible values
@@ -231,58 +284,79 @@ class GibsonAssemblyCost(object):
         left_ext_dict = digitize_dictionary(left_ext_dict, -largest_overlap, -smallest_overlap)
         right_ext_dict = digitize_dictionary(right_ext_dict, -largest_overlap, -smallest_overlap)
 
-        # optimize for gap spane
-        for gap_span in range(*self.SYNTHESIS_GAP_SPAN_RANGE):
-            results[gap_span] = None
-
-            # optimize for gene size
-            for gene in synthesis_options:
-                max_overlap = gene['size'] - gap_span
-
+        # extensions indexed by gap + largest_overlap
+        gaps = range(-largest_overlap, -smallest_overlap + 1)
+        left_ext = [left_ext_dict[gap] for gap in gaps]
+        right_ext = [right_ext_dict[gap] for gap in gaps]
+        left_cost = np.array([x['cost'] for x in left_ext], dtype=float)
+        left_eff = np.array([x['efficiency'] for x in left_ext], dtype=float)
+        right_cost = np.array([x['cost'] for x in right_ext], dtype=float)
+        right_eff = np.array([x['efficiency'] for x in right_ext], dtype=float)
+
+        gap_spans = np.arange(*self.SYNTHESIS_GAP_SPAN_RANGE)
+        gene_sizes = np.array([gene['size'] for gene in synthesis_options])
+        gene_costs = np.array([gene['cost'] for gene in synthesis_options], dtype=float)
+
+        # optimize offset for each distinct max overlap
+        max_overlaps, overlap_index = np.unique(gene_sizes[np.newaxis, :] - gap_spans[:, np.newaxis],
+                                                return_inverse=True)
+        overlap_index = overlap_index.reshape(len(gap_spans), len(gene_sizes))
+        offsets = np.arange(max(max_overlaps.max(), 1))
+        valid = offsets[np.newaxis, :] < max_overlaps[:, np.newaxis]
+        left_index = np.clip(offsets[np.newaxis, :] - max_overlaps[:, np.newaxis] + largest_overlap,
+                             0, len(left_ext) - 1)
+        right_index = np.clip(-offsets[np.newaxis, :] + largest_overlap, 0, len(right_ext) - 1)
+        right_index = np.broadcast_to(right_index, left_index.shape)
+
+        ext_cost = left_cost[left_index] + right_cost[right_index]
+        ext_eff = left_eff[left_index] * right_eff[right_index]
+        scorable = valid & (ext_eff > 0)
+        ext_score = np.full(ext_cost.shape, self.INF)
+        np.divide(ext_cost, ext_eff, out=ext_score, where=scorable)
+
+        # first offset with the lowest score, if any offset has a score
+        rows = np.arange(len(max_overlaps))
+        best_offset = np.argmin(ext_score, axis=1)
+        found = ext_score[rows, best_offset] < self.INF
+        best_ext_cost = np.where(found, ext_cost[rows, best_offset], self.INF)
+        best_ext_eff = np.where(found, ext_eff[rows, best_offset], 0.0)
+
+        # optimize for gene size, keeping the first gene with the lowest score
+        cost = gene_costs[np.newaxis, :] + best_ext_cost[overlap_index]
+        eff = best_ext_eff[overlap_index]
+        score = np.full(cost.shape, self.INF)
+        np.divide(cost, eff, out=score, where=eff > 0)
+        best_gene = np.argmin(score, axis=1)
+
+        for i, gap_span in enumerate(gap_spans.tolist()):
+            g = best_gene[i]
+            m = overlap_index[i, g]
+            extension_params = {
+                'score': self.INF,
+                'cost': self.INF,
+                'eff': 0.0,
+                'left': None,
+                'right': None,
+                'gene_offset': None
+            }
+            if found[m]:
+                o = best_offset[m]
                 extension_params = {
-                    'score': self.INF,
-                    'cost': self.INF,
-                    'eff': 0.0,
-                    'left': None,
-                    'right': None,
-                    'gene_offset': None
+                    'score': float(ext_score[m, o]),
+                    'cost': float(ext_cost[m, o]),
+                    'eff': float(ext_eff[m, o]),
+                    'left': left_ext[left_index[m, o]],
+                    'right': right_ext[right_index[m, o]],
+                    'gene_offset': int(o)
                 }
-
-                # optimize for offset
-                for offset in range(0, max_overlap):
-                    gap_left = -max_overlap + offset
-                    gap_right = -max_overlap - gap_left
-                    ext_left = left_ext_dict[gap_left]
-                    ext_right = right_ext_dict[gap_right]
-                    ext_cost = ext_left['cost'] + ext_right['cost']
-                    ext_eff = ext_left['efficiency'] * ext_right['efficiency']
-                    ext_score = self.INF
-                    if ext_eff > 0:
-                        ext_score = ext_cost / ext_eff
-
-                    if ext_score < extension_params['score']:
-                        extension_params['score'] = ext_score
-                        extension_params['cost'] = ext_cost
-                        extension_params['eff'] = ext_eff
-                        extension_params['left'] = ext_left
-                        extension_params['right'] = ext_right
-                        extension_params['gene_offset'] = offset
-
-                cost = gene['cost'] + extension_params['cost']
-                eff = extension_params['eff']
-                score = self.INF
-                if eff > 0:
-                    score = cost / eff
-
-                if results[gap_span] is None or score < results[gap_span]['score']:
-                    results[gap_span] = {
-                        'score': score,
-                        'cost': cost,
-                        'gene_cost': gene['cost'],
-                        'extension': extension_params,
-                        'gene_size': gene['size'],
-                        'eff': eff
-                    }
+            results[gap_span] = {
+                'score': float(score[i, g]),
+                'cost': float(cost[i, g]),
+                'gene_cost': synthesis_options[g]['cost'],
+                'extension': extension_params,
+                'gene_size': synthesis_options[g]['size'],
+                'eff': float(eff[i, g])
+            }
         return results
 
     def gap_cost_dict_both_extendable(self):
@@ -329,14 +403,88 @@ class GibsonAssemblyCost(object):
         return self._gap_cost_dict_synthesis_extendable
 
     @classmethod
-    def _path_name(cls):
+    def _file_name(cls, parameter_hash=None):
         name = cls.__name__
-        path = os.path.join(HERE, name + ".json")
+        if parameter_hash is not None:
+            name += "." + parameter_hash
+        return name
+
+    @classmethod
+    def _path_name(cls, parameter_hash=None):
+        path = os.path.join(HERE, cls._file_name(parameter_hash) + ".json")
         return path
 
+    @classmethod
+    def _score_table_path_name(cls, parameter_hash=None):
+        path = os.path.join(HERE, cls._file_name(parameter_hash) + ".npz")
+        return path
+
+    def _override_hash(self):
+        """
+        Parameter hash of an instance with overrides, or None if it uses the class parameters.
+        Instances with overrides are saved next to the class tables with the hash in the file name,
+        so they never replace the default tables.
+        """
+        parameter_hash = self.parameter_hash(self.parameters())
+        if parameter_hash == self.parameter_hash():
+            return None
+        return parameter_hash
+
+    def _gap_cost_dicts(self):
+        return {k: v for k, v in self.__dict__.items() if k.startswith('_gap_cost_dict')}
+
+    @staticmethod
+    def _atomic_write(path, write, mode='w'):
+        """Writes to a temporary file and moves it to path so that readers never see a partial file"""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=os.path.splitext(path)[1])
+        try:
+            with os.fdopen(fd, mode) as handle:
+                write(handle)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def parameter_hash(cls, parameters=None, names=None):
+        """
+        Hash of the class parameters listed in PARAMETERS. Saved cost tables
+        are recomputed when this hash changes.
+
+        :param parameters: optional overrides of the class parameters
+        :type parameters: dict
+        :param names: optional subset of PARAMETERS to hash
+        :type names: list
+        :return: hex digest
+        :rtype: str
+        """
+        if names is None:
+            names = cls.PARAMETERS
+        params = {name: getattr(cls, name) for name in names}
+        if parameters:
+            params.update({k: v for k, v in parameters.items() if k in names})
+        return hashlib.md5(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+    def parameters(self):
+        """Parameters of this instance, including any overrides"""
+        return {name: getattr(self, name) for name in self.PARAMETERS}
+
     def save(self):
-        with open(self._path_name(), 'w') as handle:
-            json.dump(self.__dict__, handle)
+        self._atomic_write(self._path_name(self._override_hash()), lambda handle: json.dump(self._gap_cost_dicts(), handle))
+        self.save_score_table()
+
+    def save_score_table(self):
+        table = self.score_table()
+        self._atomic_write(
+            self._score_table_path_name(self._override_hash()),
+            lambda handle: np.savez_compressed(handle,
+                                               table=table,
+                                               offset=self.SCORE_SPAN_RANGE[0],
+                                               parameter_hash=self.parameter_hash(self.parameters())),
+            mode='wb'
+        )
 
     @classmethod
     def load(cls):
@@ -344,9 +492,70 @@ class GibsonAssemblyCost(object):
         with open(cls._path_name(), 'rb') as handle:
             data = json.load(handle)
         x = cls()
+        # json converts the integer gap spans to strings
+        for key, d in data.items():
+            if d is not None:
+                data[key] = {int(span): v for span, v in d.items()}
         x.__dict__.update(data)
+        if os.path.isfile(cls._score_table_path_name()):
+            x._load_score_table()
+        return x
+
+    @classmethod
+    def load_score_table(cls):
+        """
+        Loads only the dense score table. The per condition
+        dictionaries are not loaded.
+
+        :return: GibsonAssemblyCost
+        """
+        if not os.path.isfile(cls._score_table_path_name()):
+            return cls.load()
+        x = cls()
+        x._load_score_table()
         return x
 
+    def _load_score_table(self):
+        """Loads the saved score table and returns the parameter hash it was computed with"""
+        path = self._score_table_path_name(self._override_hash())
+        with np.load(path) as data:
+            table = data['table']
+            offset = int(data['offset'])
+            parameter_hash = None
+            if 'parameter_hash' in data:
+                parameter_hash = str(data['parameter_hash'])
+        if offset != self.SCORE_SPAN_RANGE[0] or table.shape != self._score_table_shape():
+            raise ValueError("Score table at {} does not match SCORE_SPAN_RANGE {}".format(
+                path, self.SCORE_SPAN_RANGE))
+        self._score_table = table
+        return parameter_hash
+
+    @classmethod
+    def cached(cls):
+        """
+        Returns the score table for the current class parameters, loading it at
+        most once per process. The saved tables are only recomputed (and saved)
+        if they are missing or were computed with different parameters.
+
+        :return: GibsonAssemblyCost
+        """
+        parameter_hash = cls.parameter_hash()
+        key = (cls, parameter_hash)
+        if key not in cls._cache:
+            x = cls()
+            loaded_hash = None
+            if os.path.isfile(cls._score_table_path_name()):
+                try:
+                    loaded_hash = x._load_score_table()
+                except ValueError:
+                    loaded_hash = None
+            if loaded_hash != parameter_hash:
+                x = cls()
+                x.compute()
+                x.save()
+            cls._cache[key] = x
+        return cls._cache[key]
+
     def compute(self):
         self.gap_cost_dict_none_extendable()
         self.gap_cost_dict_one_extendable()
@@ -355,7 +564,7 @@ class GibsonAssemblyCost(object):
         self.gap_cost_dict_synthesis_one_extendable()
         self.gap_cost_dict_synthesis_extendable()
 
-    def conditions(self):
+    def conditions(self, digitize=True):
         dicts = [
             [0, False, self.gap_cost_dict_none_extendable()],
             [1, False, self.gap_cost_dict_one_extendable()],
@@ -365,30 +574,71 @@ class GibsonAssemblyCost(object):
             [2, True, self.gap_cost_dict_synthesis_extendable()],
         ]
 
-        for d in dicts:
-            d[-1] = digitize_dictionary(d[-1], -500, 5000)
+        if digitize:
+            for d in dicts:
+                d[-1] = digitize_dictionary(d[-1], *self.SCORE_SPAN_RANGE)
         return dicts
 
+    def _score_table_shape(self):
+        span_min, span_max = self.SCORE_SPAN_RANGE
+        return len(self.CONDITIONS), span_max - span_min + 1
+
+    def score_table(self):
+        """
+        Dense table of junction scores. Rows follow CONDITIONS and
+        columns are gap spans starting at SCORE_SPAN_RANGE[0].
+
+        :return: score table of shape (conditions, spans)
+        :rtype: np.ndarray
+        """
+        if self._score_table is None:
+            span_min, span_max = self.SCORE_SPAN_RANGE
+            x = np.arange(span_min, span_max + 1)
+            table = np.empty(self._score_table_shape())
+            for row, (_, _, d) in enumerate(self.conditions(digitize=False)):
+                bins = np.array(list(d.keys()))
+                scores = np.array([v['score'] for v in d.values()])
+                # same binning as digitize_dictionary
+                indices = np.digitize(x, bins)
+                indices[indices == len(bins)] = len(bins) - 1
+                table[row] = scores[indices]
+            self._score_table = table
+        return self._score_table
+
+    def _span_index(self, span):
+        span_min, span_max = self.SCORE_SPAN_RANGE
+        if not span_min <= span <= span_max:
+            raise KeyError("Gap span {} outside of SCORE_SPAN_RANGE {}".format(span, self.SCORE_SPAN_RANGE))
+        return span - span_min
+
+    def _condition_rows(self, n, syn):
+        return [i for i, (e, s) in enumerate(self.CONDITIONS) if e == n and (syn or not s)]
+
     def filter_by_condition(self, n, syn):
         dicts = self.conditions()
         if not syn:
             dicts = list(filter(lambda x: not x[1], dicts))
         return list(filter(lambda x: x[0] == n, dicts))
 
+    def gap_cost_array(self, min, max, e=0, syn=True):
+        """
+        Best junction score for every gap span from min to max (inclusive)
+
+        :param min: minimum gap span
+        :param max: maximum gap span
+        :param e: number of extendable ends
+        :param syn: whether to consider gene synthesis
+        :return: array of scores
+        :rtype: np.ndarray
+        """
+        table = self.score_table()[self._condition_rows(e, syn), self._span_index(min):self._span_index(max) + 1]
+        return table.min(axis=0)
+
     def gap_cost_dict(self, min, max, e=0, syn=True):
-        dicts = self.filter_by_condition(e, syn)
-        data = {}
-        for span in range(min, max+1):
-            values = np.array([d[-1][span]['score'] for d in dicts])
-            data[span] = np.min(values)
-        return data
+        return dict(zip(range(min, max + 1), self.gap_cost_array(min, max, e=e, syn=syn)))
 
     def gap_cost(self, span, e=0, syn=True):
-        dicts = self.filter_by_condition(e, syn)
-
-        values = [d[-1][span]['score'] for d in dicts]
-        index = values.index(min(values))
-        return dicts[index][-1][span]['score']
+        return float(self.score_table()[self._condition_rows(e, syn), self._span_index(span)].min())
 
         # condition 1: no synthesis, both extendable
         # condition 2: no synthesis, one extendable
@@ -398,11 +648,6 @@ class GibsonAssemblyCost(object):
         # condition 6: synthesis, none extendable
 
 
-gac = GibsonAssemblyCost()
-gac = GibsonAssemblyCost.load()
-gac.compute()
-gac.save()
-
 # d = gac.gap_cost_dict(-200, 1000)
 # pass
 #
@@ -0,0 +1,141 @@
+"""
+Compute GibsonAssemblyCost tables for many pricing scenarios at once.
+
+Scenarios that share primer parameters share the primer tables, and scenarios that
+share primer and synthesis parameters share the synthesis tables, so each distinct
+table is only computed once. Independent tables are computed in a process pool.
+
+    from dasi.graph_constructor.cost_functions import sweep
+
+    costs = sweep({
+        "default": {},
+        "cheap_primers": {"PRIMER_COST": 0.3},
+    })
+    assembler = Assembler(contig_container, cost_function=costs["cheap_primers"])
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+from .gibson_assembly_cost_function import GibsonAssemblyCost
+
+PRIMER_TABLES = [
+    "_gap_cost_dict_none_extendable",
+    "_gap_cost_dict_one_extendable",
+    "_gap_cost_dict_both_extendable",
+]
+
+SYNTHESIS_TABLES = [
+    "_gap_cost_dict_synthesis_none_extendable",
+    "_gap_cost_dict_synthesis_one_extendable",
+    "_gap_cost_dict_synthesis_extendable",
+]
+
+
+def _compute_primer_tables(cost_class, parameters):
+    gac = cost_class(**parameters)
+    return (
+        gac.gap_cost_dict_none_extendable(),
+        gac.gap_cost_dict_one_extendable(),
+        gac.gap_cost_dict_both_extendable(),
+    )
+
+
+def _compute_synthesis_tables(cost_class, parameters, primer_tables):
+    gac = cost_class(**parameters)
+    gac.__dict__.update(zip(PRIMER_TABLES, primer_tables))
+    return (
+        gac.gap_cost_dict_synthesis_none_extendable(),
+        gac.gap_cost_dict_synthesis_one_extendable(),
+        gac.gap_cost_dict_synthesis_extendable(),
+    )
+
+
+class _SerialExecutor(object):
+    """Runs submitted functions immediately in the current process"""
+
+    class _Result(object):
+        def __init__(self, result):
+            self._result = result
+
+        def result(self):
+            return self._result
+
+    def submit(self, fxn, *args):
+        return self._Result(fxn(*args))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+def _run(executor, fxn, jobs):
+    """Submits fxn for each key, args pair in jobs and returns a dictionary of key to result"""
+    futures = {key: executor.submit(fxn, *args) for key, args in jobs.items()}
+    return {key: future.result() for key, future in futures.items()}
+
+
+def sweep(scenarios, cost_class=GibsonAssemblyCost, processes=None):
+    """
+    Compute cost tables for a batch of parameter scenarios.
+
+    :param scenarios: dictionary of scenario name to parameter overrides (see GibsonAssemblyCost.PARAMETERS),
+                      or a list of parameter overrides, in which case scenarios are keyed by index
+    :type scenarios: dict or list
+    :param cost_class: GibsonAssemblyCost class or subclass. Must be importable so that it can
+                       be sent to the worker processes.
+    :type cost_class: type
+    :param processes: number of worker processes. If 1, everything is computed in the current
+                      process. Defaults to the number of cpus.
+    :type processes: int
+    :return: dictionary of scenario name to computed GibsonAssemblyCost. Scenarios with
+             identical parameters share the same instance.
+    :rtype: dict
+    """
+    if not isinstance(scenarios, dict):
+        scenarios = dict(enumerate(scenarios))
+
+    # validate parameters before starting any work
+    for parameters in scenarios.values():
+        cost_class(**parameters)
+
+    primer_names = cost_class.PRIMER_PARAMETERS
+    synthesis_names = cost_class.PRIMER_PARAMETERS + cost_class.SYNTHESIS_PARAMETERS
+
+    primer_keys = {}
+    synthesis_keys = {}
+    primer_jobs = {}
+    synthesis_parameters = {}
+    for name, parameters in scenarios.items():
+        primer_key = cost_class.parameter_hash(parameters, names=primer_names)
+        synthesis_key = cost_class.parameter_hash(parameters, names=synthesis_names)
+        primer_keys[name] = primer_key
+        synthesis_keys[name] = synthesis_key
+        primer_jobs.setdefault(primer_key, (cost_class, parameters))
+        synthesis_parameters.setdefault(synthesis_key, (primer_key, parameters))
+
+    if processes == 1:
+        executor = _SerialExecutor()
+    else:
+        executor = ProcessPoolExecutor(max_workers=processes)
+
+    with executor:
+        primer_tables = _run(executor, _compute_primer_tables, primer_jobs)
+        synthesis_jobs = {}
+        for synthesis_key, (primer_key, parameters) in synthesis_parameters.items():
+            synthesis_jobs[synthesis_key] = (cost_class, parameters, primer_tables[primer_key])
+        synthesis_tables = _run(executor, _compute_synthesis_tables, synthesis_jobs)
+
+    results = {}
+    instances = {}
+    for name, parameters in scenarios.items():
+        key = cost_class.parameter_hash(parameters)
+        if key not in instances:
+            gac = cost_class(**parameters)
+            gac.__dict__.update(zip(PRIMER_TABLES, primer_tables[primer_keys[name]]))
+            gac.__dict__.update(zip(SYNTHESIS_TABLES, synthesis_tables[synthesis_keys[name]]))
+            gac.score_table()
+            instances[key] = gac
+        results[name] = instances[key]
+    return results
@@ -0,0 +1,316 @@
+"""
+In-process seed-and-extend alignment of a query against a library of templates.
+
+Every k-mer of the templates is indexed. The k-mers of the query (and of its reverse complement)
+are looked up in the index and each seed is extended, without gaps, to a maximal exact match
+(or a match with at most max_mismatches mismatches). Circular queries and templates are matched
+across their origins, so a query does not need to be pseudocircularized.
+
+Matches are scored like ungapped BLAST hits. The raw score uses the reward and penalty of BLAST,
+bit scores and e-values use the Karlin-Altschul parameters of the reward and penalty (computed for
+uniform base frequencies), and the search space is the query length times the library length.
+Unlike BLAST, the lengths are not corrected for edge effects, so e-values of short queries are a
+little larger than BLAST's.
+"""
+
+import math
+
+from dasi.graph_constructor.models import BlastContig, ContigContainer, ContigRegion, Context
+
+COMPLEMENT = str.maketrans("ACGTN", "TGCAN")
+
+
+def reverse_complement(bases):
+    return bases[::-1].translate(COMPLEMENT)
+
+
+def karlin_altschul(reward, penalty):
+    """
+    Karlin-Altschul parameters of ungapped alignments scored with a reward and penalty, for uniform base
+    frequencies. For example, reward 1 and penalty -2 (the blastn defaults) give lambda 1.33 and K 0.621.
+
+    :param reward: score of a match
+    :type reward: int
+    :param penalty: score of a mismatch
+    :type penalty: int
+    :return: lambda and K
+    :rtype: tuple
+    """
+    if reward <= 0 or penalty >= 0:
+        raise ValueError("Reward must be positive and penalty negative, not {} and {}".format(reward, penalty))
+    p_match = 0.25
+    scores = [(reward, p_match), (penalty, 1 - p_match)]
+
+    # lambda is the positive root of sum(p * exp(lambda * s)) = 1
+    def moment(lam):
+        return sum(p * math.exp(lam * s) for s, p in scores) - 1
+
+    low, high = 0.0, 1.0
+    while moment(high) < 0:
+        high *= 2
+    for _ in range(100):
+        mid = (low + high) / 2
+        if moment(mid) < 0:
+            low = mid
+        else:
+            high = mid
+    lam = (low + high) / 2
+
+    # K = d * lambda * exp(-2 * sigma) / (H * (1 - exp(-lambda * d))), where d is the gcd of the scores and
+    # sigma sums over the k-step random walks S_k: (E[exp(lambda * S_k); S_k < 0] + P(S_k >= 0)) / k
+    entropy = lam * sum(p * s * math.exp(lam * s) for s, p in scores)
+    d = math.gcd(reward, -penalty)
+    sigma = 0.0
+    for k in range(1, 10000):
+        term = 0.0
+        for matches in range(k + 1):
+            p = math.exp(math.lgamma(k + 1) - math.lgamma(matches + 1) - math.lgamma(k - matches + 1) +
+                         matches * math.log(p_match) + (k - matches) * math.log(1 - p_match))
+            s = matches * reward + (k - matches) * penalty
+            term += p * math.exp(lam * s) if s < 0 else p
+        sigma += term / k
+        if term / k < 1e-12:
+            break
+    return lam, d * lam * math.exp(-2 * sigma) / (entropy * (1 - math.exp(-lam * d)))
+
+
+def sequence_name(sequence):
+    """Name of a sequence dictionary in contigs (its id if it has one)"""
+    name = sequence.get('id')
+    if name is None:
+        name = sequence.get('name')
+    return name
+
+
+class KmerAligner(object):
+    """
+    A k-mer index over a library of templates ::
+
+        aligner = KmerAligner(templates, k=16)
+        contigs = aligner.align(query)
+
+    Templates and queries are sequence dictionaries with 'bases' (or 'sequence'), 'circular' and 'id' (or 'name').
+    """
+
+    def __init__(self, templates, k=16, reward=1, penalty=-2):
+        """
+        :param templates: template sequences
+        :type templates: list
+        :param k: seed length
+        :type k: int
+        :param reward: score of a match
+        :type reward: int
+        :param penalty: score of a mismatch
+        :type penalty: int
+        """
+        if k < 1:
+            raise ValueError("Seed length must be at least 1, not {}".format(k))
+        self.k = k
+        self.reward = reward
+        self.penalty = penalty
+        self.lam, self.K = karlin_altschul(reward, penalty)
+        self.templates = list(templates)
+        self.template_bases = [BlastContig.parent_bases(t).upper() for t in self.templates]
+        self.library_length = sum(len(bases) for bases in self.template_bases)
+        self.index = {}
+        for template_index, (template, bases) in enumerate(zip(self.templates, self.template_bases)):
+            for pos, kmer in self._kmers(bases, template.get('circular', False)):
+                self.index.setdefault(kmer, []).append((template_index, pos))
+
+    def _kmers(self, bases, circular):
+        """Yields (position, k-mer) of every k-mer without Ns, including k-mers across the origin if circular"""
+        k = self.k
+        if len(bases) < k:
+            return
+        text = bases
+        if circular:
+            text = bases + bases[:k - 1]
+        for pos in range(len(text) - k + 1):
+            kmer = text[pos:pos + k]
+            if 'N' not in kmer:
+                yield pos, kmer
+
+    @staticmethod
+    def _extend(query, query_circular, template, template_circular, qi, ti, k, max_length, max_mismatches):
+        """
+        Extends a seed of length k at query position qi and template position ti to the right, then to the left.
+        Mismatches are allowed within the extension, but the match always ends with matching bases.
+
+        :return: query start, template start, length and number of mismatches of the match
+        :rtype: tuple
+        """
+        n, m = len(query), len(template)
+
+        def base(bases, length, circular, pos):
+            if 0 <= pos < length:
+                return bases[pos]
+            if circular:
+                return bases[pos % length]
+            return None
+
+        mismatches = 0
+        right = k
+        end = k
+        end_mismatches = 0
+        while right < max_length:
+            a = base(query, n, query_circular, qi + right)
+            b = base(template, m, template_circular, ti + right)
+            if a is None or b is None:
+                break
+            right += 1
+            if a != b:
+                if mismatches == max_mismatches:
+                    break
+                mismatches += 1
+            else:
+                end = right
+                end_mismatches = mismatches
+        mismatches = end_mismatches
+
+        left = 0
+        start = 0
+        start_mismatches = mismatches
+        while end + left < max_length:
+            a = base(query, n, query_circular, qi - left - 1)
+            b = base(template, m, template_circular, ti - left - 1)
+            if a is None or b is None:
+                break
+            left += 1
+            if a != b:
+                if mismatches == max_mismatches:
+                    break
+                mismatches += 1
+            else:
+                start = left
+                start_mismatches = mismatches
+        qs, ts = qi - start, ti - start
+        if query_circular:
+            qs %= n
+        if template_circular:
+            ts %= m
+        return qs, ts, start + end, start_mismatches
+
+    def iter_matches(self, query_bases, query_circular=False, max_mismatches=0):
+        """
+        Yields every maximal match of the query against the templates as
+        (template index, forward, query start, template start, length, mismatches), where starts are 0-based. For
+        reverse matches, the query start is a position on the reverse complement of the query.
+
+        :param query_bases: bases of the query
+        :type query_bases: str
+        :param query_circular: whether the query is circular
+        :type query_circular: bool
+        :param max_mismatches: number of mismatches allowed in a match
+        :type max_mismatches: int
+        :return: generator of matches
+        :rtype: generator
+        """
+        k = self.k
+        query_bases = query_bases.upper()
+        for forward, bases in [(True, query_bases), (False, reverse_complement(query_bases))]:
+            covered = set()
+            for qi, kmer in self._kmers(bases, query_circular):
+                for template_index, ti in self.index.get(kmer, []):
+                    if (template_index, qi, ti) in covered:
+                        continue
+                    template = self.template_bases[template_index]
+                    template_circular = self.templates[template_index].get('circular', False)
+                    max_length = min(len(bases), len(template))
+                    qs, ts, length, mismatches = self._extend(bases, query_circular, template, template_circular,
+                                                              qi, ti, k, max_length, max_mismatches)
+                    # seeds across the origin of a match around a whole circular query and template are inside it
+                    offsets = length - k + 1
+                    if query_circular and template_circular and length == len(bases) == len(template):
+                        offsets = length
+                    for offset in range(offsets):
+                        q, t = qs + offset, ts + offset
+                        if query_circular:
+                            q %= len(bases)
+                        if template_circular:
+                            t %= len(template)
+                        covered.add((template_index, q, t))
+                    yield template_index, forward, qs, ts, length, mismatches
+
+    def scores(self, length, mismatches, query_length):
+        """
+        BLAST scores of an ungapped match
+
+        :return: raw score, bit score and e-value
+        :rtype: tuple
+        """
+        score = (length - mismatches) * self.reward + mismatches * self.penalty
+        bit_score = (self.lam * score - math.log(self.K)) / math.log(2)
+        evalue = self.K * query_length * self.library_length * math.exp(-self.lam * score)
+        return score, bit_score, evalue
+
+    def align(self, query, min_length=None, max_mismatches=0):
+        """
+        Aligns a query against the templates.
+
+        :param query: query sequence
+        :type query: dict
+        :param min_length: minimum length of a match; defaults to the seed length
+        :type min_length: int
+        :param max_mismatches: number of mismatches allowed in a match
+        :type max_mismatches: int
+        :return: list of BLAST contigs
+        :rtype: list
+        """
+        if min_length is None:
+            min_length = self.k
+        query_bases = BlastContig.parent_bases(query)
+        query_circular = query.get('circular', False)
+        n = len(query_bases)
+        query_context = Context.interned(n, query_circular, start_index=ContigRegion.START_INDEX)
+        offset = ContigRegion.START_INDEX
+
+        contigs = []
+        for template_index, forward, qs, ts, length, mismatches in self.iter_matches(
+                query_bases, query_circular=query_circular, max_mismatches=max_mismatches):
+            if length < min_length:
+                continue
+            template = self.templates[template_index]
+            m = len(self.template_bases[template_index])
+            template_context = Context.interned(m, template.get('circular', False), start_index=offset)
+            if not forward:
+                # position of the match on the query
+                qs = (n - qs - length) % n
+            query_region = ContigRegion(qs + offset, query_context.translate_pos(qs + length - 1 + offset),
+                                        query_context, name=sequence_name(query))
+            subject_start = ts + offset
+            subject_end = template_context.translate_pos(ts + length - 1 + offset)
+            if not forward:
+                subject_start, subject_end = subject_end, subject_start
+            subject_region = ContigRegion(subject_start, subject_end, template_context,
+                                          name=sequence_name(template), forward=forward)
+            score, bit_score, evalue = self.scores(length, mismatches, n)
+            contigs.append(BlastContig(query_region, subject_region, BlastContig.BLAST,
+                                       score=score, evalue=evalue, bit_score=bit_score,
+                                       alignment_length=length, identical=length - mismatches))
+        return contigs
+
+
+def find_alignments(query, templates, k=16, min_length=None, max_mismatches=0, container=ContigContainer):
+    """
+    Aligns a query against templates in-process with a :class:`KmerAligner` and creates a contig container.
+    No BLAST database is built and circular queries do not need to be pseudocircularized; matches across the
+    origin are found as single contigs.
+
+    :param query: query sequence dictionary
+    :type query: dict
+    :param templates: template sequence dictionaries
+    :type templates: list
+    :param k: seed length
+    :type k: int
+    :param min_length: minimum length of an alignment; defaults to the seed length
+    :type min_length: int
+    :param max_mismatches: number of mismatches allowed in an alignment
+    :type max_mismatches: int
+    :param container: container class
+    :type container: type
+    :return: new container
+    """
+    aligner = KmerAligner(templates, k=k)
+    contigs = aligner.align(query, min_length=min_length, max_mismatches=max_mismatches)
+    sequences = [dict(seq, id=sequence_name(seq)) for seq in list(templates) + [query]]
+    return container(contigs=contigs, sequences=sequences)
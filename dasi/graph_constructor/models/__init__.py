@@ -1,8 +1,9 @@
 from dasi.graph_constructor.models.context import Context
 from dasi.graph_constructor.models.region import Region
 from dasi.graph_constructor.models.contig_region import ContigRegion
-from dasi.graph_constructor.models.contig import Contig
+from dasi.graph_constructor.models.contig import Contig, ContigView
 from dasi.graph_constructor.models.blast_contig import BlastContig
 from dasi.graph_constructor.models.contig_container import ContigContainer
+from dasi.graph_constructor.models.columnar_contig_container import ColumnarContigContainer, ContigRow
 # from graph_constructor.models.assembler import Assembler, Assembly
 from dasi.graph_constructor.models import schemas
@@ -11,6 +11,8 @@ class BlastContig(Contig):
     Usually, many *subjects* are aligned to a single *query*
     """
 
+    __slots__ = ('score', 'evalue', 'bit_score', 'identical', 'gaps', 'gap_opens', 'lp_extendable', 'rp_extendable')
+
     BLAST = "BLAST"
     START_INDEX = 1
 
@@ -69,7 +71,7 @@ class BlastContig(Contig):
         return ContigRegion(
             data["start"],
             data["end"],
-            Context(data['length'], data['circular'], BlastContig.START_INDEX),
+            Context.interned(data['length'], data['circular'], start_index=BlastContig.START_INDEX),
             name=data["name"],
             forward=True if data['strand'] == 'plus' else False,
             sequence=data['bases'],
@@ -142,6 +144,80 @@ class BlastContig(Contig):
         features = BlastContig.extract_meta(result['meta'])
         return BlastContig(query, subject, BlastContig.BLAST, **features)
 
+    @staticmethod
+    def parent_bases(sequence):
+        """Returns the bases of a parent sequence (a dictionary with 'bases' or 'sequence')"""
+        bases = sequence.get('bases')
+        if bases is None:
+            bases = sequence.get('sequence')
+        return bases
+
+    @staticmethod
+    def extract_record_region(record, which, seq_dict=None, keep_bases=False):
+        """
+        Returns the query or subject :class:`ContigRegion` of a flat BLAST record (see
+        :mod:`dasi.graph_constructor.models.blast_records`). The length and topology of the context is taken
+        from the parent sequence in seq_dict when available; otherwise the context is linear with the length
+        reported by BLAST.
+
+        :param record: flat BLAST record
+        :type record: dict
+        :param which: "query" or "subject"
+        :type which: str
+        :param seq_dict: parent sequences by id
+        :type seq_dict: dict
+        :param keep_bases: whether to copy the aligned bases into the region
+        :type keep_bases: bool
+        :return: ContigRegion
+        """
+        prefix = which[0]
+        name = record[which + '_acc']
+        length = record[which + '_length']
+        circular = False
+        parent = (seq_dict or {}).get(name)
+        if parent is not None:
+            bases = BlastContig.parent_bases(parent)
+            if bases is not None:
+                length = len(bases)
+            circular = parent.get('circular', False)
+        sequence = None
+        if keep_bases:
+            sequence = record.get(which + '_seq')
+        return ContigRegion(
+            record[prefix + '_start'],
+            record[prefix + '_end'],
+            Context.interned(length, circular, start_index=BlastContig.START_INDEX),
+            name=name,
+            forward=record.get(which + '_strand', 'plus') == 'plus',
+            sequence=sequence,
+            filename=None,
+        )
+
+    @staticmethod
+    def create_from_blast_record(record, seq_dict=None, keep_bases=False):
+        """
+        Creates a :class:`BlastContig` from a flat BLAST record, as read by
+        :func:`dasi.graph_constructor.models.blast_records.iter_blast_records`
+
+        :param record: flat BLAST record
+        :type record: dict
+        :param seq_dict: parent sequences by id, used for the length and topology of the contexts
+        :type seq_dict: dict
+        :param keep_bases: whether to copy the aligned bases into the regions
+        :type keep_bases: bool
+        :return: BlastContig
+        """
+        query = BlastContig.extract_record_region(record, 'query', seq_dict=seq_dict, keep_bases=keep_bases)
+        subject = BlastContig.extract_record_region(record, 'subject', seq_dict=seq_dict, keep_bases=keep_bases)
+        return BlastContig(query, subject, BlastContig.BLAST,
+                           score=record['score'],
+                           evalue=record['evalue'],
+                           bit_score=record['bit_score'],
+                           alignment_length=record['alignment_length'],
+                           identical=record['identical'],
+                           gaps_open=record['gap_opens'],
+                           gaps=record['gaps'])
+
 
         #
         # def is_perfect_subject(self):
@@ -0,0 +1,140 @@
+"""
+Streaming readers for BLAST output.
+
+Records are read one at a time from tabular (``-outfmt 6`` or ``-outfmt 7``) or JSON BLAST output, so parsing
+does not require the whole result set in memory. Each record is a flat dictionary with the keys of
+:data:`BLAST_FIELDS`, e.g. ::
+
+    {"query_acc": "Query_1", "subject_acc": "d611079f", "score": 4219, "evalue": 0.0, "bit_score": 7792.0,
+     "alignment_length": 4219, "identical": 4219, "gap_opens": 0, "gaps": 0, "query_length": 10781,
+     "q_start": 1374, "q_end": 5592, "subject_length": 7883, "s_start": 1, "s_end": 4219,
+     "subject_strand": "plus", "query_seq": "TCGC...", "subject_seq": "TCGC..."}
+"""
+
+import json
+
+# default tabular columns, in order
+BLAST_FIELDS = ["query_acc", "subject_acc", "score", "evalue", "bit_score", "alignment_length", "identical",
+                "gap_opens", "gaps", "query_length", "q_start", "q_end", "subject_length", "s_start", "s_end",
+                "subject_strand", "query_seq", "subject_seq"]
+
+SEQUENCE_FIELDS = ["query_seq", "subject_seq"]
+
+FIELD_TYPES = {
+    "score": int,
+    "evalue": float,
+    "bit_score": float,
+    "alignment_length": int,
+    "identical": int,
+    "gap_opens": int,
+    "gaps": int,
+    "query_length": int,
+    "q_start": int,
+    "q_end": int,
+    "subject_length": int,
+    "s_start": int,
+    "s_end": int,
+}
+
+
+def field_name(header):
+    """Converts a tabular BLAST header (e.g. 'q. start') into a record key (e.g. 'q_start')"""
+    return header.strip().rstrip('.').replace('. ', '_').replace(' ', '_')
+
+
+def iter_tabular_records(handle, keep_bases=True):
+    """
+    Yields records from tabular BLAST output, one line at a time. Column names are read from
+    the '# Fields:' comment if there is one, otherwise :data:`BLAST_FIELDS` is used.
+
+    :param handle: open text file
+    :type handle: file
+    :param keep_bases: whether to keep the aligned bases ('query_seq' and 'subject_seq')
+    :type keep_bases: bool
+    :return: generator of records
+    :rtype: generator
+    """
+    fields = BLAST_FIELDS
+    for line in handle:
+        line = line.rstrip('\r\n')
+        if not line:
+            continue
+        if line.startswith('#'):
+            if line.startswith('# Fields:'):
+                fields = [field_name(f) for f in line[len('# Fields:'):].split(',')]
+            continue
+        record = {}
+        for field, value in zip(fields, line.split('\t')):
+            if field in SEQUENCE_FIELDS and not keep_bases:
+                continue
+            convert = FIELD_TYPES.get(field)
+            record[field] = convert(value) if convert else value
+        yield record
+
+
+def iter_json_records(handle, keep_bases=True, chunk_size=1 << 16):
+    """
+    Yields records from a JSON array (or JSON lines) of BLAST results, decoding one record at a time
+    from chunks of the file.
+
+    :param handle: open text file
+    :type handle: file
+    :param keep_bases: whether to keep the aligned bases ('query_seq' and 'subject_seq')
+    :type keep_bases: bool
+    :param chunk_size: number of characters read at a time
+    :type chunk_size: int
+    :return: generator of records
+    :rtype: generator
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    while True:
+        buffer = buffer.lstrip(' \t\r\n,[')
+        if buffer.startswith(']'):
+            return
+        if buffer:
+            try:
+                record, end = decoder.raw_decode(buffer)
+            except ValueError:
+                pass
+            else:
+                buffer = buffer[end:]
+                if record is None:
+                    continue
+                if not keep_bases:
+                    for field in SEQUENCE_FIELDS:
+                        record.pop(field, None)
+                yield record
+                continue
+        chunk = handle.read(chunk_size)
+        if not chunk:
+            if buffer:
+                raise ValueError("Could not parse BLAST JSON record starting with '{}'".format(buffer[:50]))
+            return
+        buffer += chunk
+
+
+def iter_blast_records(path, keep_bases=True):
+    """
+    Yields records from a tabular or JSON BLAST output file. JSON is detected from the first character.
+
+    :param path: path to BLAST output
+    :type path: str
+    :param keep_bases: whether to keep the aligned bases ('query_seq' and 'subject_seq')
+    :type keep_bases: bool
+    :return: generator of records
+    :rtype: generator
+    """
+    with open(path, 'r') as handle:
+        first = ''
+        while not first.strip():
+            first = handle.read(1)
+            if not first:
+                return
+        handle.seek(0)
+        if first in '[{n':
+            records = iter_json_records(handle, keep_bases=keep_bases)
+        else:
+            records = iter_tabular_records(handle, keep_bases=keep_bases)
+        for record in records:
+            yield record
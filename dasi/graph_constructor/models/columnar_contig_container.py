@@ -0,0 +1,529 @@
+from collections.abc import MutableMapping
+
+import numpy as np
+
+from dasi.graph_constructor.exceptions import ContigContainerError, ContigError, RegionError
+from dasi.graph_constructor.models.blast_contig import BlastContig
+from dasi.graph_constructor.models.blast_records import iter_blast_records
+from dasi.graph_constructor.models.context import Context
+from dasi.graph_constructor.models.contig import ContigView
+from dasi.graph_constructor.models.contig_container import REPRESENTATIVES, redundant_rows
+from dasi.graph_constructor.models.contig_region import ContigRegion
+from dasi.graph_constructor.models.region import Region
+
+CONTIG_DTYPE = np.dtype([
+    ('contig_id', np.int64),
+    ('contig_type', np.int32),
+    ('query_start', np.int64),
+    ('query_end', np.int64),
+    ('query_strand', np.int8),
+    ('query_context', np.int32),
+    ('query_name', np.int32),
+    ('subject_start', np.int64),
+    ('subject_end', np.int64),
+    ('subject_strand', np.int8),
+    ('subject_context', np.int32),
+    ('subject_name', np.int32),
+    ('score', np.float64),
+    ('evalue', np.float64),
+    ('bit_score', np.float64),
+    ('identical', np.int64),
+    ('gaps', np.int64),
+    ('gap_opens', np.int64),
+    ('lp_extendable', np.bool_),
+    ('rp_extendable', np.bool_),
+])
+
+
+class ContigRow(object):
+    """
+    Lightweight view of one row of a :class:`ColumnarContigContainer` that behaves like a
+    :class:`BlastContig`. Views are keyed by contig_id, so they stay valid when other rows are removed.
+
+    ``query`` and ``subject`` are :class:`ContigRegion` built from the row on every access; modifying
+    them does not modify the container.
+    """
+
+    __slots__ = ('container', 'contig_id')
+
+    def __init__(self, container, contig_id):
+        self.container = container
+        self.contig_id = contig_id
+
+    def _get(self, field):
+        return self.container.row(self.contig_id)[field].item()
+
+    def _region(self, prefix):
+        row = self.container.row(self.contig_id)
+        return ContigRegion(
+            int(row[prefix + '_start']),
+            int(row[prefix + '_end']),
+            self.container.contexts[row[prefix + '_context']],
+            name=self.container.names[row[prefix + '_name']],
+            forward=row[prefix + '_strand'] == Region.FORWARD,
+        )
+
+    @property
+    def query(self):
+        return self._region('query')
+
+    @property
+    def subject(self):
+        return self._region('subject')
+
+    @property
+    def contig_type(self):
+        return self.container.contig_types[self._get('contig_type')]
+
+    @property
+    def score(self):
+        return self._get('score')
+
+    @property
+    def evalue(self):
+        return self._get('evalue')
+
+    @property
+    def bit_score(self):
+        return self._get('bit_score')
+
+    @property
+    def identical(self):
+        return self._get('identical')
+
+    @property
+    def gaps(self):
+        return self._get('gaps')
+
+    @property
+    def gap_opens(self):
+        return self._get('gap_opens')
+
+    @property
+    def lp_extendable(self):
+        return self._get('lp_extendable')
+
+    @property
+    def rp_extendable(self):
+        return self._get('rp_extendable')
+
+    @property
+    def alignment_length(self):
+        return self.query.length
+
+    @property
+    def has_perfect_alignment(self):
+        return self.alignment_length == self.identical and \
+               self.gaps == 0 and self.gap_opens == 0
+
+    def to_contig(self):
+        """
+        Creates a :class:`BlastContig` with the same contig_id from this row
+
+        :return: the contig
+        :rtype: BlastContig
+        """
+        c = BlastContig(self.query, self.subject, self.contig_type,
+                        score=self.score, evalue=self.evalue, bit_score=self.bit_score,
+                        identical=self.identical, gaps_open=self.gap_opens, gaps=self.gaps)
+        c.contig_id = self.contig_id
+        c.lp_extendable = self.lp_extendable
+        c.rp_extendable = self.rp_extendable
+        return c
+
+    def __eq__(self, other):
+        return isinstance(other, ContigRow) and self.container is other.container and \
+               self.contig_id == other.contig_id
+
+    def __hash__(self):
+        return hash((id(self.container), self.contig_id))
+
+    def __len__(self):
+        return self.alignment_length
+
+    def __repr__(self):
+        return "Contig({} Q{}-{}, S{}-{})".format(
+            self.contig_id,
+            self._get('query_start'),
+            self._get('query_end'),
+            self._get('subject_start'),
+            self._get('subject_end'))
+
+
+class ColumnarContigContainer(MutableMapping):
+    """
+    A container for contigs that stores query and subject positions, strands and contexts, BLAST
+    scores and contig types as a NumPy structured array (see CONTIG_DTYPE) with one row per contig.
+    Contexts, region names and contig types are stored once and referenced by index.
+
+    Like :class:`ContigContainer`, this is a mapping of contig_id to contig. Contigs are
+    handed out as :class:`ContigRow` views. Region sequences are not stored.
+
+    Rows are stored in a buffer whose capacity doubles when it is full, so adding contigs one at a
+    time is amortized constant time. Removed rows are compacted away in one pass the next time the
+    table is read.
+    """
+
+    INITIAL_CAPACITY = 16
+
+    def __init__(self, contigs=None, sequences=None):
+        """
+        :param contigs: list of Contigs
+        :type contigs: list
+        """
+        self._buffer = np.zeros(0, dtype=CONTIG_DTYPE)
+        self._size = 0
+        self._removed = []
+        self.contexts = []
+        self.names = []
+        self.contig_types = []
+        self._context_ids = {}
+        self._name_ids = {}
+        self._type_ids = {}
+        self._rows = None
+        seq_dict = {}
+        if sequences:
+            seq_dict = {seq['id']: seq for seq in sequences}
+        self.seq_dict = seq_dict
+        self._sort_field = 'query_start'
+        if contigs:
+            self.add_contigs(contigs)
+
+    @classmethod
+    def parse_alignments(cls, pyblast_results, sequences):
+        """
+        Parses results from a BLAST search and creates a :class:`ColumnarContigContainer`
+
+        :param pyblast_results: pyblast results, or any iterable of pyblast alignments
+        :param sequences: list of parent sequences
+        :type sequences: list
+        """
+        def contigs():
+            for alignment in getattr(pyblast_results, 'alignments', pyblast_results):
+                try:
+                    yield BlastContig.create_from_blast_results(alignment)
+                except ContigError:
+                    pass
+        cc = cls(sequences=sequences)
+        cc.add_contigs(contigs())
+        cc.sequences = sequences
+        return cc
+
+    @classmethod
+    def parse_blast_output(cls, path, sequences=None):
+        """
+        Parses a tabular or JSON BLAST output file one record at a time and creates a
+        :class:`ColumnarContigContainer`. Only one row per hit is kept.
+
+        :param path: path to BLAST output
+        :type path: str
+        :param sequences: list of parent sequences, used for the length and topology of the contexts
+        :type sequences: list
+        """
+        cc = cls(sequences=sequences)
+
+        def contigs():
+            for record in iter_blast_records(path, keep_bases=False):
+                try:
+                    yield BlastContig.create_from_blast_record(record, seq_dict=cc.seq_dict)
+                except (ContigError, RegionError):
+                    pass
+        cc.add_contigs(contigs())
+        cc.sequences = sequences
+        return cc
+
+    # -----------------------------------------------
+    # Lookups
+    # -----------------------------------------------
+
+    @staticmethod
+    def _lookup(value, values, ids, key=None):
+        if key is None:
+            key = value
+        i = ids.get(key)
+        if i is None:
+            i = len(values)
+            ids[key] = i
+            values.append(value)
+        return i
+
+    def _context_id(self, context):
+        key = (context.length, context.circular, context.start, context.name, context.id)
+        if key not in self._context_ids:
+            context = Context.interned(context.length, context.circular, name=context.name, id=context.id,
+                                       start_index=context.start)
+        return self._lookup(context, self.contexts, self._context_ids, key=key)
+
+    @property
+    def table(self):
+        """The table of contigs, with one row per contig (see CONTIG_DTYPE)"""
+        if self._removed:
+            self._compact()
+        return self._buffer[:self._size]
+
+    @table.setter
+    def table(self, table):
+        self._buffer = np.asarray(table, dtype=CONTIG_DTYPE)
+        self._size = len(self._buffer)
+        self._removed = []
+        self._rows = None
+
+    def _compact(self):
+        """Drops the removed rows from the buffer"""
+        keep = np.ones(self._size, dtype=bool)
+        keep[self._removed] = False
+        kept = self._buffer[:self._size][keep]
+        self._buffer[:len(kept)] = kept
+        self._size = len(kept)
+        self._removed = []
+        self._rows = None
+
+    def _reserve(self, size):
+        """Grows the buffer to hold at least size rows"""
+        if size > len(self._buffer):
+            buffer = np.zeros(max(size, 2 * len(self._buffer), self.INITIAL_CAPACITY), dtype=CONTIG_DTYPE)
+            buffer[:self._size] = self._buffer[:self._size]
+            self._buffer = buffer
+
+    def row_index(self, contig_id):
+        """Row of a contig in the buffer. Rows of removed contigs are only reused after the table is read."""
+        if self._rows is None:
+            self._rows = dict(zip(self.table['contig_id'].tolist(), range(self._size)))
+        return self._rows[contig_id]
+
+    def row(self, contig_id):
+        """The row of a contig"""
+        return self._buffer[self.row_index(contig_id)]
+
+    def column(self, name):
+        """A column of the table (see CONTIG_DTYPE)"""
+        return self.table[name]
+
+    @property
+    def query_lp(self):
+        """Left most point of every query"""
+        return np.minimum(self.table['query_start'], self.table['query_end'])
+
+    @property
+    def query_rp(self):
+        """Right most point of every query"""
+        return np.maximum(self.table['query_start'], self.table['query_end'])
+
+    @property
+    def subject_length(self):
+        """Length of every subject"""
+        return self._region_length('subject')
+
+    def _region_length(self, prefix):
+        start, end = self.table[prefix + '_start'], self.table[prefix + '_end']
+        forward = self.table[prefix + '_strand'] == Region.FORWARD
+        lp, rp = np.minimum(start, end), np.maximum(start, end)
+        spans_origin = np.where(forward, start > end, end > start)
+        length = rp - lp + 1
+        if len(self.contexts):
+            context_lengths = np.array([c.length for c in self.contexts], dtype=np.int64)
+            wrapped = context_lengths[self.table[prefix + '_context']] - (rp - lp) + 1
+            length = np.where(spans_origin, wrapped, length)
+        return length
+
+    # -----------------------------------------------
+    # Contigs
+    # -----------------------------------------------
+
+    def _record(self, contig):
+        if isinstance(contig, ContigView) and not contig.materialized:
+            # positions of a view are computed from its parent, which has the same contexts, names and strands
+            query, subject = contig.parent.query, contig.parent.subject
+            query_start, query_end, subject_start, subject_end = contig.coordinates()
+        else:
+            query, subject = contig.query, contig.subject
+            query_start, query_end, subject_start, subject_end = query.start, query.end, subject.start, subject.end
+        regions = []
+        for region, start, end in [(query, query_start, query_end), (subject, subject_start, subject_end)]:
+            regions += [
+                start,
+                end,
+                region.direction,
+                self._context_id(region.context),
+                self._lookup(region.name, self.names, self._name_ids),
+            ]
+        return tuple([contig.contig_id, self._lookup(contig.contig_type, self.contig_types, self._type_ids)] +
+                     regions + [
+                         getattr(contig, 'score', 0),
+                         getattr(contig, 'evalue', 10000),
+                         getattr(contig, 'bit_score', 1),
+                         getattr(contig, 'identical', 1),
+                         getattr(contig, 'gaps', 0),
+                         getattr(contig, 'gap_opens', 0),
+                         getattr(contig, 'lp_extendable', True),
+                         getattr(contig, 'rp_extendable', True),
+                     ])
+
+    def add_contig(self, contig):
+        """
+        Adds a contig to the container.
+
+        :param contig: The contig to add to the container
+        :type contig: Contig
+        :return: None
+        :rtype: None
+        """
+        self.add_contigs([contig])
+
+    def add_contigs(self, contigs):
+        """
+        Appends a list of contigs to the container
+
+        :param contigs: list of type Contig
+        :type contigs: list
+        :return: None
+        :rtype: None
+        """
+        records = []
+        contig_ids = set()
+        for c in contigs:
+            if c.contig_id in contig_ids or c.contig_id in self:
+                raise ContigContainerError("Contig {0} alread exists in container.".format(c))
+            contig_ids.add(c.contig_id)
+            records.append(self._record(c))
+        if not records:
+            return
+        start = self._size
+        self._reserve(start + len(records))
+        self._buffer[start:start + len(records)] = np.array(records, dtype=CONTIG_DTYPE)
+        self._size = start + len(records)
+        if self._rows is not None:
+            self._rows.update((record[0], start + i) for i, record in enumerate(records))
+
+    @property
+    def contigs(self):
+        """
+        Returns the list of contigs as row views
+
+        :return: list of contigs
+        :rtype: list
+        """
+        return [ContigRow(self, contig_id) for contig_id in self.table['contig_id'].tolist()]
+
+    def set_sort_field(self, field):
+        """
+        Sets the column used by :meth:`sorted_contigs`
+
+        :param field: column name
+        :type field: str
+        :return: None
+        """
+        if field not in CONTIG_DTYPE.names:
+            raise ValueError("Field '{}' not in {}".format(field, CONTIG_DTYPE.names))
+        self._sort_field = field
+
+    def argsort(self, field=None, reverse=False):
+        """Stable sort order of the rows by a column"""
+        if field is None:
+            field = self._sort_field
+        values = self.table[field]
+        if reverse:
+            values = -values.astype(np.float64)
+        return np.argsort(values, kind='stable')
+
+    def sorted_contigs(self, reverse=False):
+        """
+        Returns the list of contigs sorted by the sort field (query_start by default)
+
+        :param reverse: if true, reverses the list
+        :type reverse: boolean
+        :return: list of sorted contigs
+        :rtype: list
+        """
+        contig_ids = self.table['contig_id'][self.argsort(reverse=reverse)]
+        return [ContigRow(self, contig_id) for contig_id in contig_ids.tolist()]
+
+    def select(self, rows):
+        """
+        New container with a subset of rows, e.g. ``cc.select(cc.column('bit_score') > 100)``
+
+        :param rows: boolean mask or row indices
+        :type rows: np.ndarray
+        :return: new container sharing contexts, names and contig types with this one
+        :rtype: ColumnarContigContainer
+        """
+        cc = self.__class__(sequences=None)
+        cc.seq_dict = self.seq_dict
+        cc.contexts, cc._context_ids = self.contexts, self._context_ids
+        cc.names, cc._name_ids = self.names, self._name_ids
+        cc.contig_types, cc._type_ids = self.contig_types, self._type_ids
+        cc._sort_field = self._sort_field
+        cc.table = self.table[rows]
+        return cc
+
+    def remove(self, contig_ids):
+        """
+        Removes a list of contigs
+
+        :param contig_ids: contig ids to remove
+        :type contig_ids: list
+        :return: None
+        """
+        self.table = self.table[~np.isin(self.table['contig_id'], list(contig_ids))]
+        self._rows = None
+
+    def remove_redundant_contigs(self, keep="first", by_subject=False):
+        """
+        Removes contigs with the same query start and end. See :meth:`ContigContainer.remove_redundant_contigs`.
+
+        :param keep: one of REPRESENTATIVES
+        :type keep: str
+        :param by_subject: if True, contigs are only redundant if their query directions and their subject names,
+                           starts, ends and directions are also the same
+        :type by_subject: bool
+        :return: ids of the removed contigs
+        :rtype: list
+        """
+        if keep not in REPRESENTATIVES:
+            raise ValueError("Representative '{}' not in {}".format(keep, REPRESENTATIVES))
+        table = self.table
+        fields = ['query_start', 'query_end']
+        if by_subject:
+            fields += ['query_strand', 'subject_name', 'subject_start', 'subject_end', 'subject_strand']
+
+        preference = None
+        if keep == "bit_score":
+            preference = -table['bit_score']
+        elif keep == "subject_length":
+            preference = -self.subject_length
+        elif keep == "evalue":
+            preference = table['evalue']
+
+        removed = redundant_rows([table[field] for field in fields], preference)
+        contig_ids = table['contig_id'][removed].tolist()
+        self.table = np.delete(table, removed)
+        self._rows = None
+        return contig_ids
+
+    def __len__(self):
+        return self._size - len(self._removed)
+
+    def __setitem__(self, key, value):
+        raise NotImplementedError("Cannot set contig")
+
+    def __delitem__(self, key):
+        row = self.row_index(key)
+        del self._rows[key]
+        self._removed.append(row)
+
+    def __contains__(self, contig_id):
+        try:
+            self.row_index(contig_id)
+        except (KeyError, TypeError):
+            return False
+        return True
+
+    def __iter__(self):
+        return iter(self.table['contig_id'].tolist())
+
+    def __getitem__(self, contig_id):
+        self.row_index(contig_id)
+        return ContigRow(self, contig_id)
+
+    def __repr__(self):
+        return "ColumnarContigContainer({} contigs)".format(len(self))
@@ -1,12 +1,22 @@
+import weakref
+from copy import deepcopy
+
 from dasi.graph_constructor.exceptions import RegionError
 
 
 class Context(object):
     """Abstract sequence of a circular or linear topology. Contexts have
-    length, topology, name, id, and start_index. The exact bases is not recorded."""
+    length, topology, name, id, and start_index. The exact bases is not recorded.
+
+    Regions on the same sequence can share a single Context using :meth:`Context.interned`."""
+
+    __slots__ = ('name', 'id', '__start_index', '__length', '__circular', '__weakref__')
 
     DEFAULT_START_INDEX = 1
 
+    # shared contexts, alive for as long as some region refers to them
+    _interned = weakref.WeakValueDictionary()
+
     def __init__(self, length, circular, name=None, id=None, start_index=DEFAULT_START_INDEX):
         """
         Context constructor
@@ -24,6 +34,34 @@ class Context(object):
         self.__length = length
         self.__circular = circular
 
+    @classmethod
+    def interned(cls, length, circular, name=None, id=None, start_index=DEFAULT_START_INDEX):
+        """
+        Returns the shared Context with these properties, creating it if necessary.
+        Interned contexts are not duplicated when regions are copied.
+
+        :param length: length of context
+        :type length: int
+        :param circular: topology of context; True for circular contexts
+        :type circular: bool
+        :param start_index: the starting index offset for this context (usually 0 or 1)
+        :type start_index: int
+        :return: shared context
+        :rtype: Context
+        """
+        key = (cls, length, circular, name, id, start_index)
+        context = cls._interned.get(key)
+        if context is None:
+            context = cls(length, circular, name=name, id=id, start_index=start_index)
+            cls._interned[key] = context
+        return context
+
+    @property
+    def is_interned(self):
+        """Whether this is a shared context created by :meth:`Context.interned`"""
+        key = (self.__class__, self.length, self.circular, self.name, self.id, self.start)
+        return self._interned.get(key) is self
+
     @property
     def circular(self):
         """Whether this context is circular"""
@@ -122,15 +160,7 @@ class Context(object):
         :rtype:
         """
         if self.circular:
-            cleared = False
-            while not cleared:
-                cleared = True
-                if pos > self.end:
-                    pos = pos-self.length
-                    cleared = False
-                if pos < self.start:
-                    pos = pos+self.length
-                    cleared = False
+            pos = (pos - self.start) % self.length + self.start
         else:
             if not self.within_bounds(pos, inclusive=True):
                 raise RegionError(
@@ -149,6 +179,12 @@ class Context(object):
         """The length of the context"""
         return self.__length
 
+    def __deepcopy__(self, memo):
+        if self.is_interned:
+            return self
+        return self.__class__(self.length, self.circular, name=deepcopy(self.name, memo), id=deepcopy(self.id, memo),
+                              start_index=self.start)
+
     def __str__(self):
         return "Context(length={length}, circular={circular}, start_index={start_index})".format(
                 length=self.length,
@@ -1,6 +1,5 @@
 import itertools
 import uuid
-from copy import deepcopy
 
 from dasi.graph_constructor.exceptions import ContigError
 from dasi.graph_constructor.models.contig_region import ContigRegion
@@ -24,8 +23,12 @@ class Contig(object):
         * type of "end" for fragments
 
     """
+    __slots__ = ('query', 'subject', 'contig_type', 'contig_id', 'quality', 'metadata')
+
     gid = 0
 
+    TYPE_PRIMER = "primer"
+
     # TODO: Decorate entire class with something that asserts subject and query always have the same length
     def __init__(self, query, subject, contig_type, **meta):
         """
@@ -41,9 +44,8 @@ class Contig(object):
         :param meta: additional metadata
         :type meta: dict
         """
-        vars(self).update(locals())
-        self.query = self.query.copy()
-        self.subject = self.subject.copy()
+        self.query = query.copy()
+        self.subject = subject.copy()
         self.contig_type = contig_type
         self.contig_id = None
         self._assign_id()
@@ -112,6 +114,18 @@ class Contig(object):
         self._validate_regions()
         return self.query.length
 
+    @staticmethod
+    def _circular_extension(x, region, new_pos):
+        """
+        On a circular context, a move to a position within the context that cannot be made directly is made
+        around the origin instead, e.g. moving the end of 9000-1000 to 9800 retracts the end by 1200 (not 8800).
+        """
+        context = region.context
+        if context.circular and context.within_bounds(new_pos) and \
+                not -region.length + 1 <= x <= context.length - region.length:
+            x = (x + region.length - 1) % context.length - region.length + 1
+        return x
+
     @classmethod
     def _modify_end(cls, new_end_pos, reg1, reg2):
         """
@@ -131,6 +145,7 @@ class Contig(object):
         diff = new_end_pos - reg1.end
         if reg1.is_reverse():
             diff *= -1
+        diff = cls._circular_extension(diff, reg1, new_end_pos)
         reg1.extend_end(diff)
         reg2.extend_end(diff)
         cls._validate_regions_helper(reg1, reg2)
@@ -153,6 +168,7 @@ class Contig(object):
         diff = new_start_pos - reg1.start
         if reg1.is_forward():
             diff *= -1
+        diff = cls._circular_extension(diff, reg1, new_start_pos)
         reg1.extend_start(diff)
         reg2.extend_start(diff)
         cls._validate_regions_helper(reg1, reg2)
@@ -196,9 +212,23 @@ class Contig(object):
         self.contig_id = self.gid
         self.__class__.gid += 1
 
+    @classmethod
+    def _slot_names(cls):
+        """Attribute names of every slot of this class"""
+        return [name for klass in reversed(cls.__mro__) for name in klass.__dict__.get('__slots__', ())]
+
     def copy(self):
-        """returns a deepcopy"""
-        c = deepcopy(self)
+        """
+        Returns a copy with a new contig_id. The query and subject regions and the metadata dictionary
+        are copied; contexts, sequences and other values are shared.
+        """
+        c = self.__class__.__new__(self.__class__)
+        for name in self._slot_names():
+            if hasattr(self, name):
+                setattr(c, name, getattr(self, name))
+        c.query = self.query.copy()
+        c.subject = self.subject.copy()
+        c.metadata = dict(self.metadata)
         c._assign_id()
         return c
         # return Contig(
@@ -247,6 +277,29 @@ class Contig(object):
         new_contig.modify_query(start, end)
         return new_contig
 
+    def view(self, start=None, end=None):
+        """
+        Creates a copy-on-write :class:`ContigView` of this contig, optionally restricted to a sub query.
+        The view only stores its query start and end until it is materialized.
+
+        :param start: new start position for query (defaults to the query start)
+        :type start: int
+        :param end: new end position for query (defaults to the query end)
+        :type end: int
+        :return: the view
+        :rtype: ContigView
+        :raises ContigError: if start or end not withing query region
+        """
+        if start is None:
+            start = self.query.start
+        if end is None:
+            end = self.query.end
+        if not self.query.within_region(start):
+            raise ContigError("Cannot break, start position {0} is not within query {1}".format(start, self.query))
+        if not self.query.within_region(end):
+            raise ContigError("Cannot break, end position {0} is not within query {1}".format(end, self.query))
+        return ContigView(self, start, end)
+
     #
     # def create_sub_queries(self, starts, ends):
     #     positions = list(itertools.product(starts, ends))
@@ -283,8 +336,8 @@ class Contig(object):
         """
 
         contigs = []
-        starts.append(self.query.start)
-        ends.append(self.query.end)
+        starts = list(starts) + [self.query.start]
+        ends = list(ends) + [self.query.end]
 
         for s, e in itertools.product(starts, ends):
             new_contig = self.sub_query(s, e)
@@ -301,6 +354,61 @@ class Contig(object):
 
         return contigs
 
+    def iter_divide_contig(self, starts, ends, include_self=True, contig_type=None, views=False):
+        """
+        Lazy version of :meth:`divide_contig`. Yields a sub contig for every distinct (start, end) pair,
+        including the query start and end, where both positions are within the query and the start comes
+        before the end along the query. Other pairs are skipped. The starts and ends are not modified.
+
+        Sub contigs can be fed straight into a container, e.g. ``ColumnarContigContainer(c.iter_divide_contig(...))``,
+        so they are never all in memory at once.
+
+        :param starts: start positions (using query)
+        :type starts: list
+        :param ends: end positions (using query)
+        :type ends: list
+        :param include_self: also yield this contig, last
+        :type include_self: bool
+        :param contig_type: type of the sub contigs
+        :type contig_type: str
+        :param views: yield copy-on-write :class:`ContigView` instead of copies
+        :type views: bool
+        :return: generator of sub contigs
+        :rtype: generator
+        """
+        query = self.query
+        length = query.context.length
+
+        def offsets(positions):
+            # distance of each position from the query start along the query, in order of first appearance
+            d = {}
+            for x in positions:
+                if x not in d and query.within_region(x):
+                    if query.is_reverse():
+                        d[x] = (query.start - x) % length
+                    else:
+                        d[x] = (x - query.start) % length
+            return d
+
+        start_offsets = offsets(list(starts) + [query.start])
+        end_offsets = offsets(list(ends) + [query.end])
+        for s, s_offset in start_offsets.items():
+            for e, e_offset in end_offsets.items():
+                if s_offset < e_offset:
+                    if views:
+                        yield ContigView(self, s, e, contig_type=contig_type)
+                    else:
+                        new_contig = self.copy()
+                        new_contig.modify_query(s, e)
+                        if contig_type is not None:
+                            new_contig.contig_type = contig_type
+                        yield new_contig
+
+        if include_self:
+            if contig_type is not None:
+                self.contig_type = contig_type
+            yield self
+
     def __len__(self):
         return self.alignment_length
 
@@ -314,3 +422,121 @@ class Contig(object):
 
     def __copy__(self):
         return self.copy()
+
+
+class ContigView(object):
+    """
+    A copy-on-write view of a :class:`Contig` (see :meth:`Contig.view`), e.g. for the many sub contigs
+    created by :meth:`Contig.iter_divide_contig`.
+
+    A view only stores its parent, its query start and end, its own contig_id and optionally its own contig_type.
+    Immutable attributes (bit_score, evalue, ...) are read from the parent. The view is materialized into its own copy of
+    the parent, modified to the query start and end, when its query, subject or metadata is accessed, when it is
+    modified, or when any other method is called. Once materialized, the view no longer follows the parent.
+    """
+
+    __slots__ = ('parent', 'query_start', 'query_end', '_contig_id', '_contig_type', '_contig')
+
+    # read from the parent until the view is materialized. Mutable attributes (e.g. metadata) must not be shared.
+    SHARED = ('quality', 'score', 'evalue', 'bit_score', 'identical', 'gaps',
+              'gap_opens', 'lp_extendable', 'rp_extendable')
+
+    def __init__(self, parent, query_start, query_end, contig_type=None):
+        object.__setattr__(self, 'parent', parent)
+        object.__setattr__(self, 'query_start', query_start)
+        object.__setattr__(self, 'query_end', query_end)
+        object.__setattr__(self, '_contig_type', contig_type)
+        object.__setattr__(self, '_contig', None)
+        cls = parent.__class__
+        object.__setattr__(self, '_contig_id', cls.gid)
+        cls.gid += 1
+
+    @property
+    def contig_id(self):
+        if self._contig is not None:
+            return self._contig.contig_id
+        return self._contig_id
+
+    @property
+    def contig_type(self):
+        if self._contig is not None:
+            return self._contig.contig_type
+        if self._contig_type is not None:
+            return self._contig_type
+        return self.parent.contig_type
+
+    @property
+    def materialized(self):
+        """Whether the view has its own copy of the contig"""
+        return self._contig is not None
+
+    def materialize(self):
+        """
+        Returns the contig of this view, copying the parent on the first call
+
+        :return: the contig
+        :rtype: Contig
+        """
+        if self._contig is None:
+            parent = self.parent
+            contig = parent.copy()
+            if (self.query_start, self.query_end) != (parent.query.start, parent.query.end):
+                contig.modify_query(self.query_start, self.query_end)
+            contig.contig_id = self._contig_id
+            if self._contig_type is not None:
+                contig.contig_type = self._contig_type
+            object.__setattr__(self, '_contig', contig)
+        return self._contig
+
+    def coordinates(self):
+        """
+        Query and subject start and end of the view. Unmaterialized views compute them from the offsets of the
+        query start and end from the parent's query start, without copying the parent.
+
+        :return: query start, query end, subject start and subject end
+        :rtype: tuple
+        """
+        if self._contig is None:
+            parent_query, parent_subject = self.parent.query, self.parent.subject
+            start_offset = self._query_offset(self.query_start)
+            end_offset = self._query_offset(self.query_end)
+            if start_offset <= end_offset:
+                return (self.query_start, self.query_end,
+                        self._subject_pos(parent_subject, start_offset),
+                        self._subject_pos(parent_subject, end_offset))
+        contig = self.materialize()
+        return contig.query.start, contig.query.end, contig.subject.start, contig.subject.end
+
+    def _query_offset(self, x):
+        """Distance of a query position from the parent's query start, along the query"""
+        query = self.parent.query
+        if query.is_reverse():
+            return (query.start - x) % query.context.length
+        return (x - query.start) % query.context.length
+
+    @staticmethod
+    def _subject_pos(subject, offset):
+        """Subject position at an offset from the subject start, along the subject"""
+        pos = subject.start - offset if subject.is_reverse() else subject.start + offset
+        if subject.context.circular:
+            pos = subject.context.translate_pos(pos)
+        return pos
+
+    def __getattr__(self, name):
+        if name in ContigView.__slots__:
+            raise AttributeError(name)
+        if self._contig is None and name in self.SHARED:
+            return getattr(self.parent, name)
+        return getattr(self.materialize(), name)
+
+    def __setattr__(self, name, value):
+        if name in self.__slots__:
+            raise AttributeError("Cannot set '{}' of a ContigView".format(name))
+        setattr(self.materialize(), name, value)
+
+    def __len__(self):
+        return len(self.materialize())
+
+    def __repr__(self):
+        return "ContigView({} of {} Q{}-{})".format(self.contig_id, self.parent.contig_id,
+                                                     self.query_start, self.query_end)
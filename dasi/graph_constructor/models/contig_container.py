@@ -1,16 +1,50 @@
 # from .contig import *
-import itertools
+import bisect
 import os
 
-from dasi.graph_constructor.exceptions import ContigContainerError, ContigError
+from dasi.graph_constructor.exceptions import ContigContainerError, ContigError, RegionError
 from dasi.graph_constructor.models.blast_contig import *
-from dasi.graph_constructor.utils import pseudocircularize, pair
+from dasi.graph_constructor.models.blast_records import iter_blast_records
+from dasi.graph_constructor.utils import pseudocircularize
 from collections import MutableMapping
 import warnings
 from Bio import BiopythonWarning
+import numpy as np
 warnings.simplefilter('ignore', BiopythonWarning)
 
 
+COMPLEMENT = str.maketrans("ACGTNacgtn", "TGCANtgcan")
+
+# which of a set of redundant contigs is kept by remove_redundant_contigs
+REPRESENTATIVES = ["first", "bit_score", "subject_length", "evalue"]
+
+
+def redundant_rows(columns, preference=None):
+    """
+    Finds redundant rows, i.e. rows that are equal to another row in every column, using one lexsort.
+    Of each set of equal rows, the row with the lowest preference is kept (ties go to the earliest row).
+
+    :param columns: list of equal length integer arrays
+    :type columns: list
+    :param preference: optional array; lower is better
+    :type preference: np.ndarray
+    :return: indices of the redundant rows, in increasing order
+    :rtype: np.ndarray
+    """
+    n = len(columns[0])
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    if preference is None:
+        preference = np.zeros(n)
+    order = np.lexsort([np.arange(n), preference] + list(reversed(columns)))
+    new_group = np.zeros(n, dtype=bool)
+    new_group[0] = True
+    for column in columns:
+        sorted_column = np.asarray(column)[order]
+        new_group[1:] |= sorted_column[1:] != sorted_column[:-1]
+    return np.sort(order[~new_group])
+
+
 class ContigContainer(MutableMapping):
     """A Container for :class:`Contigs`"""
 
@@ -30,6 +64,26 @@ class ContigContainer(MutableMapping):
         self.seq_dict = seq_dict
         self._filter = None
         self._sort_filter = lambda x: x.query.start
+        self._version = 0
+        self._contigs_cache = None
+        self._sorted_cache = {}
+
+    @property
+    def version(self):
+        """Incremented every time contigs are added to or removed from the container"""
+        return self._version
+
+    def invalidate(self):
+        """
+        Clears the cached contig list and sort orders. Called when contigs are added or removed, and should
+        be called after contigs in the container are modified in place.
+
+        :return: None
+        :rtype: None
+        """
+        self._version += 1
+        self._contigs_cache = None
+        self._sorted_cache = {}
 
     def set_filter(self, f):
         """
@@ -53,6 +107,7 @@ class ContigContainer(MutableMapping):
         :rtype: None
         """
         self._sort_filter = f
+        self._sorted_cache = {}
 
     def sorted_contigs(self, reverse=False):
         """
@@ -63,73 +118,119 @@ class ContigContainer(MutableMapping):
         :return: list of contigs sorted by self._sort_filter
         :rtype: list
         """
-        contigs = self.contigs
-        return sorted(contigs, key=self._sort_filter, reverse=reverse)
+        cached = self._sorted_cache.get(reverse)
+        if cached is None or cached[0] != self._version:
+            cached = (self._version, sorted(self.contigs, key=self._sort_filter, reverse=reverse))
+            self._sorted_cache[reverse] = cached
+        return list(cached[1])
 
     @property
     def contigs(self):
         """
-        Returns the list of contigs
+        Returns a new list of the contigs, copied from a list that is cached until contigs are added or removed.
+        Modifying the returned list does not change the container; use :meth:`add_contig` and
+        :meth:`remove_contig` instead.
 
         :return: list of contigs
         :rtype: list
         """
-        return list(self.__contig_dictionary.values())
-
-    # @classmethod
-    # def find_alignments(cls, templates_directory, query_path, force_linear=False):
-    #     """
-    #
-    #     :param templates_directory: path to the directory containing template sequences
-    #     :type templates_directory: basestring
-    #     :param query_path: path to the query sequence
-    #     :type query_path: basestring
-    #     :param force_linear: if true, a pseudocircularized sequence for the query will not be created
-    #     :type force_linear: boolean
-    #     :return:
-    #     :rtype:
-    #     """
-    #     if not force_linear:
-    #         if PySequence.dna_at_path_is_circular(query_path):
-    #             tokens = os.path.basename(query_path).split('.')
-    #             dirname = os.path.dirname(query_path)
-    #
-    #             outpath = os.path.join(dirname, f"{tokens[0]}_pseudocircular.{tokens[1]}")
-    #             pseudocircularize(query_path, outpath)
-    #             query_path = outpath
-    #     aligner = Aligner('db', templates_directory, query_path)
-    #     aligner.quick_blastn()
-    #
-    #     return cls.parse_blast_results(aligner.results,
-    #                                    sequences=aligner.seq_db.sequences)
+        cached = self._contigs_cache
+        if cached is None or cached[0] != self._version:
+            cached = (self._version, list(self.__contig_dictionary.values()))
+            self._contigs_cache = cached
+        return list(cached[1])
 
     # :    @classmethod
     # def find_perfect_alignments(cls)
 
     @classmethod
-    def parse_alignments(cls, pyblast_results, sequences):
+    def parse_alignments(cls, pyblast_results, sequences, keep_bases=True):
         """
         Parses results from a BLAST search and creates a :class:`ContigContainer`
+
+        :param pyblast_results: pyblast results, or any iterable of pyblast alignments
+        :param sequences: list of parent sequences
+        :type sequences: list
+        :param keep_bases: whether to keep the aligned bases in the regions. Bases can be loaded
+                           later from the parent sequences with :meth:`ContigContainer.region_bases`.
+        :type keep_bases: bool
+        :return: new container
+        :rtype: ContigContainer
         """
-        contigs = []
-        for alignment in pyblast_results.alignments:
+        cc = cls(sequences=sequences)
+        cc.sequences = sequences
+        for alignment in getattr(pyblast_results, 'alignments', pyblast_results):
             try:
-                contigs.append(BlastContig.create_from_blast_results(alignment))
+                contig = BlastContig.create_from_blast_results(alignment)
             except ContigError:
                 # TODO: Should something be done here when there a ContigError?
-                pass
-        cc = cls(contigs=contigs, sequences=sequences)
+                continue
+            if not keep_bases:
+                contig.query.sequence = None
+                contig.subject.sequence = None
+            cc.add_contig(contig)
+        return cc
+
+    @classmethod
+    def parse_blast_output(cls, path, sequences=None, keep_bases=False):
+        """
+        Parses a tabular or JSON BLAST output file one record at a time and creates a :class:`ContigContainer`.
+        Only coordinates and scores are kept unless keep_bases is True; bases can be loaded
+        later from the parent sequences with :meth:`ContigContainer.region_bases`.
+
+        :param path: path to BLAST output
+        :type path: str
+        :param sequences: list of parent sequences, used for the length and topology of the contexts
+        :type sequences: list
+        :param keep_bases: whether to keep the aligned bases in the regions
+        :type keep_bases: bool
+        :return: new container
+        :rtype: ContigContainer
+        """
+        cc = cls(sequences=sequences)
         cc.sequences = sequences
+        for record in iter_blast_records(path, keep_bases=keep_bases):
+            try:
+                cc.add_contig(BlastContig.create_from_blast_record(record, seq_dict=cc.seq_dict,
+                                                                   keep_bases=keep_bases))
+            except (ContigError, RegionError):
+                continue
         return cc
 
+    def region_bases(self, region):
+        """
+        Returns the bases of a region. If the region does not have its own sequence, the bases are read from its
+        parent sequence (the sequence with the region's name as its id).
+
+        :param region: the region
+        :type region: ContigRegion
+        :return: bases of the region, reverse complemented for reverse regions
+        :rtype: str
+        """
+        if region.sequence:
+            return region.sequence
+        parent = self.seq_dict.get(region.name)
+        if parent is None:
+            raise ContigContainerError("No parent sequence '{}' for region.".format(region.name))
+        bases = BlastContig.parent_bases(parent)
+        offset = region.context.start
+        left, right = region.left_end - offset, region.right_end - offset
+        if left <= right:
+            region_bases = bases[left:right + 1]
+        else:
+            region_bases = bases[left:] + bases[:right + 1]
+        if region.direction == ContigRegion.REVERSE:
+            region_bases = region_bases[::-1].translate(COMPLEMENT)
+        return region_bases
+
     def __len__(self):
-        return len(self.contigs)
+        return len(self.__contig_dictionary)
 
     def __setitem__(self, key, value):
         raise NotImplementedError("Cannot set contig")
 
     def __delitem__(self, key):
-        del self.__contig_dictionary[key]
+        self.remove_contig(key)
 
     def __iter__(self):
         return iter(self.__contig_dictionary)
@@ -153,8 +254,8 @@ class ContigContainer(MutableMapping):
         :rtype: None
         """
         if contig.contig_id not in self.__contig_dictionary:
-            self.contigs.append(contig)
             self.__contig_dictionary[contig.contig_id] = contig
+            self.invalidate()
         else:
             raise ContigContainerError("Contig {0} alread exists in container.".format(contig))
 
@@ -170,98 +271,197 @@ class ContigContainer(MutableMapping):
         for c in contigs:
             self.add_contig(c)
 
-    # TODO: better documentation for this
+    def remove_contig(self, contig_id):
+        """
+        Removes a contig from the ContigContainer.
+
+        :param contig_id: id of the contig to remove
+        :type contig_id: int
+        :return: the removed contig
+        :rtype: Contig
+        :raises KeyError: if the contig is not in the container
+        """
+        contig = self.__contig_dictionary.pop(contig_id)
+        self.invalidate()
+        return contig
+
+    def remove_contigs(self, contig_ids):
+        """
+        Removes a list of contigs from the ContigContainer.
+
+        :param contig_ids: ids of the contigs to remove
+        :type contig_ids: list
+        :return: None
+        :rtype: None
+        """
+        for contig_id in contig_ids:
+            del self.__contig_dictionary[contig_id]
+        self.invalidate()
+
     def fuse_circular_fragments(self):
         """
-        'Fuses' contigs that were split only because of their origin.
+        'Fuses' contigs that were split only because of their origin, e.g. BLAST results
+        for a query that spans the origin of a circular subject ::
 
-        :return:
-        :rtype:
+            query:      |-----l-----||--r--|
+            subject:    --r--|        |-----l-----
+
+        Contigs are visited in container order. Each contig walks the remaining contigs once, in container
+        order, and absorbs every one whose query and subject are consecutive with its current right ends.
+        Contigs that only become consecutive after an absorption are not checked again, as in a single pass
+        over all ordered pairs. Absorbed contigs are removed from the container.
+
+        Candidates are found with a hash join: every contig is indexed by its query and subject contexts and
+        the left ends of its query and subject, and looked up by the positions following the right ends of
+        a contig.
+
+        :return: list of the contigs that were removed
+        :rtype: list
         """
 
-        def fuse_condition(l, r):
-            return l.same_context(r) and \
-                   l.subject.consecutive_with(r.subject) and \
-                   l.query.consecutive_with(r.query) and \
-                   l in self.contigs and \
-                   r in self.contigs
+        def context_key(context):
+            return context.circular, context.start, context.end, context.length
+
+        def next_pos(region):
+            try:
+                return region.context.translate_pos(region.right_end + 1)
+            except RegionError:
+                return None
 
-        pairs = itertools.permutations(self.contigs, 2)
-        for l, r in pairs:
-            if fuse_condition(l, r):
-                l.fuse(r)
-                self.contigs.remove(r)
+        contigs = self.contigs
+        contexts = [(context_key(c.query.context), context_key(c.subject.context)) for c in contigs]
+
+        def key(i):
+            return contexts[i] + (contigs[i].query.left_end, contigs[i].subject.left_end)
+
+        index = {}
+        for i in range(len(contigs)):
+            index.setdefault(key(i), []).append(i)
+
+        def next_fragment(i, after):
+            """The first candidate for contig i after position after in container order"""
+            l = contigs[i]
+            q, s = next_pos(l.query), next_pos(l.subject)
+            if q is None or s is None:
+                return None
+            candidates = index.get(contexts[i] + (q, s), [])
+            for j in candidates[bisect.bisect_right(candidates, after):]:
+                if j != i:
+                    candidates.remove(j)
+                    return j
+            return None
+
+        removed = set()
+        for i in range(len(contigs)):
+            if i in removed:
+                continue
+            j = next_fragment(i, -1)
+            while j is not None:
+                before = key(i)
+                contigs[i].fuse(contigs[j])
+                removed.add(j)
+                # fusing a one base region can move its left end
+                after = key(i)
+                if after != before:
+                    index[before].remove(i)
+                    bisect.insort(index.setdefault(after, []), i)
+                j = next_fragment(i, j)
+
+        removed = [contigs[j] for j in sorted(removed)]
+        self.remove_contigs([c.contig_id for c in removed])
+        return removed
 
     def circular_partition(self, length):
-        """This ensures that plasmids can circularize"""
+        """
+        This ensures that plasmids can circularize.
+
+        Every contig's query start + length and query end - length (within the query bounds) is a cut point.
+        Each contig is copied and split into two "circular_partition" contigs at every cut point
+        within its query, so that fragments that span the origin of a pseudocircular query can be joined.
+
+        Cut points are kept sorted, so the cut points within a query are found by binary search.
+
+        :param length: length of the (non-pseudocircular) query
+        :type length: int
+        :return: list of the new contigs
+        :rtype: list
+        """
         if not isinstance(length, int):
             raise TypeError("Length must be an Int")
-        new_ends = []
-        new_starts = []
+
+        # cut points in order of first appearance
+        cuts = {}
         for c in self.contigs:
-            ne = c.query.start + length
-            ns = c.query.end - length
-            if c.query.context.within_bounds(ne) and ne not in new_ends:
-                new_ends.append(ne)
-            if c.query.context.within_bounds(ns) and ns not in new_ends:
-                new_ends.append(ns)
+            for x in [c.query.start + length, c.query.end - length]:
+                if c.query.context.within_bounds(x) and x not in cuts:
+                    cuts[x] = len(cuts)
+        sorted_cuts = sorted(cuts)
 
         new_contigs = []
         for c in self.contigs:
-            for ne in new_ends:
-                if c.query.within_region(ne):
-                    c1 = c.copy()
-                    c2 = c.copy()
-                    c1.contig_type = "circular_partition"
-                    c2.contig_type = "circular_partition"
-                    c1.modify_query(c.query.start, ne)
-
-                    c2.modify_query(ne, c.query.end)
-
-                    new_contigs.append(c1)
-                    new_contigs.append(c2)
-            for ns in new_starts:
-                if c.query.within_region(ns):
-                    c1 = c.copy()
-                    c2 = c.copy()
-                    c1.contig_type = "circular_partition"
-                    c2.contig_type = "circular_partition"
-                    c1.modify_query(ns, c.query.end)
-
-                    c2.modify_query(c.query.start, ns)
-
-
-                    new_contigs.append(c1)
-                    new_contigs.append(c2)
+            hits = []
+            for lo, hi in c.query._valid_indices():
+                hits += sorted_cuts[bisect.bisect_left(sorted_cuts, lo):bisect.bisect_right(sorted_cuts, hi)]
+            for ne in sorted(hits, key=cuts.get):
+                c1 = c.copy()
+                c2 = c.copy()
+                c1.contig_type = "circular_partition"
+                c2.contig_type = "circular_partition"
+                c1.modify_query(c.query.start, ne)
+                c2.modify_query(ne, c.query.end)
+                new_contigs.append(c1)
+                new_contigs.append(c2)
 
         self.add_contigs(new_contigs)
         return new_contigs
 
-    def remove_redundant_contigs(self):
+    def remove_redundant_contigs(self, keep="first", by_subject=False):
         """
-        Removes contigs with the same start and end.
+        Removes contigs with the same query start and end.
 
-        :return: None
-        :rtype: None
-        """
-        # pair start and end to a unique number
-        # assign to dictionary
-        pair_dict = {}
-        for c in self.contigs:
-            i = pair(c.query.start, c.query.end)
-            if i not in pair_dict:
-                pair_dict[i] = []
-            pair_dict[i].append(c.contig_id)
-
-        # remove redundant pairings
-        for key, contigs in pair_dict.items():
-            if len(contigs) > 1:
-                for c in contigs[1:]:
-                    del self[c]
+        Which of the redundant contigs is kept matters for the assemblies that can be found:
 
+            "first": the first contig in the container
+            "bit_score": the contig with the highest bit score
+            "subject_length": the contig with the longest subject
+            "evalue": the contig with the lowest evalue
 
+        Ties are kept in container order.
 
+        :param keep: one of REPRESENTATIVES
+        :type keep: str
+        :param by_subject: if True, contigs are only redundant if their query directions and their subject names,
+                           starts, ends and directions are also the same
+        :type by_subject: bool
+        :return: list of the removed contigs
+        :rtype: list
+        """
+        if keep not in REPRESENTATIVES:
+            raise ValueError("Representative '{}' not in {}".format(keep, REPRESENTATIVES))
+        contigs = self.contigs
 
+        columns = [[c.query.start for c in contigs], [c.query.end for c in contigs]]
+        if by_subject:
+            subject_names = {}
+            columns += [
+                [c.query.direction for c in contigs],
+                [subject_names.setdefault(c.subject.name, len(subject_names)) for c in contigs],
+                [c.subject.start for c in contigs],
+                [c.subject.end for c in contigs],
+                [c.subject.direction for c in contigs],
+            ]
+
+        preference = None
+        if keep == "bit_score":
+            preference = -np.array([getattr(c, "bit_score", 1) for c in contigs], dtype=float)
+        elif keep == "subject_length":
+            preference = -np.array([c.subject.length for c in contigs], dtype=float)
+        elif keep == "evalue":
+            preference = np.array([getattr(c, "evalue", 10000) for c in contigs], dtype=float)
+
+        removed = [contigs[i] for i in redundant_rows([np.array(c) for c in columns], preference)]
+        self.remove_contigs([c.contig_id for c in removed])
+        return removed
 
                 # def dump(self):
                 #     pass
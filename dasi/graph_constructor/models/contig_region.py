@@ -1,5 +1,3 @@
-from copy import deepcopy
-
 from dasi.graph_constructor.exceptions import ContigError
 from dasi.graph_constructor.models.region import Region
 
@@ -8,6 +6,8 @@ class ContigRegion(Region):
     """ A ContigRegion is a :class:`Region` designated for establishing SUBJECTS or QUERIES from BLAST results. Circular
     topologies are supported. Contig regions support gaps. """
 
+    __slots__ = ('sequence', 'filename')
+
     START_INDEX = 1  # Convention is carried over from BLAST results, BE CAREFUL!
     NEW_PRIMER = "new_primer"
     DIRECT_END = "direct"
@@ -69,8 +69,8 @@ class ContigRegion(Region):
         return super(ContigRegion, self).reverse_direction()
 
     def copy(self):
-        """Makes an approximately identical copy of the contig"""
-        return deepcopy(self)
+        """Makes an identical copy of the region that shares its context and sequence"""
+        return self._clone()
         # return ContigRegion(self.start, self.end,
         #              forward=(self.direction == Region.FORWARD),
         #              context=self.context,
@@ -33,6 +33,74 @@ def force_same_context(error=False):
     return context_wrapper
 
 
+# Integer kernels for regions given as (left_end, right_end, length, direction) coordinates
+# (see Region.coordinates) on a context starting at context_start with context_length positions.
+# They give the same results as the Region methods without creating intermediate regions.
+
+def region_within(pos, coordinates, context_length):
+    """Whether a position within the context bounds is within the region (see Region.within_region)"""
+    left_end, _, length, _ = coordinates
+    return (pos - left_end) % context_length < length
+
+
+def region_consecutive(left, right, context_start, context_length, circular):
+    """Whether the right region starts just after the left region ends (see Region.consecutive_with)"""
+    next_pos = left[1] + 1
+    if next_pos > context_start + context_length - 1:
+        if not circular:
+            return False
+        next_pos -= context_length
+    return right[0] == next_pos
+
+
+def region_overlap_span(left, right, context_length, circular):
+    """Length of the overlap of the end of the left region with the right region (see Region.get_overlap)"""
+    if region_within(right[0], left, context_length) and not region_within(right[1], left, context_length):
+        if circular:
+            return (left[1] - right[0]) % context_length + 1
+        return left[1] - right[0] + 1
+    return None
+
+
+def region_gap_length(left, right, context_start, context_length, circular, same=False):
+    """Length of the gap between the left and right regions (see Region.get_gap)"""
+    if region_consecutive(left, right, context_start, context_length, circular):
+        return None
+    right_lp = min(right[0], right[1])
+    if not same and region_within(right_lp, left, context_length):
+        return None
+    start, end = left[1] + 1, right[0] - 1
+    context_end = context_start + context_length - 1
+    if circular:
+        start = (start - context_start) % context_length + context_start
+        end = (end - context_start) % context_length + context_start
+    elif start > context_end or end < context_start:
+        return None
+    direction = left[3]
+    if direction == Region.REVERSE:
+        spans_origin = end > start
+    else:
+        spans_origin = start > end and direction == Region.FORWARD
+    if spans_origin:
+        if not circular:
+            return None
+        return context_length - abs(start - end) + 1
+    return abs(start - end) + 1
+
+
+def region_gap_span(left, right, context_start, context_length, circular, same=False):
+    """
+    Span of the gap between the left and right regions: 0 if consecutive, negative for overlaps and
+    positive for gaps (see Region.get_gap_span)
+    """
+    if region_consecutive(left, right, context_start, context_length, circular):
+        return 0
+    overlap = region_overlap_span(left, right, context_length, circular)
+    if overlap is not None:
+        return -overlap
+    return region_gap_length(left, right, context_start, context_length, circular, same=same)
+
+
 class Region(object):
     """
     Classifies an abstract region of a sequence. A region is defined by the inclusive "start" and "end"
@@ -76,6 +144,8 @@ class Region(object):
                       s e          Start (s) and end (e)
     """
 
+    __slots__ = ('name', 'context', '__start', '__end', '__direction', 'start_extendable', 'end_extendable')
+
     START_INDEX = 1
     FORWARD = 1
     REVERSE = -1
@@ -180,6 +250,23 @@ class Region(object):
     def circular(self):
         return self.context.circular
 
+    @property
+    def coordinates(self):
+        """(left_end, right_end, length, direction) of this region, for the region kernels"""
+        start, end, direction = self.__start, self.__end, self.__direction
+        lp, rp = (start, end) if start <= end else (end, start)
+        if (start > end and direction == Region.FORWARD) or (end > start and direction == Region.REVERSE):
+            length = None
+            if self.context.circular:
+                length = self.context.length - rp + lp + 1
+            return rp, lp, length, direction
+        return lp, rp, rp - lp + 1, direction
+
+    def _check_same_context(self, other):
+        """Raises a RegionError if the other region has a different context"""
+        if self.context is not other.context and not self.same_context(other):
+            raise RegionError("Cannot compare two regions if they have different sequence contexts.")
+
     @property
     def start(self):
         """
@@ -548,7 +635,6 @@ class Region(object):
         else:
             return None
 
-    @force_same_context(error=True)
     def get_gap_span(self, other):
         """
         Returns span of gap. Returns 0 if regions are consecutive, negative if regions overlap, positive for gaps.
@@ -571,15 +657,10 @@ class Region(object):
         :return: span of gap (0 for consecutive, - for overlap, + for gap)
         :rtype: int
         """
-        overlap = self.get_overlap(other)
-        gap = self.get_gap(other)
-        cons = self.consecutive_with(other)
-        if cons:
-            return 0
-        if overlap is not None:
-            return -overlap.length
-        if gap is not None:
-            return gap.length
+        self._check_same_context(other)
+        context = self.context
+        return region_gap_span(self.coordinates, other.coordinates, context.start, context.length, context.circular,
+                               same=self is other)
 
     # @force_same_context(error=True)
     # def no_overlap(self, other):
@@ -594,7 +675,6 @@ class Region(object):
     #     return not self.within_region(other.start, inclusive=True) \
     #            and not other.within_region(self.end, inclusive=True)
 
-    @force_same_context(error=True)
     def consecutive_with(self, other, ignore_direction=True):
         """
         Returns whether the right_end is consecutive with the other region's left_end ::
@@ -607,19 +687,10 @@ class Region(object):
         :rtype: bool
         """
 
-        expected_right_end = None
-        expected_left_end = None
-        try:
-            expected_left_end = self.context.translate_pos(self.right_end+1)
-        except RegionError:
-            return False
-        try:
-            expected_right_end = other.context.translate_pos(other.left_end-1)
-        except RegionError:
-            return False
-        consecutive = self.right_end == expected_right_end and \
-                      other.left_end == expected_left_end
-        return consecutive
+        self._check_same_context(other)
+        context = self.context
+        return region_consecutive(self.coordinates, other.coordinates, context.start, context.length,
+                                  context.circular)
 
     @force_same_context(error=True)
     def fuse(self, other, inplace=True):
@@ -725,8 +796,31 @@ class Region(object):
             self.__direction = Region.FORWARD
         return self.direction
 
+    @classmethod
+    def _slot_names(cls):
+        """Attribute names of every slot of this class, with private names mangled"""
+        names = []
+        for klass in reversed(cls.__mro__):
+            for name in klass.__dict__.get('__slots__', ()):
+                if name.startswith('__') and not name.endswith('__'):
+                    name = '_' + klass.__name__.lstrip('_') + name
+                names.append(name)
+        return names
+
+    def _clone(self):
+        """Creates another region with the same attribute values, without validation. The context is shared."""
+        region = self.__class__.__new__(self.__class__)
+        for name in self._slot_names():
+            if hasattr(self, name):
+                setattr(region, name, getattr(self, name))
+        return region
+
+    def _state(self):
+        """Dictionary of the attribute values of this region"""
+        return {name: getattr(self, name) for name in self._slot_names() if hasattr(self, name)}
+
     def __eq__(self, other):
-        return self.__dict__ == other.__dict__
+        return type(self) is type(other) and self._state() == other._state()
 
     def __len__(self):
         return self.length
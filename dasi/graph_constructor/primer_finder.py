@@ -0,0 +1,237 @@
+"""
+In-process exact matching of primers against a query sequence.
+
+All primers (and their reverse complements) are indexed by an Aho-Corasick automaton, so every
+primer binding site in the query is found in a single pass over the query. N matches any base,
+in primers and in the query. Circular queries are matched across the origin.
+
+Ns in the query are handled during the scan: from an N on, the scan follows every automaton
+state that matches the query so far (an N advances every state to all of its children), and
+returns to a single state once the N is further back than the longest primer segment.
+"""
+
+from collections import deque
+
+from dasi.graph_constructor.models import Contig, ContigRegion, Context
+
+COMPLEMENT = str.maketrans("ACGTN", "TGCAN")
+WILDCARD = "N"
+
+
+def reverse_complement(bases):
+    return bases.upper()[::-1].translate(COMPLEMENT)
+
+
+def wildcard_equal(bases, pattern):
+    """Whether two sequences of the same length are equal, where N matches any base"""
+    return all(a == b or a == WILDCARD or b == WILDCARD for a, b in zip(bases, pattern))
+
+
+class PrimerIndex(object):
+    """
+    An Aho-Corasick automaton over the primers and their reverse complements. Primers with Ns are split into N-free
+    segments; a primer matches where all of its segments match at their offsets. ::
+
+        index = PrimerIndex(["ACGTTGCA", "GGNNCCTA"], names=["p1", "p2"])
+        contigs = index.find_contigs(query_bases, circular=True, name="query")
+    """
+
+    def __init__(self, primers, names=None):
+        """
+        :param primers: primer bases
+        :type primers: list
+        :param names: primer names, used as subject names of the contigs
+        :type names: list
+        """
+        self.primers = [p.upper() for p in primers]
+        if names is None:
+            names = [str(i) for i in range(len(primers))]
+        self.names = list(names)
+        # patterns are (primer index, forward, bases)
+        self.patterns = []
+        for i, bases in enumerate(self.primers):
+            self.patterns.append((i, True, bases))
+            self.patterns.append((i, False, reverse_complement(bases)))
+        self.max_length = max([len(p) for p in self.primers] or [0])
+
+        self._goto = [{}]
+        self._depth = [0]
+        self._fail = [0]
+        # node -> list of segment occurrences (pattern index, offset, segment length) ending at this node
+        self._out = [[]]
+        # node -> nearest node on the fail chain with occurrences
+        self._out_link = [0]
+        self._num_segments = []
+        for pattern_index, (_, _, bases) in enumerate(self.patterns):
+            segments = self.segments(bases)
+            self._num_segments.append(len(segments))
+            for offset, segment in segments:
+                node = self._insert(segment)
+                self._out[node].append((pattern_index, offset, len(segment)))
+        self._build_links()
+
+    @staticmethod
+    def segments(bases):
+        """N-free segments of the bases as (offset, segment) tuples"""
+        segments = []
+        offset = 0
+        for segment in bases.split(WILDCARD):
+            if segment:
+                segments.append((offset, segment))
+            offset += len(segment) + 1
+        return segments
+
+    def _insert(self, segment):
+        node = 0
+        for ch in segment:
+            next_node = self._goto[node].get(ch)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._depth.append(self._depth[node] + 1)
+                self._fail.append(0)
+                self._out.append([])
+                self._out_link.append(0)
+                self._goto[node][ch] = next_node
+            node = next_node
+        return node
+
+    def _build_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(ch, 0)
+                if fail == child:
+                    fail = 0
+                self._fail[child] = fail
+                self._out_link[child] = fail if self._out[fail] else self._out_link[fail]
+                queue.append(child)
+
+    def iter_matches(self, bases, circular=False):
+        """
+        Yields every match of a primer in the bases as (primer index, start, forward), where start is the 0-based
+        position of the first base of the match in the bases. Matches of circular sequences may run past the end
+        of the sequence.
+
+        :param bases: bases of the query
+        :type bases: str
+        :param circular: whether the query is circular
+        :type circular: bool
+        :return: generator of matches
+        :rtype: generator
+        """
+        bases = bases.upper()
+        length = len(bases)
+        text = bases
+        if circular and length:
+            text = bases + bases[:self.max_length - 1]
+
+        found = set()
+        counts = {}
+
+        def add_hits(j, hits):
+            for pattern_index, offset, segment_length in hits:
+                start = j - segment_length + 1 - offset
+                if start < 0 or start >= length:
+                    continue
+                pattern_length = len(self.patterns[pattern_index][2])
+                if start + pattern_length > len(text) or (not circular and start + pattern_length > length):
+                    continue
+                num_segments = self._num_segments[pattern_index]
+                if num_segments > 1:
+                    key = (pattern_index, start)
+                    count = counts.get(key, 0) + 1
+                    if count < num_segments:
+                        counts[key] = count
+                        continue
+                    del counts[key]
+                found.add((pattern_index, start))
+
+        goto, fail, out, out_link, depth = self._goto, self._fail, self._out, self._out_link, self._depth
+        max_depth = max(depth)
+        node = 0
+        # after an N, every state that matches the query so far (None while there is a single state)
+        states = None
+        last_wildcard = None
+        for j, ch in enumerate(text):
+            if ch == WILDCARD:
+                if states is None:
+                    # the state and its fail chain are every state matching the query so far
+                    states = [node]
+                    while node:
+                        node = fail[node]
+                        states.append(node)
+                states = [0] + [child for state in states for child in goto[state].values()]
+                last_wildcard = j
+            elif states is not None:
+                states = [0] + [goto[state][ch] for state in states if ch in goto[state]]
+                if j - last_wildcard >= max_depth:
+                    # no state spans the N anymore, so the deepest state and its fail chain are all states
+                    node = max(states, key=depth.__getitem__)
+                    states = None
+            else:
+                while node and ch not in goto[node]:
+                    node = fail[node]
+                node = goto[node].get(ch, 0)
+                hit = node if out[node] else out_link[node]
+                while hit:
+                    add_hits(j, out[hit])
+                    hit = out_link[hit]
+                continue
+            if states is not None:
+                for state in states:
+                    if out[state]:
+                        add_hits(j, out[state])
+            else:
+                hit = node if out[node] else out_link[node]
+                while hit:
+                    add_hits(j, out[hit])
+                    hit = out_link[hit]
+
+        # primers of only Ns have no segments and match every window
+        for pattern_index, (_, _, pattern) in enumerate(self.patterns):
+            if pattern and not self._num_segments[pattern_index]:
+                last = length if circular else length - len(pattern) + 1
+                found.update((pattern_index, start) for start in range(max(last, 0)))
+
+        for pattern_index, start in sorted(found, key=lambda m: (m[1], m[0])):
+            primer_index, forward, pattern = self.patterns[pattern_index]
+            if len(pattern) > length:
+                continue
+            yield primer_index, start, forward
+
+    def find_contigs(self, bases, circular=False, name=None, contig_type=Contig.TYPE_PRIMER):
+        """
+        Returns a primer :class:`Contig` for every match of a primer in the query. The subject of a contig is the
+        primer, reversed for primers that bind the reverse strand.
+
+        :param bases: bases of the query
+        :type bases: str
+        :param circular: whether the query is circular
+        :type circular: bool
+        :param name: name of the query
+        :type name: str
+        :param contig_type: type of the contigs
+        :type contig_type: str
+        :return: list of contigs
+        :rtype: list
+        """
+        query_context = Context.interned(len(bases), circular, start_index=ContigRegion.START_INDEX)
+        contigs = []
+        for primer_index, start, forward in self.iter_matches(bases, circular=circular):
+            primer_length = len(self.primers[primer_index])
+            query_start = start + ContigRegion.START_INDEX
+            query = ContigRegion(query_start, query_context.translate_pos(query_start + primer_length - 1),
+                                 query_context, name=name)
+            subject_context = Context.interned(primer_length, False, start_index=ContigRegion.START_INDEX)
+            subject_start, subject_end = subject_context.start, subject_context.end
+            if not forward:
+                subject_start, subject_end = subject_end, subject_start
+            subject = ContigRegion(subject_start, subject_end, subject_context, name=self.names[primer_index],
+                                   forward=forward)
+            contigs.append(Contig(query, subject, contig_type))
+        return contigs
@@ -1,12 +1,14 @@
 import graphene
 from graphene import relay
 
+from dasi.blast_cache import get_blast_cache, is_perfect
 from dasi.database import get_session
-from dasi.models import Alignment, SequenceRegion, AlignmentScore, Primer
+from dasi.models import Alignment, SequenceRegion, AlignmentScore, Primer, Sequence
 from dasi.graphql_schema.base import ActiveSQLAlchemyObjectType
 from dasi.graphql_schema.sequence import Sequences
 from dasi.graphql_schema.primer import Primers
-from pyblast import JSONBlast
+from dasi.graph_constructor.blast import ShardedBlast
+from dasi.graph_constructor.primer_finder import PrimerIndex
 
 
 class SequenceRegions(ActiveSQLAlchemyObjectType):
@@ -27,9 +29,44 @@ class AlignmentScores(ActiveSQLAlchemyObjectType):
         interfaces = (relay.Node,)
 
 
+def primer_alignments(query_seq, primers):
+    """
+    Finds the perfect binding sites of primers on a query sequence (see :class:`PrimerIndex`) and returns them
+    as alignments in the pyblast format. Exact matches are scored by their length.
+
+    :param query_seq: query Sequence
+    :param primers: list of Primers
+    :return: list of alignments
+    :rtype: list
+    """
+    index = PrimerIndex([p.bases for p in primers])
+    length = len(query_seq.bases)
+    alignments = []
+    for primer_index, start, forward in index.iter_matches(query_seq.bases, circular=query_seq.circular):
+        primer = primers[primer_index]
+        primer_length = len(primer.bases)
+        end = (start + primer_length - 1) % length
+        query_bases = (query_seq.bases + query_seq.bases)[start:start + primer_length]
+        subject_start, subject_end = 1, primer_length
+        if not forward:
+            subject_start, subject_end = subject_end, subject_start
+        alignments.append({
+            "query": {"sequence_id": query_seq.id, "name": query_seq.name, "length": length,
+                      "circular": query_seq.circular, "start": start + 1, "end": end + 1, "strand": "plus",
+                      "bases": query_bases},
+            "subject": {"sequence_id": primer.id, "name": primer.name, "length": primer_length, "circular": False,
+                        "start": subject_start, "end": subject_end, "strand": "plus" if forward else "minus",
+                        "bases": primer.bases},
+            "meta": {"score": primer_length, "evalue": 0.0, "bit_score": float(primer_length),
+                     "identical": primer_length, "gaps_open": 0, "gaps": 0, "alignment_length": primer_length,
+                     "span_origin": query_seq.circular},
+        })
+    return alignments
+
+
 class createAlignment(graphene.Mutation):
     """
-    Utilizes a JSONBlast to find perfect alignments between a query and subjects.
+    Utilizes a ShardedBlast to find perfect alignments between a query and subjects.
 
     If subject_ids are not provided, the query will be aligned to the entire database.
     """
@@ -50,17 +87,23 @@ class createAlignment(graphene.Mutation):
         db_session = get_session()
         query_seq = graphene.Node.get_node_from_global_id(info, query_id)
 
-        if subject_ids is None:
-            query = Sequences.get_query(info)
-            subjects = query.all()
-            subjects = [s for s in subjects if s.id != query_seq.id]
+        cache = get_blast_cache()
+        if subject_ids is None and cache.available:
+            # align against the prebuilt database of the sequence table
+            alignments = cache.align("sequence", Sequence, db_session, query_seq, span_origin=True,
+                                     gapopen=3, gapextend=3, penalty=-5, reward=1)
+            alignments = [a for a in alignments if a['subject']['sequence_id'] != query_seq.id and is_perfect(a)]
         else:
-            subjects = [graphene.Node.get_node_from_global_id(info, sid) for sid in subject_ids]
-
-        j = JSONBlast(subjects, query_seq, preloaded=True, span_origin=True, gapopen=3, gapextend=3, penalty=-5, reward=1)
-        j.quick_blastn()
+            if subject_ids is None:
+                query = Sequences.get_query(info)
+                subjects = query.all()
+                subjects = [s for s in subjects if s.id != query_seq.id]
+            else:
+                subjects = [graphene.Node.get_node_from_global_id(info, sid) for sid in subject_ids]
 
-        alignments = j.results.get_perfect().alignments
+            blast = ShardedBlast(subjects, query_seq, preloaded=True, span_origin=True, gapopen=3, gapextend=3,
+                                 penalty=-5, reward=1)
+            alignments = blast.quick_blastn(perfect=True)
 
         ok = False
         results = []
@@ -104,13 +147,7 @@ class createPrimerResults(graphene.Mutation):
         else:
             primers = [graphene.Node.get_node_from_global_id(info, pid) for pid in primer_ids]
 
-        for p in primers:
-            p.circular = False
-
-        j = JSONBlast(primers, query_seq, preloaded=True, span_origin=False, gapopen=3, gapextend=3, penalty=-5, reward=1)
-        j.quick_blastn_short()
-
-        alignments = j.results.get_with_perfect_subjects().get_perfect().alignments
+        alignments = primer_alignments(query_seq, primers)
 
         ok = False
         results = []
@@ -1,6 +1,7 @@
 import graphene
 from graphene import relay
 
+from dasi.blast_cache import get_blast_cache
 from dasi.database import get_session
 from dasi.models import Sequence, Feature
 from dasi.graphql_schema.base import ActiveSQLAlchemyObjectType
@@ -59,6 +60,9 @@ class createSequence(graphene.Mutation):
             seq.features.append(Feature(**feature))
         db_session.add(seq)
         db_session.commit()
+        cache = get_blast_cache()
+        if cache.available:
+            cache.update("sequence", Sequence, db_session, span_origin=True)
         ok = True
         return createSequence(sequence=seq, ok=ok)
 
@@ -3,7 +3,7 @@ import json
 
 import pytest
 from dasi.graph_constructor.models import ContigContainer
-from pyblast import JSONBlast
+from dasi.graph_constructor.blast import ShardedBlast
 
 
 TEST_DIR = os.path.dirname(os.path.realpath(__file__))
@@ -36,18 +36,18 @@ def aligner():
     with open(query_path, 'r') as f:
         query = json.load(f)
 
-    jsonblast = JSONBlast(
+    blast = ShardedBlast(
         subject,
         query,
         span_origin=True,
     )
-    jsonblast.quick_blastn()
-    return jsonblast
+    blast.quick_blastn()
+    return blast
 
 @pytest.fixture(scope="function")
 def cc():
     a = aligner()
-    cc = ContigContainer.parse_alignments(a.results, list(a.seq_dict.values()))
+    cc = ContigContainer.parse_alignments(a.alignments, list(a.seq_dict.values()))
     return cc
 
 # _cc = ContigContainer.parse_alignments(aligner().results, sequences=aligner().seq_db.sequences)
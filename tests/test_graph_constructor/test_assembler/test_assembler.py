@@ -1,7 +1,14 @@
-from dasi.graph_constructor.models import ContigRegion, Context, BlastContig
+from dasi.graph_constructor.models import ContigRegion, Context, BlastContig, ContigContainer, ColumnarContigContainer
 from dasi.graph_constructor import Assembler, Assembly
+from dasi.graph_constructor.assembly import AssemblyGraph, NodeIndex
+from dasi.graph_constructor.cost_functions import GibsonAssemblyCost
+
+import itertools
+import random
 
 import networkx as nx
+import numpy as np
+import pytest
 
 
 def test_assembler_init(cc):
@@ -30,4 +37,228 @@ def test_graph_init_pseudocircular(pseudocircular_cc):
 def test_dfs_iter(pseudocircular_cc, capsys):
     with capsys.disabled():
         a = Assembler(pseudocircular_cc)
-        a.dfs_iter()
\ No newline at end of file
+        a.dfs_iter()
+
+
+def random_contigs(num, seed=0):
+    """Random contigs on a 4000bp pseudocircular query"""
+    random.seed(seed)
+    query_context = Context(4000, True)
+    subject_context = Context(10000, True)
+    contigs = []
+    for _ in range(num):
+        start = random.randint(1, 3800)
+        end = start + random.randint(20, 1500)
+        if end > 4000:
+            end = 4000
+        query = ContigRegion(start, end, query_context)
+        subject = ContigRegion(1, end - start + 1, subject_context)
+        contigs.append(BlastContig(query, subject, "test"))
+    return contigs
+
+
+def test_gap_pairs_matches_permutations():
+    """Binary searched gap pairs should be identical to pairs found by testing every permutation"""
+    contigs = random_contigs(200)
+    query_length = 2000
+    expected = []
+    for left, right in itertools.permutations(contigs, 2):
+        gap = right.query.start - left.query.end
+        closing = False
+        if left.query.rp > right.query.lp:
+            gap = query_length - (left.query.rp - right.query.lp)
+            closing = True
+        if -100 < gap < 2000:
+            expected.append((left, right, gap, closing))
+
+    pairs = list(Assembler.gap_pairs(contigs, query_length, -100, 2000))
+    assert len(expected) > 0
+    assert pairs == expected
+
+
+def test_gap_pair_arrays_matches_gap_pairs():
+    contigs = random_contigs(200, seed=1)
+    query_length = 2000
+    index = {c.contig_id: i for i, c in enumerate(contigs)}
+    expected = [(index[l.contig_id], index[r.contig_id], gap, closing)
+                for l, r, gap, closing in Assembler.gap_pairs(contigs, query_length, -100, 2000)]
+
+    left, right, gaps, closing = Assembler.gap_pair_arrays(
+        np.array([c.query.start for c in contigs]),
+        np.array([c.query.end for c in contigs]),
+        np.array([c.query.lp for c in contigs]),
+        np.array([c.query.rp for c in contigs]),
+        query_length, -100, 2000
+    )
+    pairs = list(zip(left.tolist(), right.tolist(), gaps.tolist(), closing.tolist()))
+    assert pairs == expected
+
+
+def test_graph_using_arrays_matches_starts_and_ends():
+    a = Assembler(ContigContainer(random_contigs(150, seed=2)))
+    a.create_assembly_graph_using_arrays()
+    batched = a.graph
+    a.create_assembly_graph_using_starts_and_ends()
+    assert batched.number_of_edges() > 0
+    assert list(batched.nodes(data=True)) == list(a.graph.nodes(data=True))
+    assert list(batched.edges(data=True)) == list(a.graph.edges(data=True))
+
+
+def test_graph_using_arrays_matches_starts_and_ends_not_extendable():
+    contigs = random_contigs(150, seed=4)
+    for i, c in enumerate(contigs):
+        c.lp_extendable = i % 3 != 0
+        c.rp_extendable = i % 2 != 0
+    for cc in [ContigContainer(contigs), ColumnarContigContainer(contigs)]:
+        a = Assembler(cc)
+        a.create_assembly_graph_using_arrays()
+        batched = a.graph
+        a.create_assembly_graph_using_starts_and_ends()
+        assert batched.number_of_edges() > 0
+        assert list(batched.nodes(data=True)) == list(a.graph.nodes(data=True))
+        assert list(batched.edges(data=True)) == list(a.graph.edges(data=True))
+
+
+def test_assembler_cost_function():
+    cc = ContigContainer(random_contigs(40, seed=3))
+    cheap = GibsonAssemblyCost(PRIMER_COST=0.0, ULTRAMER_COST=0.0)
+    a = Assembler(cc)
+    b = Assembler(cc, cost_function=cheap)
+    assert a.cost_function is GibsonAssemblyCost.cached()
+    assert b.cost_function is cheap
+    assert set(a.graph.edges) == set(b.graph.edges)
+    assert sum(b.graph.edges[e]['weight'] for e in b.graph.edges) <= \
+        sum(a.graph.edges[e]['weight'] for e in a.graph.edges)
+
+
+def circular_cycles(G):
+    """Every simple cycle with exactly one closing gap, ending with the closing gap, with its cost, by brute force"""
+    cycles = []
+    for cycle in nx.simple_cycles(G):
+        edges = list(zip(cycle, cycle[1:] + cycle[:1]))
+        closing = [i for i, e in enumerate(edges) if G.edges[e]['type'] == 'closing_gap']
+        if len(closing) == 1:
+            cycle = cycle[closing[0] + 1:] + cycle[:closing[0] + 1]
+            cycles.append((sum(G.edges[e]['weight'] for e in edges), tuple(cycle)))
+    return sorted(cycles)
+
+
+def cycle_contigs(spans):
+    """Contigs on a pseudocircular query; the first contig's span sets the query length to half its length"""
+    query_context = Context(4000, True)
+    subject_context = Context(10000, True)
+    return [BlastContig(ContigRegion(start, end, query_context), ContigRegion(1, end - start + 1, subject_context),
+                        "test") for start, end in spans]
+
+
+def test_top_assemblies_matches_simple_cycles():
+    graphs = [
+        [(1, 1200), (1, 200), (1, 250), (231, 450), (261, 430), (471, 590), (451, 600), (180, 520)],
+        [(1, 1000), (1, 150), (121, 300), (281, 420), (331, 480), (41, 390), (441, 500), (11, 180)],
+    ]
+    for spans in graphs:
+        a = Assembler(ContigContainer(cycle_contigs(spans)))
+        cycles = circular_cycles(a.graph)
+        assert len(cycles) > 5
+        assert len({round(cost, 6) for cost, _ in cycles[:5]}) > 1
+
+        assemblies = a.top_assemblies(k=5)
+        assert [assembly.cost for assembly in assemblies] == pytest.approx([cost for cost, _ in cycles[:5]])
+        for assembly in assemblies:
+            nodes = assembly.nodes
+            assert a.graph.edges[nodes[-1], nodes[0]]['type'] == 'closing_gap'
+            assert len(assembly.assembly_path) == len(nodes) // 2
+
+        # all cycles, in order of cost
+        assemblies = a.top_assemblies(k=len(cycles) + 5)
+        assert [assembly.cost for assembly in assemblies] == pytest.approx([cost for cost, _ in cycles])
+        assert {tuple(assembly.nodes) for assembly in assemblies} == {cycle for _, cycle in cycles}
+
+
+def test_top_assemblies_budget():
+    a = Assembler(ContigContainer(random_contigs(100, seed=1)))
+    assert len(a.top_assemblies(k=5)) == 5
+    assert a.top_assemblies(k=5, max_expansions=0) == []
+    assert a.top_assemblies(k=5, timeout=-1) == []
+
+
+def test_top_assemblies_budget_large_graph():
+    a = Assembler(ContigContainer(random_contigs(800, seed=3)), graph_backend="csr")
+    assert a.graph.number_of_edges() > 200000
+    a.top_assemblies(k=5, max_expansions=1)
+    assert a.search_stats == {'expansions': 1, 'distance_computations': 1}
+    assert a.top_assemblies(k=5, timeout=-1) == []
+    assert a.search_stats == {'expansions': 0, 'distance_computations': 0}
+
+
+def test_csr_graph_matches_networkx():
+    cc = ContigContainer(random_contigs(150, seed=2))
+    a = Assembler(cc)
+    b = Assembler(cc, graph_backend="csr")
+    assert isinstance(b.graph, AssemblyGraph)
+    assert len(b.graph) == len(a.graph)
+    assert b.graph.number_of_edges() == a.graph.number_of_edges()
+    exported = b.graph.to_networkx()
+    assert list(exported.nodes(data=True)) == list(a.graph.nodes(data=True))
+    assert list(exported.edges(data=True)) == list(a.graph.edges(data=True))
+
+    converted = AssemblyGraph.from_networkx(a.graph)
+    for name in ["node_keys", "node_sides", "node_x", "node_contigs", "indptr", "indices", "weights", "types"]:
+        assert np.array_equal(getattr(converted, name), getattr(b.graph, name))
+
+
+def test_csr_graph_reverse():
+    g = Assembler(ContigContainer(random_contigs(60, seed=4)), graph_backend="csr").graph
+    r = g.reverse()
+    assert r.reverse() is g
+    forward = sorted((n1, n2, w, t) for n1, n2, w, t in g.edges())
+    backward = sorted((n2, n1, w, t) for n1, n2, w, t in r.edges())
+    assert forward == backward
+
+
+def test_top_assemblies_csr():
+    cc = ContigContainer(random_contigs(100, seed=1))
+    a = Assembler(cc)
+    b = Assembler(cc, graph_backend="csr")
+    expected = a.top_assemblies(k=10)
+    assemblies = b.top_assemblies(k=10)
+    assert [x.cost for x in assemblies] == [x.cost for x in expected]
+    assert [x.assembly_path for x in assemblies] == [x.assembly_path for x in expected]
+    assert [x.nodes for x in assemblies] == [x.nodes for x in expected]
+
+
+def test_invalid_graph_backend():
+    with pytest.raises(ValueError):
+        Assembler(ContigContainer(random_contigs(10)), graph_backend="igraph")
+
+
+def test_contigs_sharing_positions_keep_their_nodes():
+    contigs = random_contigs(100, seed=5)
+    query_context = contigs[0].query.context
+    subject_context = contigs[0].subject.context
+    first = contigs[0]
+    same_start = BlastContig(ContigRegion(first.query.start, first.query.end - 10, query_context),
+                             ContigRegion(1, first.query.end - 10 - first.query.start + 1, subject_context), "test")
+    contigs.append(same_start)
+    a = Assembler(ContigContainer(contigs))
+    contig_dict = {c.contig_id: c for c in contigs}
+    assert len(a.graph) == len(a.node_index)
+    for node_id, data in a.graph.nodes(data=True):
+        contig_id, side = a.node_index.key(node_id)
+        assert a.node_index[(contig_id, side)] == node_id
+        assert data['y'] == contig_id
+        contig = contig_dict[contig_id]
+        if side == NodeIndex.START:
+            assert data['data'] == "start" and data['x'] == contig.query.start
+        else:
+            assert data['data'] == "end" and data['x'] == contig.query.end
+    assert (first.contig_id, NodeIndex.START) in a.node_index
+    assert (same_start.contig_id, NodeIndex.START) in a.node_index
+
+
+def test_columnar_container_graph_matches():
+    contigs = random_contigs(150, seed=6)
+    a = Assembler(ContigContainer(contigs))
+    b = Assembler(ColumnarContigContainer(contigs))
+    assert list(b.graph.nodes(data=True)) == list(a.graph.nodes(data=True))
+    assert list(b.graph.edges(data=True)) == list(a.graph.edges(data=True))
@@ -0,0 +1,76 @@
+import json
+import os
+
+import pytest
+from pyblast import JSONBlast
+
+from dasi.graph_constructor.blast import ShardedBlast, shard_sequences, sequence_length, database_length
+from dasi.graph_constructor.models import ContigContainer
+from dasi.models import Sequence
+
+
+def test_shard_sequences(seq_dir):
+    with open(os.path.join(seq_dir, "templates.json"), 'r') as f:
+        templates = json.load(f)
+    shards = shard_sequences(templates, 4)
+    assert len(shards) == 4
+    assert sorted(s['name'] for shard in shards for s in shard) == sorted(s['name'] for s in templates)
+    totals = [sum(sequence_length(s) for s in shard) for shard in shards]
+    assert max(totals) - min(totals) <= max(sequence_length(s) for s in templates)
+    for shard in shards:
+        assert shard == [s for s in templates if s in shard]
+
+    assert len(shard_sequences(templates[:2], 4)) == 2
+    with pytest.raises(ValueError):
+        shard_sequences(templates, 0)
+
+
+def alignment_key(alignment):
+    """Coordinates of an alignment"""
+    query, subject = alignment['query'], alignment['subject']
+    return (query['start'], query['end'], query['strand'],
+            subject['name'], subject['start'], subject['end'], subject['strand'])
+
+
+def assert_same_alignments(alignments, expected):
+    alignments = sorted(alignments, key=alignment_key)
+    expected = sorted(expected, key=alignment_key)
+    assert [alignment_key(a) for a in alignments] == [alignment_key(a) for a in expected]
+    for a, e in zip(alignments, expected):
+        # shards share the database length, but BLAST's length adjustment counts only the shard's sequences
+        assert a['meta']['evalue'] == pytest.approx(e['meta']['evalue'], rel=0.05)
+
+
+def test_database_length():
+    sequences = [{'sequence': 'A' * 10, 'circular': True}, {'bases': 'A' * 5, 'circular': False}]
+    assert database_length(sequences) == 15
+    assert database_length(sequences, span_origin=True) == 25
+
+    # rows, e.g. Sequence rows
+    rows = [Sequence(id=i, name="seq", bases='A' * (i + 1) * 10, circular=i == 0) for i in range(3)]
+    assert sequence_length(rows[2]) == 30
+    assert database_length(rows, span_origin=True) == 70
+    assert [len(shard) for shard in shard_sequences(rows, 2)] == [1, 2]
+
+
+def test_sharded_blast(seq_dir):
+    with open(os.path.join(seq_dir, "templates.json"), 'r') as f:
+        subjects = json.load(f)
+    with open(os.path.join(seq_dir, "query.json"), 'r') as f:
+        query = json.load(f)
+
+    single = JSONBlast(subjects, query, span_origin=True)
+    single.quick_blastn()
+
+    blast = ShardedBlast(subjects, query, num_shards=3, processes=3, span_origin=True)
+    assert blast.blast_kwargs['dbsize'] == database_length(subjects, span_origin=True)
+    alignments = blast.quick_blastn()
+    assert_same_alignments(alignments, single.results.alignments)
+
+    cc = blast.contig_container()
+    assert isinstance(cc, ContigContainer)
+    expected = ContigContainer.parse_alignments(single.results, list(single.seq_dict.values()))
+    assert len(cc) == len(expected)
+
+    perfect = blast.quick_blastn(perfect=True)
+    assert_same_alignments(perfect, single.results.get_perfect().alignments)
@@ -0,0 +1,149 @@
+import itertools
+
+import numpy as np
+
+from dasi.graph_constructor.cost_functions import GibsonAssemblyCost
+from dasi.graph_constructor.cost_functions import gibson_assembly_cost_function
+from dasi.graph_constructor.cost_functions.gibson_assembly_cost_function import digitize_dictionary
+
+
+def test_score_table_matches_conditions():
+    gac = GibsonAssemblyCost.load()
+    table = gac.score_table()
+    offset = GibsonAssemblyCost.SCORE_SPAN_RANGE[0]
+    for row, (e, syn, d) in enumerate(gac.conditions()):
+        assert GibsonAssemblyCost.CONDITIONS[row] == (e, syn)
+        for span in range(-500, 5001, 13):
+            assert table[row, span - offset] == d[span]['score']
+
+
+def test_load_score_table():
+    gac = GibsonAssemblyCost.load()
+    table_only = GibsonAssemblyCost.load_score_table()
+    for e in range(3):
+        for syn in [True, False]:
+            expected = gac.gap_cost_dict(-500, 3000, e=e, syn=syn)
+            assert table_only.gap_cost_dict(-500, 3000, e=e, syn=syn) == expected
+            assert table_only.gap_cost(100, e=e, syn=syn) == expected[100]
+
+
+def test_cached():
+    gac = GibsonAssemblyCost.cached()
+    assert gac is GibsonAssemblyCost.cached()
+    assert gac.gap_cost_dict(-500, 3000, e=2) == GibsonAssemblyCost.load().gap_cost_dict(-500, 3000, e=2)
+
+
+def test_parameter_hash():
+    class CheapPrimers(GibsonAssemblyCost):
+        PRIMER_COST = 0.10
+
+    assert GibsonAssemblyCost.parameter_hash() == GibsonAssemblyCost.parameter_hash()
+    assert CheapPrimers.parameter_hash() != GibsonAssemblyCost.parameter_hash()
+
+
+def optimize_synthesis_options_loop(gac, synthesis_options, left_ext_dict, right_ext_dict):
+    """Reference (unvectorized) implementation of GibsonAssemblyCost._optimize_synthesis_options"""
+    results = {}
+    largest_overlap = gac.SYNTHESIS_SIZE_OPTIONS[1] - gac.SYNTHESIS_GAP_SPAN_RANGE[0]
+    smallest_overlap = gac.SYNTHESIS_SIZE_OPTIONS[0] - gac.SYNTHESIS_GAP_SPAN_RANGE[1]
+    left_ext_dict = digitize_dictionary(left_ext_dict, -largest_overlap, -smallest_overlap)
+    right_ext_dict = digitize_dictionary(right_ext_dict, -largest_overlap, -smallest_overlap)
+    for gap_span in range(*gac.SYNTHESIS_GAP_SPAN_RANGE):
+        results[gap_span] = None
+        for gene in synthesis_options:
+            max_overlap = gene['size'] - gap_span
+            extension_params = {'score': gac.INF, 'cost': gac.INF, 'eff': 0.0,
+                                'left': None, 'right': None, 'gene_offset': None}
+            for offset in range(0, max_overlap):
+                gap_left = -max_overlap + offset
+                gap_right = -max_overlap - gap_left
+                ext_left = left_ext_dict[gap_left]
+                ext_right = right_ext_dict[gap_right]
+                ext_cost = ext_left['cost'] + ext_right['cost']
+                ext_eff = ext_left['efficiency'] * ext_right['efficiency']
+                ext_score = gac.INF
+                if ext_eff > 0:
+                    ext_score = ext_cost / ext_eff
+                if ext_score < extension_params['score']:
+                    extension_params = {'score': ext_score, 'cost': ext_cost, 'eff': ext_eff,
+                                        'left': ext_left, 'right': ext_right, 'gene_offset': offset}
+            cost = gene['cost'] + extension_params['cost']
+            eff = extension_params['eff']
+            score = gac.INF
+            if eff > 0:
+                score = cost / eff
+            if results[gap_span] is None or score < results[gap_span]['score']:
+                results[gap_span] = {'score': score, 'cost': cost, 'gene_cost': gene['cost'],
+                                     'extension': extension_params, 'gene_size': gene['size'], 'eff': eff}
+    return results
+
+
+def test_optimize_synthesis_options():
+    class SmallSynthesis(GibsonAssemblyCost):
+        SYNTHESIS_GAP_SPAN_RANGE = (-200, 600, 10)
+        SYNTHESIS_SIZE_OPTIONS = (100, 800, 10)
+
+    loaded = GibsonAssemblyCost.load()
+    gac = SmallSynthesis()
+    none_extendable = loaded.gap_cost_dict_none_extendable()
+    one_extendable = loaded.gap_cost_dict_one_extendable()
+    for left, right in [(none_extendable, none_extendable), (one_extendable, none_extendable),
+                        (one_extendable, one_extendable)]:
+        expected = optimize_synthesis_options_loop(gac, gac.synthesis_options(), left, right)
+        assert gac._optimize_synthesis_options(gac.synthesis_options(), left, right) == expected
+
+
+def optimize_primer_loop(gac, primer_choices):
+    """Reference (unvectorized) implementation of GibsonAssemblyCost._optimize_primer"""
+    results = {}
+    for gap_span in range(*gac.JUNCTION_GAP_SPAN_RANGE):
+        results[gap_span] = None
+        for choice in primer_choices:
+            if not isinstance(choice, tuple):
+                choice = (choice,)
+            extensions = [x['extension'] for x in choice]
+            costs = [x['cost'] for x in choice]
+            names = [x['name'] for x in choice]
+            junction_efficiency = gac._junction_efficiency(-gap_span + sum(extensions))
+            score = gac.INF
+            if junction_efficiency > 0:
+                score = sum(costs) / junction_efficiency
+            if results[gap_span] is None or score < results[gap_span]['score']:
+                results[gap_span] = {"score": score, "cost": sum(costs), "efficiency": junction_efficiency,
+                                     "condition": f"{names}", "extension": f"{extensions}"}
+    return results
+
+
+def test_junction_efficiency_array():
+    gac = GibsonAssemblyCost()
+    overlaps = np.arange(-400, 400)
+    expected = [gac._junction_efficiency(x) for x in overlaps.tolist()]
+    assert gac._junction_efficiency_array(overlaps).tolist() == expected
+
+
+def test_optimize_primer():
+    gac = GibsonAssemblyCost()
+    options = gac.primer_extension_options()[::3] + gac.ultramer_extension_options()[::7]
+    for choices in [options, list(itertools.combinations(options, 2)),
+                    [{"extension": 0, "cost": 1.0, "name": "no primer"}]]:
+        assert gac._optimize_primer(choices) == optimize_primer_loop(gac, choices)
+
+
+def test_save_with_overrides(tmpdir, monkeypatch):
+    monkeypatch.setattr(gibson_assembly_cost_function, "HERE", str(tmpdir))
+
+    gac = GibsonAssemblyCost()
+    gac._score_table = np.zeros(gac._score_table_shape())
+    gac.save()
+    cheap = GibsonAssemblyCost(PRIMER_COST=0.10)
+    cheap._score_table = np.ones(cheap._score_table_shape())
+    cheap.save()
+
+    parameter_hash = cheap.parameter_hash(cheap.parameters())
+    assert sorted(f.basename for f in tmpdir.listdir()) == sorted([
+        "GibsonAssemblyCost.json", "GibsonAssemblyCost.npz",
+        "GibsonAssemblyCost.{}.json".format(parameter_hash), "GibsonAssemblyCost.{}.npz".format(parameter_hash)])
+    assert GibsonAssemblyCost.load_score_table().score_table().max() == 0
+    loaded = GibsonAssemblyCost(PRIMER_COST=0.10)
+    assert loaded._load_score_table() == parameter_hash
+    assert loaded.score_table().min() == 1
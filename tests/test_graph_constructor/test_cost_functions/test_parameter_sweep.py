@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from dasi.graph_constructor.cost_functions import GibsonAssemblyCost, sweep
+
+
+SCENARIOS = {
+    "default": {},
+    "cheap_primers": {"PRIMER_COST": 0.3},
+    "cheap_synthesis": {"SYNTHESIS_SIZE_OPTIONS": (100, 1000, 10)},
+    "also_default": {"PRIMER_COST": GibsonAssemblyCost.PRIMER_COST},
+}
+
+
+def test_sweep_matches_compute():
+    costs = sweep(SCENARIOS, processes=1)
+    assert set(costs) == set(SCENARIOS)
+    for name, parameters in SCENARIOS.items():
+        expected = GibsonAssemblyCost(**parameters)
+        expected.compute()
+        assert costs[name].parameters() == expected.parameters()
+        assert np.array_equal(costs[name].score_table(), expected.score_table())
+
+
+def test_sweep_shares_tables():
+    costs = sweep(SCENARIOS, processes=1)
+    assert costs["default"] is costs["also_default"]
+    assert costs["default"].gap_cost_dict_one_extendable() is \
+        costs["cheap_synthesis"].gap_cost_dict_one_extendable()
+    assert costs["default"].gap_cost_dict_one_extendable() is not \
+        costs["cheap_primers"].gap_cost_dict_one_extendable()
+    assert np.array_equal(costs["default"].score_table(), GibsonAssemblyCost.cached().score_table())
+
+
+def test_sweep_process_pool():
+    scenarios = [{}, {"ULTRAMER_COST": 0.5}]
+    serial = sweep(scenarios, processes=1)
+    pooled = sweep(scenarios, processes=2)
+    assert set(pooled) == {0, 1}
+    for key in serial:
+        assert np.array_equal(serial[key].score_table(), pooled[key].score_table())
+
+
+def test_sweep_invalid_parameter():
+    with pytest.raises(ValueError):
+        sweep({"bad": {"NOT_A_PARAMETER": 1}}, processes=1)
@@ -0,0 +1,124 @@
+import json
+import math
+import os
+import random
+
+import pytest
+
+from dasi.graph_constructor.kmer_aligner import KmerAligner, find_alignments, karlin_altschul, reverse_complement
+from dasi.graph_constructor.models import ContigContainer, Region
+
+
+def random_bases(length, rng):
+    return ''.join(rng.choice("ACGT") for _ in range(length))
+
+
+@pytest.fixture(scope="module")
+def library():
+    rng = random.Random(7)
+    template = random_bases(300, rng)
+    plasmid = random_bases(200, rng)
+    return template, plasmid, rng
+
+
+def test_forward_and_reverse_matches(library):
+    template, _, rng = library
+    insert = template[100:180]
+    query = {"id": "q", "bases": random_bases(50, rng) + insert + random_bases(50, rng) +
+             reverse_complement(insert) + random_bases(50, rng), "circular": False}
+    aligner = KmerAligner([{"id": "t", "bases": template, "circular": False}], k=12)
+    contigs = sorted(aligner.align(query, min_length=40), key=lambda c: c.query.start)
+    assert len(contigs) == 2
+
+    forward, reverse = contigs
+    assert (forward.query.start, forward.query.end) == (51, 130)
+    assert (forward.subject.start, forward.subject.end) == (101, 180)
+    assert forward.subject.direction == Region.FORWARD
+    assert forward.alignment_length == forward.identical == 80
+
+    assert (reverse.query.start, reverse.query.end) == (181, 260)
+    assert (reverse.subject.start, reverse.subject.end) == (180, 101)
+    assert reverse.subject.direction == Region.REVERSE
+    assert reverse.query.name == "q"
+    assert reverse.subject.name == "t"
+
+
+def test_match_across_origins(library):
+    _, plasmid, rng = library
+    # the query contains the origin of the circular template, and the match runs across the query's origin
+    rotated = plasmid[150:] + plasmid[:100]
+    query_bases = rotated[20:] + random_bases(100, rng) + rotated[:20]
+    aligner = KmerAligner([{"id": "p", "bases": plasmid, "circular": True}], k=12)
+    contigs = aligner.align({"id": "q", "bases": query_bases, "circular": True}, min_length=100)
+    assert len(contigs) == 1
+    contig = contigs[0]
+    assert contig.alignment_length == 150
+    assert (contig.query.start, contig.query.end) == (len(query_bases) - 19, 130)
+    assert (contig.subject.start, contig.subject.end) == (151, 100)
+
+    # a linear query splits the match at its origin
+    contigs = aligner.align({"id": "q", "bases": query_bases, "circular": False}, min_length=12)
+    assert sorted(c.alignment_length for c in contigs) == [20, 130]
+
+
+def test_whole_plasmid_match_is_reported_once(library):
+    _, plasmid, _ = library
+    aligner = KmerAligner([{"id": "p", "bases": plasmid, "circular": True}], k=12)
+    for rotation in [0, 50]:
+        query = {"id": "q", "bases": plasmid[rotation:] + plasmid[:rotation], "circular": True}
+        contigs = aligner.align(query, min_length=100)
+        assert [(c.query.start, c.query.end, c.subject.start) for c in contigs] == [(1, 200, rotation + 1)]
+
+        query = {"id": "q", "bases": reverse_complement(query['bases']), "circular": True}
+        assert len(aligner.align(query, min_length=100)) == 1
+
+
+def test_mismatches(library):
+    template, _, _ = library
+    query_bases = list(template[50:150])
+    query_bases[40] = "A" if query_bases[40] != "A" else "C"
+    query = {"id": "q", "bases": ''.join(query_bases), "circular": False}
+    aligner = KmerAligner([{"id": "t", "bases": template, "circular": False}], k=12)
+
+    assert sorted(c.alignment_length for c in aligner.align(query, min_length=12)) == [40, 59]
+
+    contigs = aligner.align(query, min_length=12, max_mismatches=1)
+    assert len(contigs) == 1
+    assert contigs[0].alignment_length == 100
+    assert contigs[0].identical == 99
+
+
+def test_karlin_altschul():
+    # the ungapped parameters blastn reports for these rewards and penalties
+    for (reward, penalty), (lam, K) in [((1, -2), (1.33, 0.621)), ((1, -3), (1.37, 0.711)),
+                                         ((2, -3), (0.634, 0.408))]:
+        assert karlin_altschul(reward, penalty) == pytest.approx((lam, K), abs=0.005)
+    with pytest.raises(ValueError):
+        karlin_altschul(1, 1)
+
+
+def test_blast_scores(library):
+    template, _, _ = library
+    aligner = KmerAligner([{"id": "t", "bases": template, "circular": False}], k=12, reward=1, penalty=-3)
+    score, bit_score, evalue = aligner.scores(100, 1, 200)
+    assert score == 99 - 3
+    assert bit_score == pytest.approx((aligner.lam * 96 - math.log(aligner.K)) / math.log(2))
+    assert evalue == pytest.approx(aligner.K * 200 * 300 * math.exp(-aligner.lam * 96))
+
+    # longer matches have better scores
+    assert aligner.scores(40, 0, 200)[2] > aligner.scores(80, 0, 200)[2]
+
+
+def test_find_alignments(seq_dir):
+    with open(os.path.join(seq_dir, "templates.json"), 'r') as f:
+        templates = json.load(f)
+    with open(os.path.join(seq_dir, "query.json"), 'r') as f:
+        query = json.load(f)
+
+    cc = find_alignments(query, templates, min_length=30)
+    assert isinstance(cc, ContigContainer)
+    assert len(cc) > 0
+    # the template that BLAST aligns as two hits split at the origin of the query is found as one contig
+    assert 7680 in [c.alignment_length for c in cc.contigs if c.subject.context.length == 7883]
+    for contig in cc.contigs[:10]:
+        assert cc.region_bases(contig.query).upper() == cc.region_bases(contig.subject).upper()
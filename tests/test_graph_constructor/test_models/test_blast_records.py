@@ -0,0 +1,36 @@
+import io
+import json
+import os
+
+from dasi.graph_constructor.models.blast_records import iter_blast_records, iter_json_records, SEQUENCE_FIELDS
+
+BLAST_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'data/blast')
+
+
+def test_tabular_and_json_records_match():
+    tabular = list(iter_blast_records(os.path.join(BLAST_DIR, 'results.out')))
+    records = list(iter_blast_records(os.path.join(BLAST_DIR, 'results.out.json')))
+    assert len(tabular) == len(records) == 105
+    for t, j in zip(tabular, records):
+        assert set(t) == set(j)
+        # evalues and bit scores were rounded in the JSON results
+        rounded = ['evalue', 'bit_score']
+        assert {k: v for k, v in t.items() if k not in rounded} == {k: v for k, v in j.items() if k not in rounded}
+
+
+def test_records_without_bases():
+    for filename in ['results.out', 'results.out.json']:
+        for record in iter_blast_records(os.path.join(BLAST_DIR, filename), keep_bases=False):
+            assert not set(SEQUENCE_FIELDS).intersection(record)
+            assert record['q_start'] > 0
+
+
+def test_json_records_in_chunks():
+    path = os.path.join(BLAST_DIR, 'results.out.json')
+    with open(path, 'r') as f:
+        expected = json.load(f)
+    with open(path, 'r') as f:
+        assert list(iter_json_records(f, chunk_size=7)) == expected
+    lines = io.StringIO("\n".join(json.dumps(r) for r in expected[:3]))
+    assert list(iter_json_records(lines)) == expected[:3]
+    assert list(iter_blast_records(os.path.join(BLAST_DIR, 'results.json'))) == []
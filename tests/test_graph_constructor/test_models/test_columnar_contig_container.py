@@ -0,0 +1,170 @@
+import os
+import random
+
+import numpy as np
+import pytest
+
+from dasi.graph_constructor.exceptions import ContigContainerError
+from dasi.graph_constructor.models import BlastContig, ColumnarContigContainer, Contig, ContigContainer, \
+    ContigRegion, Context, ContigRow
+
+
+def random_contigs(num, seed=0):
+    random.seed(seed)
+    query_context = Context(4000, True)
+    subject_context = Context(10000, False)
+    contigs = []
+    for _ in range(num):
+        start = random.randint(1, 3800)
+        end = start + random.randint(20, 1500)
+        if end > 4000:
+            end = 4000
+        query = ContigRegion(start, end, query_context, name="query")
+        if random.random() > 0.5:
+            subject = ContigRegion(1, end - start + 1, subject_context, name="subject")
+        else:
+            subject = ContigRegion(end - start + 1, 1, subject_context, name="subject", forward=False)
+        contigs.append(BlastContig(query, subject, random.choice(["blast", "primer"]),
+                                   bit_score=random.randint(1, 500), evalue=random.random()))
+    return contigs
+
+
+def test_columnar_rows_match_contigs():
+    contigs = random_contigs(100)
+    cc = ColumnarContigContainer(contigs)
+    assert len(cc) == 100
+    assert len(cc.contexts) == 2
+    assert list(cc) == [c.contig_id for c in contigs]
+    for c, row in zip(contigs, cc.contigs):
+        assert isinstance(row, ContigRow)
+        assert row.contig_id == c.contig_id
+        assert row.contig_type == c.contig_type
+        assert row.bit_score == c.bit_score
+        assert row.evalue == c.evalue
+        assert row.query == c.query
+        assert row.subject == c.subject
+        assert row.query.context is cc.contexts[0]
+        assert row.alignment_length == c.alignment_length
+        assert row.to_contig().subject == c.subject
+        assert cc[c.contig_id] == row
+
+
+def test_columnar_sorted_contigs():
+    contigs = random_contigs(100, seed=1)
+    cc = ColumnarContigContainer(contigs)
+    expected = sorted(contigs, key=lambda c: c.query.start)
+    assert [r.contig_id for r in cc.sorted_contigs()] == [c.contig_id for c in expected]
+    expected = sorted(contigs, key=lambda c: c.query.start, reverse=True)
+    assert [r.contig_id for r in cc.sorted_contigs(reverse=True)] == [c.contig_id for c in expected]
+    cc.set_sort_field("bit_score")
+    assert np.all(np.diff([r.bit_score for r in cc.sorted_contigs()]) >= 0)
+    with pytest.raises(ValueError):
+        cc.set_sort_field("not_a_field")
+
+
+def test_columnar_select_and_remove():
+    contigs = random_contigs(100, seed=2)
+    cc = ColumnarContigContainer(contigs)
+    selected = cc.select(cc.column("bit_score") > 250)
+    assert [r.contig_id for r in selected.contigs] == [c.contig_id for c in contigs if c.bit_score > 250]
+    assert selected.contexts is cc.contexts
+
+    row = cc[contigs[50].contig_id]
+    del cc[contigs[0].contig_id]
+    cc.remove([c.contig_id for c in contigs[1:10]])
+    assert len(cc) == 90
+    assert contigs[0].contig_id not in cc
+    assert row.query == contigs[50].query
+
+    with pytest.raises(ContigContainerError):
+        cc.add_contig(contigs[50])
+    cc.add_contig(contigs[0])
+    assert list(cc)[-1] == contigs[0].contig_id
+
+
+def test_columnar_incremental_add_and_delete():
+    contigs = random_contigs(200, seed=6)
+    cc = ColumnarContigContainer()
+    for c in contigs:
+        cc.add_contig(c)
+    assert len(cc._buffer) < 2 * len(contigs)
+    assert list(cc) == [c.contig_id for c in contigs]
+
+    for c in contigs[::2]:
+        del cc[c.contig_id]
+        assert c.contig_id not in cc
+    assert len(cc) == 100
+    row = cc[contigs[1].contig_id]
+    assert row.query == contigs[1].query
+    cc.add_contig(contigs[0])
+    assert list(cc) == [c.contig_id for c in contigs[1::2]] + [contigs[0].contig_id]
+    assert np.array_equal(cc.table, ColumnarContigContainer(contigs[1::2] + contigs[:1]).table)
+    assert row.query == contigs[1].query
+
+
+def test_columnar_remove_redundant_contigs():
+    contigs = random_contigs(50, seed=3)
+    contigs += [c.copy() for c in contigs[:20]]
+    expected = ContigContainer(contigs)
+    expected.remove_redundant_contigs()
+    cc = ColumnarContigContainer(contigs)
+    cc.remove_redundant_contigs()
+    assert sorted(cc) == sorted(expected)
+
+    for keep in ["bit_score", "subject_length", "evalue"]:
+        for by_subject in [False, True]:
+            expected = ContigContainer(contigs)
+            removed = expected.remove_redundant_contigs(keep=keep, by_subject=by_subject)
+            cc = ColumnarContigContainer(contigs)
+            assert cc.remove_redundant_contigs(keep=keep, by_subject=by_subject) == [c.contig_id for c in removed]
+            assert list(cc) == list(expected)
+
+
+def test_columnar_subject_length():
+    contigs = random_contigs(100, seed=4)
+    cc = ColumnarContigContainer(contigs)
+    assert cc.subject_length.tolist() == [c.subject.length for c in contigs]
+
+
+def test_columnar_from_divided_contig():
+    contig = random_contigs(1, seed=5)[0]
+    positions = list(range(contig.query.start, contig.query.end, 7))
+    cc = ColumnarContigContainer(contig.iter_divide_contig(positions, positions, views=True))
+    expected = list(contig.iter_divide_contig(positions, positions))
+    assert len(cc) == len(expected)
+    assert [(r.query.start, r.query.end) for r in cc.contigs] == [(c.query.start, c.query.end) for c in expected]
+
+
+def test_columnar_views_are_not_materialized(monkeypatch):
+    copies = []
+    copy = Contig.copy
+    monkeypatch.setattr(Contig, "copy", lambda self: copies.append(self) or copy(self))
+    for contig in random_contigs(4, seed=7):
+        for subject_context in [Context(10000, True), Context(contig.subject.length, True)]:
+            subject = contig.subject
+            contig.subject = ContigRegion(subject.start, subject.end, subject_context, name=subject.name,
+                                          forward=subject.is_forward())
+            # a few dozen views
+            step = max(len(contig.query) // 6, 1)
+            positions = list(range(contig.query.start, contig.query.end, step))
+            views = list(contig.iter_divide_contig(positions, positions, include_self=False, views=True))
+            assert len(views) > 10
+            cc = ColumnarContigContainer(views)
+            assert not any(v.materialized for v in views)
+            assert copies == []
+            expected = ColumnarContigContainer([v.materialize() for v in views])
+            assert len(copies) == len(views)
+            del copies[:]
+            for field in ['query_start', 'query_end', 'subject_start', 'subject_end', 'bit_score', 'evalue']:
+                assert cc.column(field).tolist() == expected.column(field).tolist()
+
+
+def test_columnar_parse_blast_output():
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'data/blast/results.out')
+    cc = ContigContainer.parse_blast_output(path)
+    columnar = ColumnarContigContainer.parse_blast_output(path)
+    assert len(columnar) == len(cc) > 0
+    for c, row in zip(cc.contigs, columnar.contigs):
+        assert (row.query.start, row.query.end, row.subject.start, row.subject.end) == \
+               (c.query.start, c.query.end, c.subject.start, c.subject.end)
+        assert row.bit_score == c.bit_score
@@ -1,5 +1,7 @@
-from dasi.graph_constructor.models import Context, Region, ContigRegion, Contig
+from dasi.graph_constructor.models import Context, Region, ContigRegion, Contig, BlastContig
 from dasi.graph_constructor.exceptions import ContigError, RegionError
+import itertools
+
 import pytest
 from copy import copy
 
@@ -113,6 +115,25 @@ def test_contig_copy(query_subject_example):
     assert c_copy.contig_id != c2_copy.contig_id
 
 
+def test_contig_copy_shares_context(query_subject_example):
+    query, subject = query_subject_example
+    query.sequence = "A" * query.length
+    c = BlastContig(query, subject, "Example", bit_score=50)
+    c.metadata["key"] = "value"
+    c_copy = c.copy()
+    assert c_copy.query == c.query and c_copy.subject == c.subject
+    assert c_copy.query is not c.query
+    assert c_copy.query.context is c.query.context
+    assert c_copy.query.sequence is c.query.sequence
+    assert c_copy.bit_score == 50
+    assert c_copy.metadata == c.metadata and c_copy.metadata is not c.metadata
+
+    c_copy.modify_query_end(c.query.end - 1)
+    assert c_copy.query.end == c.query.end - 1
+    assert c_copy.subject.length == c.subject.length - 1
+    assert c.query.length == query.length
+
+
 def test_modify_query_start(query_subject_example):
     query, subject = query_subject_example
     c = Contig(query, subject, "Example")
@@ -308,6 +329,70 @@ def test_divide_contigs():
     assert len(divided_contigs) == 13
 
 
+def test_iter_divide_contig():
+    c1 = Context(10000, True)
+    c2 = Context(8000, True)
+    q1 = ContigRegion(1000, 3000, context=c1, forward=True)
+    s1 = ContigRegion(5000, 7000, context=c2, forward=True)
+    contig = Contig(q1, s1, "BLAST")
+
+    starts = [1100, 1200, 1200, 2500, 5000]
+    ends = [2000, 2200, 2300, 1150, 5000]
+    expected = [(s, e) for s, e in itertools.product([1100, 1200, 2500, 1000], [2000, 2200, 2300, 1150, 3000])
+                if s < e]
+    generator = contig.iter_divide_contig(starts, ends, include_self=False, contig_type="primer")
+    assert not isinstance(generator, list)
+    divided = list(generator)
+    assert [(c.query.start, c.query.end) for c in divided] == expected
+    assert all(c.contig_type == "primer" for c in divided)
+    assert all(c.query.length == c.subject.length for c in divided)
+    assert starts == [1100, 1200, 1200, 2500, 5000]
+    assert ends == [2000, 2200, 2300, 1150, 5000]
+
+    views = list(contig.iter_divide_contig(starts, ends, contig_type="primer", views=True))
+    assert views[-1] is contig
+    assert not any(v.materialized for v in views[:-1])
+    assert all(v.contig_type == "primer" for v in views)
+    assert [v.query for v in views[:-1]] == [c.query for c in divided]
+    assert [v.subject for v in views[:-1]] == [c.subject for c in divided]
+
+
+def test_iter_divide_contig_across_origin():
+    q1 = ContigRegion(9000, 1000, context=Context(10000, True), forward=True)
+    s1 = ContigRegion(1, 2001, context=Context(8000, True), forward=True)
+    contig = Contig(q1, s1, "BLAST")
+    divided = list(contig.iter_divide_contig([9500, 500], [9800, 200], include_self=False))
+    assert [(c.query.start, c.query.end) for c in divided] == [
+        (9500, 9800), (9500, 200), (9500, 1000), (500, 1000), (9000, 9800), (9000, 200), (9000, 1000)]
+    assert [(c.subject.start, c.subject.end) for c in divided] == [
+        (501, 801), (501, 1201), (501, 2001), (1501, 2001), (1, 801), (1, 1201), (1, 2001)]
+
+
+def test_modify_query_across_origin():
+    def origin_contig():
+        q = ContigRegion(9000, 1000, context=Context(10000, True), forward=True)
+        s = ContigRegion(1, 2001, context=Context(8000, True), forward=True)
+        return Contig(q, s, "BLAST")
+
+    contig = origin_contig()
+    contig.modify_query(9000, 9800)
+    assert (contig.query.start, contig.query.end) == (9000, 9800)
+    assert (contig.subject.start, contig.subject.end) == (1, 801)
+
+    contig = origin_contig()
+    contig.modify_query(9500, 200)
+    assert (contig.query.start, contig.query.end) == (9500, 200)
+    assert (contig.subject.start, contig.subject.end) == (501, 1201)
+
+    contig = origin_contig()
+    contig.modify_query(500, 1000)
+    assert (contig.query.start, contig.query.end) == (500, 1000)
+    assert (contig.subject.start, contig.subject.end) == (1501, 2001)
+
+    with pytest.raises(RegionError):
+        origin_contig().modify_query(9000, 10001)
+
+
     # def test_start_end(query_subject_example):
     #     query, subject = query_subject_example
     #     c = Contig(query, subject, "Example")
@@ -417,3 +502,53 @@ def test_divide_contigs():
     #     contig1.subject.start = 3000
     #     contig1.subject.end = 4000
     #     contig1.alignment_length
+
+
+def test_contig_slots():
+    context = Context.interned(1000, True)
+    query = ContigRegion(10, 100, context)
+    subject = ContigRegion(1, 91, Context.interned(5000, False))
+    contig = BlastContig(query, subject, "test", score=5)
+    assert not hasattr(contig, '__dict__')
+    assert not hasattr(contig.query, '__dict__')
+    assert contig.query.context is context
+    assert contig.copy().query.context is context
+    assert contig.score == 5 and contig.lp_extendable
+
+
+def test_contig_view(query_subject_example):
+    query, subject = query_subject_example
+    c = BlastContig(query, subject, "Example", bit_score=50)
+    view = c.view(11, 100)
+    assert not view.materialized
+    assert view.contig_id != c.contig_id
+    assert view.bit_score == 50
+    c.contig_type = "changed"
+    assert view.contig_type == "changed"
+    assert not view.materialized
+
+    expected = c.sub_query(11, 100)
+    assert view.query == expected.query
+    assert view.subject == expected.subject
+    assert view.materialized
+    assert view.contig_id == view.materialize().contig_id
+
+    view.contig_type = "view"
+    assert view.contig_type == "view"
+    assert c.contig_type == "changed"
+    assert c.query.start == 1 and c.query.end == 155
+
+    assert c.view().query == c.query
+    with pytest.raises(ContigError):
+        c.view(11, 1000)
+
+
+def test_contig_view_metadata_is_copied(query_subject_example):
+    query, subject = query_subject_example
+    c = BlastContig(query, subject, "Example")
+    c.metadata["key"] = "parent"
+    view = c.view(11, 100)
+    view.metadata["key"] = "view"
+    assert view.materialized
+    assert view.metadata == {"key": "view"}
+    assert c.metadata == {"key": "parent"}
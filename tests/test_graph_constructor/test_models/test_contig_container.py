@@ -1,8 +1,14 @@
-from dasi.graph_constructor.models import ContigContainer
+import itertools
+import os
+import random
+
+import pytest
+
+from dasi.graph_constructor.models import BlastContig, ContigContainer, ContigRegion, Context
 
 
 def test_contig_container_parse_from_results(aligner):
-    new_cc = ContigContainer.parse_alignments(aligner.results, list(aligner.seq_dict.values()))
+    new_cc = ContigContainer.parse_alignments(aligner.alignments, list(aligner.seq_dict.values()))
     assert len(new_cc.contigs) > 0
 
 def test_contig_container_fixture(cc):
@@ -12,3 +18,249 @@ def test_fuse(cc):
     cc.fuse_circular_fragments()
 
 
+
+
+def split_contigs(num, seed=0):
+    """Contigs whose subjects span the origin of a circular subject, split into two at the origin"""
+    random.seed(seed)
+    query_context = Context(10000, False)
+    subject_context = Context(1000, True)
+    whole, split = [], []
+    for _ in range(num):
+        q = random.randint(1, 9000)
+        left = random.randint(20, 300)
+        right = random.randint(20, 300)
+        s = 1000 - left + 1
+        whole.append((q, q + left + right - 1, s, right))
+        split.append(BlastContig(ContigRegion(q, q + left - 1, query_context),
+                                 ContigRegion(s, 1000, subject_context), "blast"))
+        split.append(BlastContig(ContigRegion(q + left, q + left + right - 1, query_context),
+                                 ContigRegion(1, right, subject_context), "blast"))
+    return whole, split
+
+
+def test_fuse_circular_fragments():
+    whole, split = split_contigs(50)
+    random.shuffle(split)
+    cc = ContigContainer(split)
+    removed = cc.fuse_circular_fragments()
+    assert len(removed) == 50
+    assert len(cc) == len(cc.contigs) == 50
+    fused = sorted((c.query.start, c.query.end, c.subject.start, c.subject.end) for c in cc.contigs)
+    assert fused == sorted(whole)
+
+
+def test_contigs_cache():
+    _, contigs = split_contigs(10, seed=1)
+    cc = ContigContainer(contigs[:10])
+    assert cc.contigs == cc.contigs and cc.contigs is not cc.contigs
+    cc.contigs.append(contigs[10])
+    assert len(cc.contigs) == 10
+    assert cc.sorted_contigs() == sorted(contigs[:10], key=lambda c: c.query.start)
+    version = cc.version
+
+    cc.add_contig(contigs[10])
+    assert cc.version > version
+    assert contigs[10] in cc.contigs
+    assert contigs[10] in cc.sorted_contigs()
+
+    del cc[contigs[0].contig_id]
+    assert contigs[0] not in cc.contigs
+    assert cc.remove_contig(contigs[1].contig_id) is contigs[1]
+    cc.remove_contigs([c.contig_id for c in contigs[2:4]])
+    assert len(cc) == len(cc.contigs) == len(cc.sorted_contigs()) == 7
+
+    cc.set_sort_filter(lambda c: -c.query.start)
+    assert cc.sorted_contigs() == sorted(cc.contigs, key=lambda c: -c.query.start)
+
+
+def test_fuse_circular_fragments_chain():
+    query_context = Context(10000, False)
+    subject_context = Context(1000, True)
+    pieces = [
+        (ContigRegion(201, 300, query_context), ContigRegion(1, 100, subject_context)),
+        (ContigRegion(101, 200, query_context), ContigRegion(901, 1000, subject_context)),
+        (ContigRegion(301, 400, query_context), ContigRegion(101, 200, subject_context)),
+        (ContigRegion(101, 200, query_context), ContigRegion(901, 1000, subject_context)),
+    ]
+    contigs = [BlastContig(q, s, "blast") for q, s in pieces]
+    cc = ContigContainer(contigs)
+    removed = cc.fuse_circular_fragments()
+    assert removed == [contigs[0], contigs[2]]
+    assert cc.contigs == [contigs[1], contigs[3]]
+    assert (contigs[1].query.start, contigs[1].query.end) == (101, 400)
+    assert (contigs[1].subject.start, contigs[1].subject.end) == (901, 200)
+    assert (contigs[3].query.start, contigs[3].query.end) == (101, 200)
+
+
+def baseline_fuse_circular_fragments(contigs):
+    """The fuse loop over all ordered pairs that fuse_circular_fragments replaced"""
+    contigs = list(contigs)
+    for l, r in itertools.permutations(list(contigs), 2):
+        if l.same_context(r) and l.subject.consecutive_with(r.subject) and l.query.consecutive_with(r.query) and \
+                l in contigs and r in contigs:
+            l.fuse(r)
+            contigs.remove(r)
+    return contigs
+
+
+def test_fuse_circular_fragments_out_of_order_chain():
+    query_context = Context(10000, False)
+    subject_context = Context(1000, True)
+    a = BlastContig(ContigRegion(101, 200, query_context), ContigRegion(901, 1000, subject_context), "blast")
+    b = BlastContig(ContigRegion(201, 300, query_context), ContigRegion(1, 100, subject_context), "blast")
+    c = BlastContig(ContigRegion(301, 400, query_context), ContigRegion(101, 200, subject_context), "blast")
+    cc = ContigContainer([a, c, b])
+    assert cc.fuse_circular_fragments() == [b]
+    # c only follows a after b was fused, and was already passed by then
+    assert [(x.query.start, x.query.end) for x in cc.contigs] == [(101, 300), (301, 400)]
+
+
+def test_fuse_circular_fragments_matches_pairwise_loop():
+    query_context = Context(3000, False)
+    subject_context = Context(600, True)
+    rng = random.Random(3)
+    for _ in range(30):
+        # chains of pieces across the origin of the subject, some fused already, in random container order
+        pieces = []
+        for _ in range(rng.randint(1, 4)):
+            q = rng.randint(1, 2000)
+            s = rng.randint(1, 600)
+            for _ in range(rng.randint(2, 5)):
+                length = rng.choice([50, 100, 100, 150])
+                pieces.append((q, q + length - 1, s, (s + length - 2) % 600 + 1))
+                q += length
+                s = (s + length - 1) % 600 + 1
+        pieces += rng.sample(pieces, len(pieces) // 3)
+        fused_pieces = []
+        for q_start, q_end, s_start, s_end in pieces:
+            if rng.random() < 0.2 and fused_pieces and fused_pieces[-1][1] + 1 == q_start:
+                fused_pieces[-1] = fused_pieces[-1][:1] + (q_end,) + fused_pieces[-1][2:3] + (s_end,)
+            else:
+                fused_pieces.append((q_start, q_end, s_start, s_end))
+        rng.shuffle(fused_pieces)
+
+        def make():
+            return [BlastContig(ContigRegion(qs, qe, query_context), ContigRegion(ss, se, subject_context), "blast")
+                    for qs, qe, ss, se in fused_pieces]
+
+        expected = baseline_fuse_circular_fragments(make())
+        cc = ContigContainer(make())
+        cc.fuse_circular_fragments()
+        assert [(c.query.start, c.query.end, c.subject.start, c.subject.end) for c in cc.contigs] == \
+            [(c.query.start, c.query.end, c.subject.start, c.subject.end) for c in expected]
+
+
+def test_circular_partition():
+    query_context = Context(4000, False)
+    subject_context = Context(10000, False)
+    contigs = [
+        BlastContig(ContigRegion(501, 3000, query_context), ContigRegion(1, 2500, subject_context), "blast"),
+        BlastContig(ContigRegion(2601, 3400, query_context), ContigRegion(3001, 3800, subject_context), "blast"),
+        BlastContig(ContigRegion(3401, 3500, query_context), ContigRegion(5001, 5100, subject_context), "blast"),
+    ]
+    cc = ContigContainer(contigs)
+    new_contigs = cc.circular_partition(2000)
+    # cut points 2501, 1000, 1400 and 1500
+    assert [(c.query.start, c.query.end) for c in new_contigs] == [
+        (501, 2501), (2501, 3000),
+        (501, 1000), (1000, 3000),
+        (501, 1400), (1400, 3000),
+        (501, 1500), (1500, 3000),
+    ]
+    assert [(c.subject.start, c.subject.end) for c in new_contigs[:2]] == [(1, 2001), (2001, 2500)]
+    assert all(c.contig_type == "circular_partition" for c in new_contigs)
+    assert len(cc) == 11
+    assert contigs[0].query.start == 501 and contigs[0].query.end == 3000
+
+    with pytest.raises(TypeError):
+        cc.circular_partition(2000.0)
+
+
+def redundant_contigs():
+    query_context = Context(4000, False)
+    subject_context = Context(10000, False)
+    contigs = []
+    for start, end, s_start, bit_score, evalue, forward in [
+        (1, 100, 1, 10, 0.1, True),
+        (1, 100, 1, 30, 0.1, True),
+        (1, 100, 201, 20, 0.01, False),
+        (1, 200, 1, 5, 0.1, True),
+        (1, 100, 301, 30, 0.01, True),
+    ]:
+        length = end - start + 1
+        if forward:
+            subject = ContigRegion(s_start, s_start + length - 1, subject_context)
+        else:
+            subject = ContigRegion(s_start + length - 1, s_start, subject_context, forward=False)
+        contigs.append(BlastContig(ContigRegion(start, end, query_context), subject, "blast",
+                                   bit_score=bit_score, evalue=evalue))
+    return contigs
+
+
+@pytest.mark.parametrize("keep,by_subject,expected", [
+    ("first", False, [0, 3]),
+    ("bit_score", False, [1, 3]),
+    ("evalue", False, [2, 3]),
+    ("first", True, [0, 2, 3, 4]),
+    ("bit_score", True, [1, 2, 3, 4]),
+])
+def test_remove_redundant_contigs(keep, by_subject, expected):
+    contigs = redundant_contigs()
+    cc = ContigContainer(contigs)
+    removed = cc.remove_redundant_contigs(keep=keep, by_subject=by_subject)
+    assert cc.contigs == [contigs[i] for i in expected]
+    assert removed == [c for i, c in enumerate(contigs) if i not in expected]
+
+
+def test_remove_redundant_contigs_subject_length():
+    contigs = redundant_contigs()
+    contigs[1].modify_query_start(2)
+    contigs[3].modify_query_end(100)
+    contigs[3].modify_query_start(2)
+    cc = ContigContainer(contigs)
+    cc.remove_redundant_contigs(keep="subject_length")
+    assert len(cc) == 2
+    with pytest.raises(ValueError):
+        cc.remove_redundant_contigs(keep="longest")
+
+
+def test_parse_blast_output(tmpdir):
+    bases = "ACGTTGCAAGGCTTAACCGGTTAACGTAGCTAGCTA"
+    sequences = [
+        {"id": "query", "bases": bases, "circular": True},
+        {"id": "subject", "bases": bases, "circular": False},
+    ]
+
+    def reverse_complement(s):
+        return s[::-1].translate(str.maketrans("ACGT", "TGCA"))
+
+    hits = [
+        (3, 12, 3, 12, "plus", bases[2:12]),
+        (30, 40, 20, 30, "plus", bases[29:] + bases[:4]),
+        (5, 14, 14, 5, "minus", bases[4:14]),
+    ]
+    path = str(tmpdir.join("results.out"))
+    with open(path, 'w') as f:
+        f.write("# BLASTN 2.7.1+\n")
+        for q_start, q_end, s_start, s_end, strand, query_seq in hits:
+            subject_seq = "N" * len(query_seq)
+            row = ["query", "subject", 10, 1e-5, 20.0, len(query_seq), len(query_seq), 0, 0, len(bases),
+                   q_start, q_end, len(bases), s_start, s_end, strand, query_seq, subject_seq]
+            f.write("\t".join(str(x) for x in row) + "\n")
+
+    cc = ContigContainer.parse_blast_output(path, sequences=sequences)
+    assert len(cc) == 3
+    for contig, (q_start, q_end, s_start, s_end, strand, query_seq) in zip(cc.contigs, hits):
+        assert contig.query.sequence is None
+        assert contig.query.context.circular
+        assert not contig.subject.context.circular
+        assert contig.query.length == len(query_seq)
+        assert cc.region_bases(contig.query) == query_seq
+        if strand == "minus":
+            assert cc.region_bases(contig.subject) == reverse_complement(bases[s_end - 1:s_start])
+        else:
+            assert cc.region_bases(contig.subject) == bases[s_start - 1:s_end]
+
+    cc = ContigContainer.parse_blast_output(path, sequences=sequences, keep_bases=True)
+    assert [c.query.sequence for c in cc.contigs] == [h[-1] for h in hits]
@@ -7,6 +7,9 @@ Date: 2/23/17
 Description:
 
 '''
+import itertools
+from copy import deepcopy
+
 import pytest
 from dasi.graph_constructor.models import Context, Region
 from dasi.graph_constructor.exceptions import RegionError
@@ -407,6 +410,30 @@ def test_gap_span():
     assert r.get_gap_span(r2) == 4
 
 
+def test_gap_span_matches_region_methods():
+    for circular in [True, False]:
+        context = Context(20, circular, start_index=1)
+        regions = []
+        for start, end in itertools.product(range(1, 21, 3), range(1, 21, 4)):
+            for direction in [Region.FORWARD, Region.REVERSE]:
+                try:
+                    r = Region(start, end, context, direction=direction)
+                except RegionError:
+                    continue
+                if r.coordinates[2] is not None:
+                    regions.append(r)
+        for r, r2 in itertools.product(regions, repeat=2):
+            assert r.coordinates == (r.left_end, r.right_end, r.length, r.direction)
+            if r.consecutive_with(r2):
+                expected = 0
+            elif r.get_overlap(r2):
+                expected = -r.get_overlap(r2).length
+            else:
+                gap = r.get_gap(r2)
+                expected = gap.length if gap is not None else None
+            assert r.get_gap_span(r2) == expected
+
+
 def test_gap():
     # Test when r2 is contained in r1
     r = Region(1, 100, context=Context(100, True, start_index=1))
@@ -825,3 +852,55 @@ def test_eq_location():
         #         r = Region(5, 99, circular=True, context=Context(100, False, start_index=start_index))
         #         x = r.translate_pos(pos)
         #         assert x == new_indices[i]
+
+
+def test_context_interned():
+    c1 = Context.interned(1000, True)
+    c2 = Context.interned(1000, True)
+    assert c1 is c2
+    assert c1.is_interned
+    assert Context.interned(1000, False) is not c1
+    assert Context.interned(1000, True, start_index=0) is not c1
+    assert not Context(1000, True).is_interned
+    assert Context(1000, True) == c1
+
+
+def test_translate_pos_modulo():
+    for start_index in [0, 1, 10]:
+        c = Context(20, True, start_index=start_index)
+        positions = list(range(start_index - 65, start_index + 85))
+        expected = []
+        for x in positions:
+            while x > c.end:
+                x -= c.length
+            while x < c.start:
+                x += c.length
+            expected.append(x)
+        assert [c.translate_pos(x) for x in positions] == expected
+
+    c = Context(20, False, start_index=1)
+    assert [c.translate_pos(x) for x in [1, 5, 20]] == [1, 5, 20]
+    with pytest.raises(RegionError):
+        c.translate_pos(21)
+    with pytest.raises(RegionError):
+        c.translate_pos(0)
+
+
+def test_regions_share_interned_context():
+    context = Context.interned(100, False)
+    r = Region(2, 5, context=context)
+    assert r.copy().context is context
+    assert deepcopy(r).context is context
+    assert deepcopy(Region(2, 5, context=Context(100, False))).context is not None
+
+
+def test_region_slots():
+    r = Region(2, 5, context=Context(100, False))
+    assert not hasattr(r, '__dict__')
+    assert not hasattr(r.context, '__dict__')
+    with pytest.raises(AttributeError):
+        r.not_an_attribute = 1
+    assert r == r.copy()
+    other = r.copy()
+    other.start = 3
+    assert r != other
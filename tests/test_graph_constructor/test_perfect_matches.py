@@ -1,6 +1,9 @@
 from dasi.graph_constructor.models import Contig, ContigContainer, ContigRegion
+from dasi.graph_constructor.primer_finder import PrimerIndex, reverse_complement, wildcard_equal
+import random
 import re
 
+
 def test_find_perfect_matches():
 
     def perfect_matches(self, rc=True):
@@ -74,4 +77,65 @@ def test_find_perfect_matches():
 
                 c = Contig(query, subject, Contig.TYPE_PRIMER)
                 contig_container.contigs.append(c)
-        return contig_container
\ No newline at end of file
+        return contig_container
+
+
+def test_primer_index():
+    query = "AAAACGTTGCATTTTGGGGCCCCTTTTACGTACGTNNNNAAAA"
+    primers = ["ACGTTGCA", reverse_complement("GGGGCCCC"), "CGTNCGTA", "TACGTACG", "AAAAAAAA"]
+    index = PrimerIndex(primers, names=["p{}".format(i) for i in range(len(primers))])
+    matches = set(index.iter_matches(query))
+    assert (0, 3, True) in matches
+    # GGGGCCCC is its own reverse complement
+    assert {(1, 15, True), (1, 15, False)} <= matches
+    # N in the primer
+    assert (2, 28, True) in matches
+    assert (3, 26, True) in matches
+    # Ns in the query
+    assert (4, 35, True) in matches
+    assert (4, 0, True) not in matches
+
+    # matches across the origin of circular queries
+    assert (4, 39, True) not in matches
+    assert (4, 39, True) in set(index.iter_matches(query, circular=True))
+
+    contigs = index.find_contigs(query, circular=True, name="query")
+    assert len(contigs) == len(set(index.iter_matches(query, circular=True)))
+    for c in contigs:
+        assert c.contig_type == Contig.TYPE_PRIMER
+        assert c.query.name == "query"
+        assert len(c.query) == len(c.subject) == len(primers[int(c.subject.name[1:])])
+    across_origin = [c for c in contigs if c.query.start == 40]
+    assert len(across_origin) == 1
+    assert across_origin[0].query.end == 4
+
+
+def naive_primer_matches(primers, query, circular):
+    """Matches of primers in a query by comparing every window with wildcard_equal"""
+    matches = set()
+    length = len(query)
+    for i, primer in enumerate(primers):
+        for forward, pattern in [(True, primer), (False, reverse_complement(primer))]:
+            if len(pattern) > length:
+                continue
+            last = length if circular else length - len(pattern) + 1
+            for start in range(last):
+                window = (query + query)[start:start + len(pattern)]
+                if wildcard_equal(window, pattern):
+                    matches.add((i, start, forward))
+    return matches
+
+
+def test_primer_index_matches_naive_scan():
+    rng = random.Random(0)
+    for _ in range(200):
+        query = ''.join(rng.choice("ACGTTTN" if rng.random() < 0.2 else "ACGT") for _ in range(rng.randint(1, 60)))
+        primers = [''.join(rng.choice("ACGN") for _ in range(rng.randint(1, 6))) for _ in range(rng.randint(1, 6))]
+        primers += [query[i:i + 5] for i in range(0, len(query), 13) if query[i:i + 5]]
+        index = PrimerIndex(primers)
+        for circular in [False, True]:
+            assert set(index.iter_matches(query, circular=circular)) == naive_primer_matches(primers, query, circular)
+
+    index = PrimerIndex(["NNNN"])
+    assert len(set(index.iter_matches("ACGTAC"))) == 2 * 3
+    assert len(set(index.iter_matches("ACGTAC", circular=True))) == 2 * 6
@@ -0,0 +1,207 @@
+import random
+import shutil
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from dasi import blast_cache
+from dasi.blast_cache import BlastDatabaseCache, record_alignment, is_perfect, is_perfect_subject
+from dasi.database import Model
+from dasi.models import Sequence, Primer
+
+requires_blast = pytest.mark.skipif(shutil.which("makeblastdb") is None or shutil.which("blastn") is None,
+                                    reason="BLAST is not installed")
+
+
+@pytest.fixture
+def session(tmpdir):
+    engine = create_engine("sqlite:///" + str(tmpdir.join("test.db")))
+    Model.Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def random_bases(length, rng):
+    return ''.join(rng.choice("ACGT") for _ in range(length))
+
+
+def add_sequences(session, rng, num):
+    sequences = [Sequence(name="seq", bases=random_bases(500, rng), circular=False) for _ in range(num)]
+    session.add_all(sequences)
+    session.commit()
+    return sequences
+
+
+def record(**kwargs):
+    r = {"query_acc": "1", "subject_acc": "2", "score": 20, "evalue": 1e-5, "bit_score": 40.0,
+         "alignment_length": 20, "identical": 20, "gap_opens": 0, "gaps": 0, "query_length": 200,
+         "q_start": 91, "q_end": 110, "subject_length": 20, "s_start": 1, "s_end": 20, "subject_strand": "plus",
+         "query_seq": "A" * 20, "subject_seq": "A" * 20}
+    r.update(kwargs)
+    return r
+
+
+def test_record_alignment():
+    query = Sequence(id=1, name="query", bases="A" * 100, circular=True)
+    primer = Primer(id=2, name="primer", bases="A" * 20)
+
+    alignment = record_alignment(record(), query, primer, span_origin=True)
+    assert (alignment['query']['start'], alignment['query']['end']) == (91, 10)
+    assert alignment['query']['length'] == 100
+    assert alignment['query']['circular']
+    assert (alignment['subject']['start'], alignment['subject']['end']) == (1, 20)
+    assert not alignment['subject']['circular']
+    assert alignment['meta']['gaps_open'] == 0
+    assert is_perfect(alignment)
+    assert is_perfect_subject(alignment)
+
+    alignment = record_alignment(record(identical=19, s_start=2, s_end=19, alignment_length=18), query, primer,
+                                 span_origin=True)
+    assert not is_perfect(alignment)
+    assert not is_perfect_subject(alignment)
+
+    # hits longer than the sequence only exist on the pseudocircular sequence
+    assert record_alignment(record(q_start=1, q_end=150, alignment_length=150), query, primer, True) is None
+
+
+def test_blast_cache_update_reads_only_new_rows(tmpdir, session, monkeypatch):
+    monkeypatch.setattr(BlastDatabaseCache, "_build_volume", lambda self, name, rows, span_origin: name)
+    monkeypatch.setattr(BlastDatabaseCache, "_remove_volume", lambda self, name: None)
+    rng = random.Random(3)
+    cache = BlastDatabaseCache(str(tmpdir.join("blast_cache")), database="sqlite:///test.db")
+    add_sequences(session, rng, 3)
+    cache.update("sequence", Sequence, session)
+    _, checksum = blast_cache.table_checksums(Sequence, session)
+    assert cache.manifest["sequence"]["checksum"] == checksum
+
+    def table_checksums(*args, **kwargs):
+        raise AssertionError("every row was read")
+
+    monkeypatch.setattr(blast_cache, "table_checksums", table_checksums)
+    assert cache.update("sequence", Sequence, session) == 1
+    add_sequences(session, rng, 2)
+    assert cache.update("sequence", Sequence, session) == 2
+    monkeypatch.undo()
+    # the checksum updated from the new rows is the checksum of the whole table
+    _, checksum = blast_cache.table_checksums(Sequence, session)
+    assert cache.manifest["sequence"]["checksum"] == checksum
+
+
+def test_blast_cache_manifest(tmpdir):
+    cache = BlastDatabaseCache(str(tmpdir.join("blast_cache")))
+    assert cache.version("sequence") == 0
+    assert cache.volumes("sequence") == []
+    cache.manifest["sequence"] = {"version": 2, "volumes": ["sequence_1", "sequence_2"], "state": [3, 3],
+                                  "span_origin": True}
+    cache._save_manifest()
+    cache = BlastDatabaseCache(str(tmpdir.join("blast_cache")))
+    assert cache.version("sequence") == 2
+    assert cache.volumes("sequence") == ["sequence_1", "sequence_2"]
+
+
+def test_blast_cache_update(tmpdir, session, monkeypatch):
+    built = []
+
+    def build_volume(self, name, rows, span_origin):
+        built.append((name, [row.id for row in rows]))
+        return name
+
+    monkeypatch.setattr(BlastDatabaseCache, "_build_volume", build_volume)
+    monkeypatch.setattr(BlastDatabaseCache, "_remove_volume", lambda self, name: None)
+    rng = random.Random(0)
+    directory = str(tmpdir.join("blast_cache"))
+    cache = BlastDatabaseCache(directory, database="sqlite:///test.db")
+    sequences = add_sequences(session, rng, 2)
+    assert cache.update("sequence", Sequence, session) == 1
+    assert cache.update("sequence", Sequence, session) == 1
+    assert built == [("sequence_1", [1, 2])]
+
+    # new rows are added as a volume
+    add_sequences(session, rng, 1)
+    assert cache.update("sequence", Sequence, session) == 2
+    assert cache.volumes("sequence") == ["sequence_1", "sequence_2"]
+    assert built[-1] == ("sequence_2", [3])
+
+    # removed rows rebuild the database
+    session.delete(sequences[0])
+    session.commit()
+    assert cache.update("sequence", Sequence, session) == 3
+    assert cache.volumes("sequence") == ["sequence_3"]
+    assert built[-1] == ("sequence_3", [2, 3])
+
+    # rows modified in place keep the row count and largest id, and are only found by checksumming every row
+    sequences[1].bases = random_bases(500, rng)
+    session.commit()
+    assert cache.update("sequence", Sequence, session) == 3
+    assert cache.update("sequence", Sequence, session, verify=True) == 4
+    assert built[-1] == ("sequence_4", [2, 3])
+    assert cache.update("sequence", Sequence, session, verify=True) == 4
+
+    # so does a different database in the same directory, and the manifest is shared between caches
+    other = BlastDatabaseCache(directory, database="sqlite:///other.db")
+    assert other.update("sequence", Sequence, session) == 5
+    assert built[-1] == ("sequence_5", [2, 3])
+    assert cache.update("sequence", Sequence, session) == 6
+    assert len(built) == 6
+
+
+@requires_blast
+def test_blast_cache_align(tmpdir, session):
+    rng = random.Random(1)
+    cache = BlastDatabaseCache(str(tmpdir.join("blast_cache")), database="sqlite:///test.db")
+    sequences = add_sequences(session, rng, 2)
+    query = Sequence(id=1000, name="query", bases=sequences[0].bases[100:300] + sequences[1].bases[:200],
+                     circular=False)
+
+    def aligned():
+        alignments = [a for a in cache.align("sequence", Sequence, session, query) if is_perfect(a)]
+        return sorted((a['subject']['sequence_id'], a['subject']['start'], a['subject']['end']) for a in alignments)
+
+    assert aligned() == [(1, 101, 300), (2, 1, 200)]
+
+    # incremental add
+    new = add_sequences(session, rng, 1)[0]
+    query.bases += new.bases[:150]
+    assert aligned() == [(1, 101, 300), (2, 1, 200), (3, 1, 150)]
+    assert len(cache.volumes("sequence")) == 2
+
+    # rebuild after a delete
+    session.delete(sequences[1])
+    session.commit()
+    assert aligned() == [(1, 101, 300), (3, 1, 150)]
+    assert len(cache.volumes("sequence")) == 1
+
+    # stale state: same row count and largest id, different bases
+    sequences[0].bases = random_bases(500, rng)
+    session.commit()
+    cache.update("sequence", Sequence, session, verify=True)
+    assert aligned() == [(3, 1, 150)]
+
+
+@requires_blast
+def test_blast_cache_align_deleted_subject(tmpdir, session, monkeypatch):
+    rng = random.Random(2)
+    cache = BlastDatabaseCache(str(tmpdir.join("blast_cache")), database="sqlite:///test.db")
+    sequences = add_sequences(session, rng, 2)
+    query = Sequence(id=1000, name="query", bases=sequences[0].bases[:200] + sequences[1].bases[:200],
+                     circular=False)
+    cache.update("sequence", Sequence, session)
+
+    # a row deleted while blastn runs is still in the database that was searched
+    monkeypatch.setattr(BlastDatabaseCache, "update", lambda self, *args, **kwargs: self.version(args[0]))
+    session.delete(sequences[0])
+    session.commit()
+    alignments = [a for a in cache.align("sequence", Sequence, session, query) if is_perfect(a)]
+    assert [(a['subject']['sequence_id'], a['subject']['start'], a['subject']['end']) for a in alignments] == \
+        [(2, 1, 200)]
+
+
+def test_blast_cache_without_fcntl(tmpdir, monkeypatch):
+    monkeypatch.setattr(blast_cache, "fcntl", None)
+    cache = BlastDatabaseCache(str(tmpdir.join("blast_cache")))
+    with cache._lock():
+        cache.manifest["sequence"] = {"version": 1, "volumes": ["sequence_1"], "state": [1, 1], "span_origin": True}
+        cache._save_manifest()
+    assert BlastDatabaseCache(str(tmpdir.join("blast_cache"))).version("sequence") == 1
@@ -269,7 +269,8 @@ def test_createPrimerResults(app, graphql_client):
         assert results_data is not None
         assert results_error is None
 
-        assert len(results_data['results']) == 2
+        # the primer binds the sequence once, on the forward strand
+        assert len(results_data["results"]) == 1
 
 
 def test_sequences(app, graphql_client):